@@ -0,0 +1,341 @@
+"""
+Almacenes de usuarios para AuthManager
+
+- AlmacenJSON: archivo users.json (modo local, pocos usuarios)
+- AlmacenSecrets: Streamlit Secrets (solo lectura)
+- AlmacenSQLite: base SQLite con búsquedas indexadas y actualizaciones de una fila
+
+Migrar un users.json existente a SQLite:
+    python almacen_usuarios.py users.json users.db
+"""
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+
+
+class AlmacenUsuarios(ABC):
+    """Interfaz común de los almacenes de usuarios (un almacén incompleto no se puede instanciar)"""
+
+    solo_lectura = False
+
+    @abstractmethod
+    def obtener(self, username):
+        """Datos del usuario (password, nombre, apellido) o None si no existe"""
+
+    @abstractmethod
+    def crear(self, username, datos):
+        """Crea el usuario; retorna False si ya existía"""
+
+    @abstractmethod
+    def actualizar_password(self, username, password_hash):
+        """Actualiza el hash de la contraseña; retorna False si no existe"""
+
+    def estadisticas(self):
+        """Métricas del almacén"""
+        return {}
+
+
+class _IndiceUsuarios:
+    """
+    Índice en memoria de los usuarios de una fuente (archivo o Secrets),
+    compartido por todas las instancias del proceso.
+    Solo se vuelve a cargar cuando cambia la firma de la fuente.
+    """
+
+    def __init__(self, fuente):
+        self.fuente = fuente
+        self.lock = threading.Lock()
+        self.usuarios = None
+        self.firma = None
+        self.cargas = 0
+        self.consultas = 0
+        self.ultima_carga_ms = 0.0
+        self.total_carga_ms = 0.0
+
+    def obtener(self, firma, cargar):
+        """Devuelve el índice, recargándolo con `cargar()` si la firma cambió"""
+        with self.lock:
+            self.consultas += 1
+            if self.usuarios is None or firma is None or firma != self.firma:
+                inicio = time.perf_counter()
+                try:
+                    usuarios = cargar()
+                except Exception:
+                    # No se guarda en caché: se reintentará en la próxima consulta
+                    return {}
+                duracion = (time.perf_counter() - inicio) * 1000
+                self.usuarios = usuarios
+                self.firma = firma
+                self.cargas += 1
+                self.ultima_carga_ms = duracion
+                self.total_carga_ms += duracion
+            return self.usuarios
+
+    def reemplazar(self, usuarios, firma):
+        """Actualiza el índice tras una escritura propia, sin volver a leer"""
+        with self.lock:
+            self.usuarios = usuarios
+            self.firma = firma
+
+    def estadisticas(self):
+        with self.lock:
+            return {
+                "fuente": self.fuente,
+                "usuarios": len(self.usuarios) if self.usuarios is not None else 0,
+                "cargas": self.cargas,
+                "consultas": self.consultas,
+                "ultima_carga_ms": round(self.ultima_carga_ms, 3),
+                "total_carga_ms": round(self.total_carga_ms, 3),
+            }
+
+
+_indices = {}
+_locks_escritura = {}
+_indices_lock = threading.Lock()
+_generacion_secrets = 0
+
+
+def _obtener_indice(fuente):
+    with _indices_lock:
+        indice = _indices.get(fuente)
+        if indice is None:
+            indice = _IndiceUsuarios(fuente)
+            _indices[fuente] = indice
+            _locks_escritura[fuente] = threading.Lock()
+        return indice
+
+
+def _secrets_cambiados(*args, **kwargs):
+    """Receptor de la señal de Streamlit cuando cambia secrets.toml"""
+    global _generacion_secrets
+    _generacion_secrets += 1
+
+
+class AlmacenJSON(AlmacenUsuarios):
+    """
+    Usuarios en un archivo JSON. Las lecturas usan el índice en memoria;
+    las escrituras se serializan dentro del proceso y reemplazan el archivo
+    de forma atómica para no dejarlo a medio escribir.
+    """
+
+    def __init__(self, ruta="users.json"):
+        self.ruta = ruta
+        fuente = os.path.abspath(ruta)
+        self._indice = _obtener_indice(fuente)
+        self._lock_escritura = _locks_escritura[fuente]
+        if not os.path.exists(self.ruta):
+            with open(self.ruta, 'w') as f:
+                json.dump({}, f)
+
+    def _firma(self):
+        try:
+            stat = os.stat(self.ruta)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _leer(self):
+        with open(self.ruta, 'r') as f:
+            return json.load(f)
+
+    def cargar_todos(self):
+        """Índice completo de usuarios (no modificar: es compartido)"""
+        return self._indice.obtener(self._firma(), self._leer)
+
+    def _guardar(self, users):
+        directorio = os.path.dirname(os.path.abspath(self.ruta))
+        fd, temporal = tempfile.mkstemp(dir=directorio, prefix=".users-", suffix=".json")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(users, f, indent=2)
+            os.replace(temporal, self.ruta)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        self._indice.reemplazar(users, self._firma())
+
+    def obtener(self, username):
+        return self.cargar_todos().get(username)
+
+    def crear(self, username, datos):
+        with self._lock_escritura:
+            users = dict(self.cargar_todos())
+            if username in users:
+                return False
+            users[username] = dict(datos)
+            self._guardar(users)
+        return True
+
+    def actualizar_password(self, username, password_hash):
+        with self._lock_escritura:
+            users = dict(self.cargar_todos())
+            if username not in users:
+                return False
+            users[username] = {**users[username], "password": password_hash}
+            self._guardar(users)
+        return True
+
+    def estadisticas(self):
+        return self._indice.estadisticas()
+
+
+class AlmacenSecrets(AlmacenUsuarios):
+    """Usuarios definidos en Streamlit Secrets ([users.<nombre>]); solo lectura"""
+
+    solo_lectura = True
+
+    def __init__(self):
+        self._indice = _obtener_indice("secrets")
+        try:
+            import streamlit as st
+            # Invalida el índice cuando Streamlit detecta cambios en secrets.toml
+            st.secrets.file_change_listener.connect(_secrets_cambiados, weak=False)
+        except Exception:
+            pass
+
+    def _leer(self):
+        import streamlit as st
+        # Convertir los secrets a diccionario
+        users = {}
+        for username in st.secrets.users:
+            users[username] = dict(st.secrets.users[username])
+        return users
+
+    def cargar_todos(self):
+        """Índice completo de usuarios (no modificar: es compartido)"""
+        return self._indice.obtener(("secrets", _generacion_secrets), self._leer)
+
+    def obtener(self, username):
+        return self.cargar_todos().get(username)
+
+    def crear(self, username, datos):
+        raise Exception("❌ No se pueden crear usuarios automáticamente con Streamlit Secrets. Debes agregarlos manualmente en la configuración de Streamlit Cloud.")
+
+    def actualizar_password(self, username, password_hash):
+        raise Exception("❌ No se pueden modificar usuarios con Streamlit Secrets. Debes cambiarlos manualmente en la configuración de Streamlit Cloud.")
+
+    def estadisticas(self):
+        return self._indice.estadisticas()
+
+
+class AlmacenSQLite(AlmacenUsuarios):
+    """
+    Usuarios en SQLite (modo WAL). Cada hilo usa su propia conexión, las
+    búsquedas van por la clave primaria y cada escritura toca una sola fila,
+    así que varias sesiones de Streamlit pueden escribir a la vez.
+    """
+
+    def __init__(self, ruta="users.db", timeout=5.0):
+        self.ruta = ruta
+        self.timeout = timeout
+        self._local = threading.local()
+        conexion = self._conexion()
+        with conexion:
+            conexion.execute("""
+                CREATE TABLE IF NOT EXISTS usuarios (
+                    username TEXT PRIMARY KEY,
+                    password TEXT NOT NULL,
+                    nombre TEXT NOT NULL,
+                    apellido TEXT NOT NULL,
+                    creado TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+                ) WITHOUT ROWID
+            """)
+
+    def _conexion(self):
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta, timeout=self.timeout)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            conexion.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+            self._local.conexion = conexion
+        return conexion
+
+    def obtener(self, username):
+        fila = self._conexion().execute(
+            "SELECT password, nombre, apellido FROM usuarios WHERE username = ?", (username,)
+        ).fetchone()
+        if fila is None:
+            return None
+        return {"password": fila[0], "nombre": fila[1], "apellido": fila[2]}
+
+    def crear(self, username, datos):
+        conexion = self._conexion()
+        try:
+            with conexion:
+                conexion.execute(
+                    "INSERT INTO usuarios (username, password, nombre, apellido) VALUES (?, ?, ?, ?)",
+                    (username, datos["password"], datos["nombre"], datos["apellido"])
+                )
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def actualizar_password(self, username, password_hash):
+        conexion = self._conexion()
+        with conexion:
+            cursor = conexion.execute(
+                "UPDATE usuarios SET password = ? WHERE username = ?", (password_hash, username)
+            )
+        return cursor.rowcount == 1
+
+    def estadisticas(self):
+        total = self._conexion().execute("SELECT COUNT(*) FROM usuarios").fetchone()[0]
+        return {"fuente": os.path.abspath(self.ruta), "usuarios": total}
+
+    def cerrar(self):
+        """Cierra la conexión del hilo actual"""
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is not None:
+            conexion.close()
+            self._local.conexion = None
+
+
+def crear_almacen(users_file="users.json", use_secrets=False):
+    """Elige el almacén según la configuración: Secrets, SQLite (.db/.sqlite) o JSON"""
+    if use_secrets:
+        return AlmacenSecrets()
+    if users_file.lower().endswith((".db", ".sqlite", ".sqlite3")):
+        return AlmacenSQLite(users_file)
+    return AlmacenJSON(users_file)
+
+
+def migrar_json_a_sqlite(ruta_json, ruta_db):
+    """
+    Copia todos los usuarios de un users.json a una base SQLite en una sola transacción.
+    Los usuarios que ya existan en la base no se modifican.
+    Retorna (migrados, omitidos).
+    """
+    with open(ruta_json, 'r') as f:
+        users = json.load(f)
+
+    almacen = AlmacenSQLite(ruta_db)
+    conexion = almacen._conexion()
+    with conexion:
+        antes = conexion.total_changes
+        conexion.executemany(
+            "INSERT OR IGNORE INTO usuarios (username, password, nombre, apellido) VALUES (?, ?, ?, ?)",
+            (
+                (username, datos["password"], datos.get("nombre", ""), datos.get("apellido", ""))
+                for username, datos in users.items()
+            )
+        )
+        migrados = conexion.total_changes - antes
+    almacen.cerrar()
+    return migrados, len(users) - migrados
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Uso: python almacen_usuarios.py users.json users.db")
+        sys.exit(1)
+    migrados, omitidos = migrar_json_a_sqlite(sys.argv[1], sys.argv[2])
+    print(f"✅ {migrados} usuarios migrados a {sys.argv[2]}")
+    if omitidos:
+        print(f"⚠️  {omitidos} usuarios ya existían y no se modificaron")
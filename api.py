@@ -0,0 +1,375 @@
+"""
+API HTTP para generar recetas sin pasar por el formulario de Streamlit
+
+Pensada para que otros sistemas (historia clínica electrónica) generen recetas.
+Usa solo la biblioteca estándar: conexiones HTTP/1.1 persistentes (keep-alive) y
+la generación en una cola acotada (cola_generacion.py); con la cola llena
+responde 503 en vez de acumular trabajo.
+
+Uso:
+    python api.py --puerto 8600 --workers 4
+
+Autenticación con los mismos usuarios de la app (auth.AuthManager):
+    Authorization: Basic <usuario:contraseña en base64>
+    Authorization: Bearer <token de POST /v1/token>
+Con demasiados intentos fallidos por usuario o por IP responde 429 (ver limitador.py).
+
+Endpoints:
+    POST /v1/token          {"usuario": ..., "password": ...} -> {"token", "expira_en_s"}
+    POST /v1/recetas        {"nombre", "apellido", "fecha", "diagnostico",
+                             "tipo_documento", "contenido"} -> application/pdf
+    POST /v1/recetas/lote   {"recetas": [...]} -> JSON con cada PDF en base64 o su error
+    GET  /v1/salud          estado de la cola
+    GET  /metrics           métricas Prometheus (si están activas, ver metricas.py)
+
+El membrete es el del usuario autenticado (ver plantillas.py).
+"""
+import argparse
+import base64
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+
+from auth import MENSAJE_LIMITADO, obtener_auth_manager
+from cola_generacion import ERROR, LISTO, ColaGeneracion, ColaLlenaError
+from limitador import direccion_cliente
+from lote import datos_desde_fila
+from metricas import contar, iniciar_exportacion, medir, obtener_metricas
+from motor_pdf import DatosInvalidosError, METADATOS, PlantillaNoEncontradaError, renderizar
+
+MAX_CUERPO = 8 * 1024 * 1024
+
+
+class ErrorAPI(Exception):
+    """Error que se responde al cliente con su código HTTP"""
+
+    def __init__(self, estado, mensaje, cerrar=False):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.cerrar = cerrar
+
+
+class Tokens:
+    """Tokens de acceso emitidos tras un login, válidos por `ttl` segundos"""
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._tokens = {}
+
+    def emitir(self, usuario):
+        token = secrets.token_urlsafe(32)
+        ahora = time.monotonic()
+        with self._lock:
+            # Se purgan los vencidos al emitir: la cantidad queda acotada por los logins
+            for vencido in [t for t, (_, expira) in self._tokens.items() if expira <= ahora]:
+                del self._tokens[vencido]
+            self._tokens[token] = (usuario, ahora + self.ttl)
+        return token
+
+    def usuario(self, token):
+        """Usuario del token, o None si no existe o venció"""
+        with self._lock:
+            entrada = self._tokens.get(token)
+        if entrada is None or entrada[1] <= time.monotonic():
+            return None
+        return entrada[0]
+
+
+class ServidorAPI(ThreadingHTTPServer):
+    """
+    Servidor HTTP de la API. Cada conexión se atiende en su propio hilo, pero los
+    PDFs se generan en la cola acotada (workers + max_pendientes).
+    """
+
+    def __init__(self, direccion, auth_manager, workers=2, max_pendientes=64, max_lote=100,
+                 timeout=30, ttl_token=3600):
+        super().__init__(direccion, ManejadorAPI)
+        self.auth_manager = auth_manager
+        # Cada solicitud es su propia "sesión" de la cola (ver generar)
+        self.cola = ColaGeneracion(
+            max_workers=workers, max_pendientes=max_pendientes, max_por_sesion=workers, retencion=timeout * 2
+        )
+        self.workers = workers
+        self.max_lote = max_lote
+        self.timeout = timeout
+        self.tokens = Tokens(ttl_token)
+
+    def generar(self, filas, usuario):
+        """
+        Genera un PDF por fila en la cola. Retorna una lista de (datos, pdf, error)
+        en el orden de `filas`; los errores no interrumpen el resto.
+        Un lote tiene a lo sumo `workers` trabajos en la cola a la vez, así no la
+        llena ni deja esperando a las solicitudes individuales.
+        """
+        sesion = uuid.uuid4().hex
+        limite = time.monotonic() + self.timeout
+        enviados = []
+        resultados = [None] * len(filas)
+
+        def recoger(indice, datos, trabajo_id):
+            estado = self.cola.esperar(trabajo_id, max(limite - time.monotonic(), 0))
+            if estado is None or estado["estado"] not in (LISTO, ERROR):
+                resultados[indice] = (datos, None, TimeoutError(f"La generación no terminó en {self.timeout} s"))
+                return
+            self.cola.descartar(trabajo_id)
+            if estado["estado"] == LISTO:
+                resultados[indice] = (datos, estado["resultado"], None)
+            else:
+                resultados[indice] = (datos, None, _error_generacion(estado))
+
+        for indice, fila in enumerate(filas):
+            if len(enviados) >= self.workers:
+                recoger(*enviados.pop(0))
+            try:
+                datos = datos_desde_fila(fila)
+                enviados.append((indice, datos, self.cola.enviar(sesion, indice, renderizar, datos, usuario=usuario)))
+            except (ValueError, ColaLlenaError) as e:
+                resultados[indice] = (None, None, e)
+        for pendiente in enviados:
+            recoger(*pendiente)
+        return resultados
+
+    def calentar(self):
+        """Prepara la plantilla por defecto antes de recibir solicitudes"""
+        from plantillas import obtener_cache, obtener_registro
+
+        try:
+            obtener_cache(obtener_registro().resolver().ruta).obtener_empalme(METADATOS)
+        except Exception:
+            # El error se reportará en cada solicitud
+            pass
+
+
+def _error_generacion(estado):
+    """Reconstruye la excepción de un trabajo fallido para elegir el código HTTP"""
+    tipos = {
+        "DatosInvalidosError": DatosInvalidosError,
+        "PlantillaNoEncontradaError": PlantillaNoEncontradaError,
+    }
+    return tipos.get(estado["tipo_error"], RuntimeError)(estado["error"])
+
+
+def _estado_http(error):
+    if isinstance(error, ErrorAPI):
+        return error.estado
+    if isinstance(error, ColaLlenaError):
+        return 503
+    if isinstance(error, TimeoutError):
+        return 504
+    if isinstance(error, ValueError):
+        return 400
+    return 500
+
+
+class ManejadorAPI(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "RecetasAPI/1.0"
+    # Conexiones keep-alive inactivas se cierran a los 30 s
+    timeout = 30
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, estado, cuerpo, tipo="application/json; charset=utf-8", encabezados=()):
+        if not isinstance(cuerpo, bytes):
+            cuerpo = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(estado)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        for nombre, valor in encabezados:
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _leer_cuerpo(self):
+        """Lee el cuerpo completo (aun si la solicitud va a fallar, para reutilizar la conexión)"""
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            raise ErrorAPI(411, "Se requiere Content-Length", cerrar=True)
+        try:
+            largo = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            raise ErrorAPI(400, "Content-Length inválido", cerrar=True)
+        if largo > MAX_CUERPO:
+            raise ErrorAPI(413, f"El cuerpo supera {MAX_CUERPO // (1024 * 1024)} MB", cerrar=True)
+        return self.rfile.read(largo) if largo > 0 else b""
+
+    def _leer_json(self):
+        try:
+            cuerpo = json.loads(self._cuerpo or b"{}")
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise ErrorAPI(400, f"JSON inválido: {e}")
+        if not isinstance(cuerpo, dict):
+            raise ErrorAPI(400, "Se esperaba un objeto JSON")
+        return cuerpo
+
+    def _usuario(self):
+        """Usuario autenticado por Basic o Bearer; lanza ErrorAPI 401"""
+        esquema, _, credencial = self.headers.get("Authorization", "").partition(" ")
+        esquema = esquema.lower()
+        if esquema == "bearer":
+            usuario = self.server.tokens.usuario(credencial.strip())
+            if usuario is not None:
+                return usuario
+        elif esquema == "basic":
+            try:
+                usuario, _, password = base64.b64decode(credencial.strip()).decode("utf-8").partition(":")
+            except ValueError:
+                usuario = password = None
+            if usuario and self._login(usuario, password):
+                return usuario
+        raise ErrorAPI(401, "❌ Credenciales inválidas o vencidas")
+
+    def _login(self, usuario, password):
+        """True si las credenciales son válidas; lanza ErrorAPI 429 con demasiados intentos fallidos"""
+        with medir("auth"):
+            cliente = direccion_cliente(self.client_address[0], self.headers.get("X-Forwarded-For"))
+            exito, _, mensaje = self.server.auth_manager.login(usuario, password, cliente)
+        if mensaje == MENSAJE_LIMITADO:
+            contar("logins", resultado="limitado")
+            raise ErrorAPI(429, mensaje)
+        contar("logins", resultado="ok" if exito else "fallido")
+        return exito
+
+    def _atender(self, metodo):
+        ruta = self.path.split("?")[0].rstrip("/") or "/"
+        rutas = {
+            ("GET", "/v1/salud"): self._salud,
+            ("GET", "/metrics"): self._metricas,
+            ("POST", "/v1/token"): self._token,
+            ("POST", "/v1/recetas"): self._receta,
+            ("POST", "/v1/recetas/lote"): self._lote,
+        }
+        destino = rutas.get((metodo, ruta))
+        try:
+            self._cuerpo = self._leer_cuerpo()
+            if destino is None:
+                permitido = any(r == ruta for _, r in rutas)
+                raise ErrorAPI(405 if permitido else 404, "Método no permitido" if permitido else "Ruta no encontrada")
+            with medir("api" + ruta.replace("/v1", "").replace("/", "_")):
+                estado = destino()
+        except Exception as e:
+            estado = _estado_http(e)
+            if getattr(e, "cerrar", False):
+                # Quedó un cuerpo sin leer en el socket: la conexión no puede reutilizarse
+                self.close_connection = True
+            encabezados = {503: (("Retry-After", "1"),), 401: (("WWW-Authenticate", 'Basic realm="recetas"'),)}
+            self._responder(estado, {"error": str(e)}, encabezados=encabezados.get(estado, ()))
+        contar("api_solicitudes", ruta=ruta if destino else "otra", estado=estado)
+
+    def do_GET(self):
+        self._atender("GET")
+
+    def do_POST(self):
+        self._atender("POST")
+
+    def _salud(self):
+        self._responder(200, {"estado": "ok", "workers": self.server.workers, "cola": self.server.cola.estadisticas()})
+        return 200
+
+    def _metricas(self):
+        metricas = obtener_metricas()
+        if metricas is None:
+            raise ErrorAPI(404, "Métricas desactivadas (METRICAS_PUERTO o METRICAS_ARCHIVO)")
+        self._responder(200, metricas.exportar().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+        return 200
+
+    def _token(self):
+        cuerpo = self._leer_json()
+        usuario, password = cuerpo.get("usuario"), cuerpo.get("password")
+        if not (usuario and password and isinstance(usuario, str) and isinstance(password, str)):
+            raise ErrorAPI(400, "Se esperaba \"usuario\" y \"password\": textos no vacíos")
+        if not self._login(usuario, password):
+            raise ErrorAPI(401, "❌ Usuario o contraseña incorrectos")
+        token = self.server.tokens.emitir(usuario)
+        self._responder(200, {"token": token, "expira_en_s": self.server.tokens.ttl})
+        return 200
+
+    def _receta(self):
+        usuario = self._usuario()
+        datos, pdf, error = self.server.generar([self._leer_json()], usuario)[0]
+        if error is not None:
+            raise error
+        disposicion = f"attachment; filename*=UTF-8''{quote(datos.nombre_archivo())}"
+        self._responder(200, pdf, "application/pdf", (("Content-Disposition", disposicion),))
+        return 200
+
+    def _lote(self):
+        usuario = self._usuario()
+        filas = self._leer_json().get("recetas")
+        if not isinstance(filas, list) or not filas:
+            raise ErrorAPI(400, "Se esperaba \"recetas\": una lista no vacía")
+        if len(filas) > self.server.max_lote:
+            raise ErrorAPI(413, f"El lote supera {self.server.max_lote} recetas")
+        if not all(isinstance(fila, dict) for fila in filas):
+            raise ErrorAPI(400, "Cada receta debe ser un objeto JSON")
+
+        # El base64 no necesita escaparse: se empalma en el JSON en vez de pasar por
+        # json.dumps, que con PDFs de cientos de KB cuesta más que generarlos
+        recetas = []
+        generadas = 0
+        for indice, (datos, pdf, error) in enumerate(self.server.generar(filas, usuario)):
+            if error is None:
+                generadas += 1
+                inicio = json.dumps({"indice": indice, "archivo": datos.nombre_archivo()}, ensure_ascii=False)
+                recetas.append(inicio[:-1].encode("utf-8") + b', "pdf_base64": "' + base64.b64encode(pdf) + b'"}')
+            else:
+                recetas.append(json.dumps(
+                    {"indice": indice, "estado": _estado_http(error), "error": f"{type(error).__name__}: {error}"},
+                    ensure_ascii=False,
+                ).encode("utf-8"))
+        cuerpo = (
+            f'{{"generadas": {generadas}, "fallidas": {len(recetas) - generadas}, "recetas": ['.encode("utf-8")
+            + b", ".join(recetas) + b"]}"
+        )
+        self._responder(200, cuerpo)
+        return 200
+
+
+def crear_servidor(host="127.0.0.1", puerto=8600, workers=None, max_pendientes=64, max_lote=100,
+                   timeout=30, users_file=None):
+    """Crea el servidor (sin iniciarlo) con la plantilla por defecto ya preparada"""
+    auth_manager = obtener_auth_manager(users_file or os.getenv("USERS_FILE", "users.json"))
+    servidor = ServidorAPI(
+        (host, puerto), auth_manager, workers=workers or os.cpu_count() or 1,
+        max_pendientes=max_pendientes, max_lote=max_lote, timeout=timeout,
+        ttl_token=float(os.getenv("API_TOKEN_TTL_MIN", "60")) * 60,
+    )
+    servidor.calentar()
+    return servidor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP de generación de recetas")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "127.0.0.1"), help="Interfaz (127.0.0.1 = solo local)")
+    parser.add_argument("--puerto", type=int, default=int(os.getenv("API_PUERTO", "8600")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", "0")) or None,
+                        help="PDFs generándose a la vez (por defecto, CPUs disponibles)")
+    parser.add_argument("--max-pendientes", type=int, default=int(os.getenv("API_MAX_PENDIENTES", "64")),
+                        help="Trabajos en cola + en proceso antes de responder 503")
+    parser.add_argument("--max-lote", type=int, default=100, help="Recetas por solicitud de lote")
+    parser.add_argument("--timeout", type=float, default=30, help="Segundos máximos por generación")
+    args = parser.parse_args(argv)
+
+    iniciar_exportacion()
+    servidor = crear_servidor(args.host, args.puerto, args.workers, args.max_pendientes, args.max_lote, args.timeout)
+    host, puerto = servidor.server_address[:2]
+    print(f"🚀 API de recetas en http://{host}:{puerto} ({servidor.workers} workers)", flush=True)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Deteniendo la API...")
+    finally:
+        servidor.server_close()
+        servidor.cola.cerrar(esperar=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,325 @@
+"""
+Renderizado plano de recetas
+
+La plantilla se prepara una sola vez por versión: se quitan los campos del
+formulario (widgets), las anotaciones imprimibles (sellos, firmas) se dibujan
+dentro del contenido de la página y la fuente de los campos se agrega a sus
+recursos. En cada solicitud solo se escribe un content stream con el texto de
+Date/Paciente/Dx/Texto1 en la posición de cada campo, así que el PDF resultante
+no tiene formulario: los visores e impresoras no regeneran apariencias al abrirlo.
+El texto se mide y se parte con maquetado.py; lo que no entra en un campo sigue
+en páginas de continuación que repiten la página de los campos. Los textos que
+se repiten (favoritos de cada médico) pueden maquetarse de antemano con
+precompilar().
+La plantilla preparada pasa por optimizador.py, así que cada receta sale sin
+recursos ni objetos sobrantes y con los streams comprimidos al máximo.
+"""
+import re
+import threading
+from dataclasses import dataclass
+from io import BytesIO
+
+from PyPDF2 import PdfWriter
+from PyPDF2.generic import (
+    ArrayObject, DecodedStreamObject, DictionaryObject, NameObject,
+)
+
+from maquetado import HELVETICA, MetricasFuente, codificar, paginar
+from optimizador import optimizar_writer
+from utiles_pdf import valor_pdf
+
+FUENTE = "/FReceta"
+TAMANO_AUTOMATICO = 12
+TAMANO_MINIMO = 4
+MARGEN = 2
+INTERLINEADO = 1.116
+MAX_PRECOMPILADOS = 256
+
+_FLAG_MULTILINEA = 1 << 12
+_FLAG_OCULTO = 1 << 1
+_DA_FUENTE = re.compile(r"/([^\s/]+)\s+([\d.]+)\s+Tf")
+_DA_COLOR = re.compile(r"((?:[\d.]+\s+){1,4})(g|rg|k)\b")
+
+
+@dataclass(frozen=True)
+class CampoPlano:
+    """Posición y estilo de un campo de texto de la plantilla"""
+    nombre: str
+    rect: tuple
+    tamano: float
+    multilinea: bool
+    color: str = "0 g"
+    borde: str = None
+
+
+def _numeros(valores):
+    return [float(v) for v in valores]
+
+
+def _color(componentes, trazo=False):
+    operadores = {1: "g", 3: "rg", 4: "k"}
+    operador = operadores.get(len(componentes))
+    if operador is None:
+        return None
+    if trazo:
+        operador = operador.upper()
+    return " ".join(f"{c:g}" for c in componentes) + f" {operador}"
+
+
+def _campo(anotacion):
+    rect = _numeros(anotacion["/Rect"])
+    x0, x1 = sorted((rect[0], rect[2]))
+    y0, y1 = sorted((rect[1], rect[3]))
+    da = str(anotacion.get("/DA", ""))
+    fuente = _DA_FUENTE.search(da)
+    color = _DA_COLOR.search(da)
+    borde = None
+    mk = valor_pdf(anotacion, "/MK", {})
+    bc = valor_pdf(mk, "/BC", [])
+    if len(bc):
+        ancho = float(valor_pdf(valor_pdf(anotacion, "/BS", {}), "/W", 1))
+        color_borde = _color(_numeros(bc), trazo=True)
+        if color_borde and ancho > 0:
+            mitad = ancho / 2
+            borde = (f"q {color_borde} {ancho:g} w {x0 + mitad:.2f} {y0 + mitad:.2f} "
+                     f"{x1 - x0 - ancho:.2f} {y1 - y0 - ancho:.2f} re S Q")
+    return CampoPlano(
+        nombre=str(anotacion["/T"]),
+        rect=(x0, y0, x1, y1),
+        tamano=float(fuente.group(2)) if fuente else 0.0,
+        multilinea=bool(int(anotacion.get("/Ff", 0)) & _FLAG_MULTILINEA),
+        color=f"{color.group(1).strip()} {color.group(2)}" if color else "0 g",
+        borde=borde,
+    ), (fuente.group(1) if fuente else None)
+
+
+def _matriz_apariencia(rect, bbox, matriz):
+    """Matriz que lleva el BBox (transformado por /Matrix) al Rect de la anotación"""
+    a, b, c, d, e, f = matriz
+    esquinas = [(x * a + y * c + e, x * b + y * d + f) for x in (bbox[0], bbox[2]) for y in (bbox[1], bbox[3])]
+    bx0, bx1 = min(p[0] for p in esquinas), max(p[0] for p in esquinas)
+    by0, by1 = min(p[1] for p in esquinas), max(p[1] for p in esquinas)
+    if bx1 == bx0 or by1 == by0:
+        return None
+    sx = (rect[2] - rect[0]) / (bx1 - bx0)
+    sy = (rect[3] - rect[1]) / (by1 - by0)
+    return (sx, 0, 0, sy, rect[0] - bx0 * sx, rect[1] - by0 * sy)
+
+
+def _capacidad(alto, tamano):
+    """Líneas de `tamano` puntos que caben en un campo de `alto` útil"""
+    return max(int((alto - tamano) // (tamano * INTERLINEADO)) + 1, 1)
+
+
+def _cadena_pdf(codificado):
+    return b"(" + codificado.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)").replace(b"\r", b"\\r") + b")"
+
+
+class PlantillaPlana:
+    """Plantilla sin formulario más la geometría de sus campos, lista para escribir texto encima"""
+
+    def __init__(self, reader):
+        """`reader`: PdfReader de la plantilla original (no se modifica)"""
+        self._lock = threading.Lock()
+        self.campos = {}
+        self.metricas = HELVETICA
+        self._precompilados = {}
+        # Las páginas preparadas quedan en un PdfWriter que no se vuelve a modificar;
+        # cada solicitud las clona igual que PlantillaCache clona las del reader
+        self._preparada = self._preparar(reader)
+
+    def _preparar(self, reader):
+        writer = PdfWriter()
+        for page in reader.pages:
+            writer.add_page(page)
+        dr = valor_pdf(valor_pdf(valor_pdf(reader.trailer["/Root"], "/AcroForm", {}), "/DR", {}), "/Font", {})
+
+        for numero, page in enumerate(writer.pages):
+            recursos = page["/Resources"]
+            if "/XObject" not in recursos:
+                recursos[NameObject("/XObject")] = DictionaryObject()
+            xobjects = recursos["/XObject"]
+            dibujos = []
+            nombre_fuente = None
+            for indice, ref in enumerate(valor_pdf(page, "/Annots", [])):
+                anotacion = ref.get_object()
+                subtipo = anotacion.get("/Subtype")
+                if subtipo == "/Widget" and anotacion.get("/FT") == "/Tx" and "/T" in anotacion:
+                    # El texto se escribe en la primera página, donde están los campos de la receta
+                    if numero == 0:
+                        campo, fuente_da = _campo(anotacion)
+                        self.campos[campo.nombre] = campo
+                        nombre_fuente = nombre_fuente or fuente_da
+                    continue
+                flags = int(anotacion.get("/F", 0))
+                apariencia = valor_pdf(anotacion, "/AP", {}).get("/N")
+                if subtipo == "/Widget" or apariencia is None or not flags & 4 or flags & _FLAG_OCULTO:
+                    continue
+                apariencia_obj = apariencia.get_object()
+                if "/BBox" not in apariencia_obj:
+                    continue
+                matriz = _matriz_apariencia(
+                    _numeros(anotacion["/Rect"]), _numeros(apariencia_obj["/BBox"]),
+                    _numeros(apariencia_obj.get("/Matrix", [1, 0, 0, 1, 0, 0])),
+                )
+                if matriz is None:
+                    continue
+                nombre = f"/AnotPlana{indice}"
+                xobjects[NameObject(nombre)] = apariencia
+                dibujos.append(f"q {' '.join(f'{v:.4f}' for v in matriz)} cm {nombre} Do Q")
+
+            if "/Annots" in page:
+                del page["/Annots"]
+
+            fuente = valor_pdf(dr, f"/{nombre_fuente}") if nombre_fuente else None
+            if fuente is not None:
+                # Tabla de anchos armada una vez por versión de la plantilla
+                self.metricas = MetricasFuente.desde_fuente(fuente)
+                copia = fuente.clone(writer)
+            else:
+                copia = DictionaryObject({
+                    NameObject("/Type"): NameObject("/Font"),
+                    NameObject("/Subtype"): NameObject("/Type1"),
+                    NameObject("/BaseFont"): NameObject("/Helvetica"),
+                    NameObject("/Encoding"): NameObject("/WinAnsiEncoding"),
+                })
+            if "/Font" not in recursos:
+                recursos[NameObject("/Font")] = DictionaryObject()
+            recursos["/Font"][NameObject(FUENTE)] = writer._add_object(copia)
+
+            if dibujos:
+                contenido = page.get_contents().get_data() + ("\nq\n" + "\n".join(dibujos) + "\nQ\n").encode("latin-1")
+                stream = DecodedStreamObject()
+                stream.set_data(b"q\n" + contenido + b"\nQ\n")
+                page[NameObject("/Contents")] = writer._add_object(stream.flate_encode())
+
+        # La fuente de los campos se conserva aunque el contenido de la plantilla no la use
+        writer, self.optimizacion = optimizar_writer(writer, conservar=(FUENTE,))
+        return writer
+
+    def _maquetar(self, campo, valor):
+        """
+        Tamaño de letra, línea base y líneas de cada página de un campo. El texto
+        de un campo multilínea que no entra (ni con el tamaño mínimo, si el tamaño
+        es automático) sigue en páginas de continuación.
+        """
+        x0, y0, x1, y1 = campo.rect
+        ancho_max = x1 - x0 - 2 * MARGEN
+        alto = y1 - y0 - 2 * MARGEN
+        if campo.multilinea:
+            tamano = campo.tamano or TAMANO_AUTOMATICO
+            lineas = None
+            if not campo.tamano:
+                # Para elegir el tamaño solo se calculan las líneas de un campo más una
+                # (una de más indica que el texto no entra)
+                lineas = self.metricas.partir(valor, ancho_max, tamano, _capacidad(alto, tamano) + 1)
+                while tamano > TAMANO_MINIMO and len(lineas) > _capacidad(alto, tamano):
+                    tamano -= 0.5
+                    lineas = self.metricas.partir(valor, ancho_max, tamano, _capacidad(alto, tamano) + 1)
+            if lineas is None or len(lineas) > _capacidad(alto, tamano):
+                lineas = self.metricas.partir(valor, ancho_max, tamano)
+            paginas = paginar(lineas, _capacidad(alto, tamano))
+            base = y1 - MARGEN - tamano
+        else:
+            codificado = codificar(valor.replace("\n", " "))
+            tamano = campo.tamano or min(TAMANO_AUTOMATICO, alto)
+            if not campo.tamano:
+                ancho_texto = self.metricas.ancho(codificado, tamano)
+                if ancho_texto > ancho_max:
+                    tamano = max(TAMANO_MINIMO, tamano * ancho_max / ancho_texto)
+            paginas = [[codificado]]
+            # Línea base centrada verticalmente, como hacen los visores con los campos de una línea
+            base = y0 + (y1 - y0 - tamano * 0.905 + tamano * 0.211) / 2
+        return tamano, base, paginas
+
+    def precompilar(self, valores):
+        """
+        Guarda el maquetado de valores que se repiten (campo -> texto): contenidos()
+        los usa tal cual en vez de volver a partirlos en líneas y páginas.
+        """
+        for nombre, valor in valores.items():
+            if nombre in self.campos and valor:
+                maquetado = self._maquetar(self.campos[nombre], str(valor))
+                # Al llenarse se vacía: los textos descartados se maquetan en cada render, como los demás
+                if len(self._precompilados) >= MAX_PRECOMPILADOS:
+                    self._precompilados.clear()
+                self._precompilados[(nombre, str(valor))] = maquetado
+
+    def _texto_campo(self, campo, tamano, base, lineas):
+        x0, y0, x1, y1 = campo.rect
+        operaciones = [
+            f"q {x0 + 1:.2f} {y0 + 1:.2f} {x1 - x0 - 2:.2f} {y1 - y0 - 2:.2f} re W n".encode(),
+            f"BT {FUENTE} {tamano:g} Tf {campo.color} {x0 + MARGEN:.2f} {base:.2f} Td {tamano * INTERLINEADO:.2f} TL".encode(),
+        ]
+        for i, linea in enumerate(lineas):
+            if linea:
+                operaciones.append(_cadena_pdf(linea) + b" Tj")
+            if i < len(lineas) - 1:
+                operaciones.append(b"T*")
+        operaciones.append(b"ET Q")
+        return b"\n".join(operaciones)
+
+    def contenidos(self, valores):
+        """
+        Content streams con los valores de los campos (campo -> texto), uno por
+        página: el primero va sobre la página de los campos y el resto sobre sus
+        páginas de continuación, donde sigue el texto de los campos que no
+        entraron y se repite el de los demás (paciente, fecha).
+        """
+        maquetados = {}
+        for nombre, campo in self.campos.items():
+            if valores.get(nombre):
+                valor = str(valores[nombre])
+                maquetados[nombre] = self._precompilados.get((nombre, valor)) or self._maquetar(campo, valor)
+        paginas = max((len(m[2]) for m in maquetados.values()), default=1)
+        contenidos = []
+        for numero in range(paginas):
+            partes = [b"q"]
+            for nombre, campo in self.campos.items():
+                if campo.borde:
+                    partes.append(campo.borde.encode())
+                if nombre not in maquetados:
+                    continue
+                tamano, base, paginas_campo = maquetados[nombre]
+                if len(paginas_campo) == 1:
+                    lineas = paginas_campo[0]
+                elif numero < len(paginas_campo):
+                    lineas = paginas_campo[numero]
+                else:
+                    continue
+                partes.append(self._texto_campo(campo, tamano, base, lineas))
+            partes.append(b"Q")
+            contenidos.append(b"\n".join(partes))
+        return contenidos
+
+    def crear_writer(self, contenidos, metadatos=None):
+        """
+        PdfWriter con las páginas preparadas y cada content stream de `contenidos`
+        agregado como último stream de su página. Las páginas de continuación son
+        copias de la primera (comparten contenido y recursos) y van detrás de ella.
+        Retorna (writer, referencias de los streams).
+        """
+        writer = PdfWriter()
+        with self._lock:
+            paginas = list(self._preparada.pages)
+            for page in paginas[:1] * len(contenidos) + paginas[1:]:
+                writer.add_page(page)
+        referencias = []
+        for page, contenido in zip(writer.pages, contenidos):
+            stream = DecodedStreamObject()
+            stream.set_data(contenido)
+            anteriores = page.raw_get("/Contents")
+            anteriores = list(anteriores) if isinstance(anteriores, ArrayObject) else [anteriores]
+            referencia = writer._add_object(stream.flate_encode())
+            page[NameObject("/Contents")] = ArrayObject(anteriores + [referencia])
+            referencias.append(referencia)
+        if metadatos:
+            writer.add_metadata(metadatos)
+        return writer, referencias
+
+    def renderizar(self, valores, metadatos=None):
+        """PDF plano en bytes con los valores escritos sobre la plantilla"""
+        writer, _ = self.crear_writer(self.contenidos(valores), metadatos)
+        salida = BytesIO()
+        writer.write(salida)
+        return salida.getvalue()
@@ -1,10 +1,13 @@
 import streamlit as st
 from datetime import datetime
-from PyPDF2 import PdfReader, PdfWriter
-from io import BytesIO
 import os
-from auth import AuthManager
-from st_tiny_editor import st_editor
+import time
+import uuid
+from html import escape
+from auth import MENSAJE_LIMITADO, obtener_auth_manager
+from estilos import obtener_estilos
+from limitador import direccion_cliente
+from metricas import contar, iniciar_exportacion, medir
 
 # Configuración de la página
 st.set_page_config(
@@ -14,161 +17,75 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Estilos CSS personalizados
-st.markdown("""
-    <style>
-        .main-title {
-            text-align: center;
-            color: #1f77b4;
-            font-size: 2.5em;
-            margin-bottom: 1em;
-        }
-        .section-header {
-            color: #1f77b4;
-            font-size: 1.3em;
-            font-weight: bold;
-            margin-top: 1em;
-            margin-bottom: 0.5em;
-        }
-        .info-box {
-            background-color: #f0f2f6;
-            padding: 1em;
-            border-radius: 0.5em;
-            margin-bottom: 1em;
-            color: #000000;
-        }
-        .info-box pre {
-            color: #000000;
-            background-color: #ffffff;
-            padding: 0.5em;
-            border-radius: 0.3em;
-            border: 1px solid #ddd;
-        }
-        /* Mejorar visibilidad de labels */
-        label {
-            color: #1f1f1f !important;
-            font-weight: 600 !important;
-            font-size: 0.95rem !important;
-        }
-        /* Estilos para campos deshabilitados */
-        .stTextInput input:disabled,
-        .stTextArea textarea:disabled,
-        .stDateInput input:disabled {
-            background-color: #f0f0f0 !important;
-            color: #333333 !important;
-            cursor: not-allowed !important;
-            font-weight: 500 !important;
-        }
-        /* Mejorar visibilidad de campos deshabilitados */
-        .stTextInput input:disabled::placeholder,
-        .stTextArea textarea:disabled::placeholder {
-            color: #666666 !important;
-        }
-    </style>
-""", unsafe_allow_html=True)
+# Estilos CSS personalizados (estilos.css, compactado una vez por proceso)
+st.markdown(obtener_estilos(), unsafe_allow_html=True)
 
 
-def formatear_contenido(contenido):
+def mostrar_error_generacion(mensaje, tipo_error):
     """
-    Formatea el contenido para que Rp. seguido de / en nueva línea
-    se convierta en Rp./ en la misma línea.
+    Muestra en la interfaz el error de un trabajo de generación.
     """
-    # Reemplazar "Rp.\n/" por "Rp./"
-    contenido = contenido.replace("Rp.\n/", "Rp./")
-    # También manejar el caso con espacios
-    contenido = contenido.replace("Rp. \n/", "Rp./")
-    contenido = contenido.replace("Rp.\n /", "Rp./")
-    contenido = contenido.replace("Rp. \n /", "Rp./")
-    
-    return contenido
+    if tipo_error == "PlantillaNoEncontradaError":
+        st.error(f"❌ {mensaje}")
+        st.error("🔍 Archivos disponibles en el directorio:")
+        st.code("\n".join(os.listdir(".")))
+    else:
+        st.error(f"❌ Error al generar el documento: {mensaje}")
+        st.error(f"📁 Directorio actual: {os.getcwd()}")
 
 
-def generar_pdf(nombre, apellido, fecha, diagnostico, tipo_documento, contenido):
+def generar_documento(datos, username, handle_anterior):
     """
-    Rellena los campos del formulario PDF existente y los aplana para visualización directa.
-    Campos: Date, Paciente, Dx, Texto1
+    Trabajo en segundo plano: genera el PDF, lo registra en el historial
+    y lo deja en el spool. No usa Streamlit (corre fuera del script).
     """
+    pdf = renderizar(datos, usuario=username)
+    aviso_historial = None
     try:
-        # Verificar que el archivo existe
-        import os
-        if not os.path.exists("modeloReceta.pdf"):
-            raise FileNotFoundError("No se encontró el archivo modeloReceta.pdf")
-        
-        # Leer el PDF modelo
-        reader = PdfReader("modeloReceta.pdf")
-        writer = PdfWriter()
-        
-        # Copiar todas las páginas
-        for page in reader.pages:
-            writer.add_page(page)
-        
-        # Preparar los datos para rellenar
-        nombre_completo = f"{nombre} {apellido}"
-        fecha_formateada = fecha.strftime('%d/%m/%Y')
-        
-        # Formatear el contenido para que Rp.\n/ sea Rp./
-        contenido_formateado = formatear_contenido(contenido)
-        
-        # Rellenar los campos del formulario
-        writer.update_page_form_field_values(
-            writer.pages[0],
-            {
-                "Date": fecha_formateada,
-                "Paciente": nombre_completo,
-                "Dx": diagnostico,
-                "Texto1": contenido_formateado
-            }
-        )
-        
-        # Aplanar los campos del formulario para que se visualicen directamente
-        # sin necesidad de hacer click (PyPDF2 >= 3.0)
-        try:
-            writer.add_metadata({"/Producer": "Generador de Recetas Médicas"})
-            # Usar el método de aplanamiento si está disponible
-            for page in writer.pages:
-                # Marcar que los campos deben ser visibles siempre
-                if "/Annots" in page:
-                    annots = page["/Annots"]
-                    for annot_ref in annots:
-                        annot = annot_ref.get_object()
-                        if annot["/Subtype"] == "/Widget":
-                            # Hacer visible el campo por defecto
-                            if "/F" not in annot:
-                                annot["/F"] = 4  # PrintOnly flag para que sea visible
-                            else:
-                                annot["/F"] = annot["/F"] | 4
-        except Exception as e:
-            # Si hay error, intentar con el método directo flatten si existe
-            pass
-        
-        # Intentar usar flatten() si está disponible (PyPDF2 >= 3.0)
-        try:
-            writer.pages[0].flatten(list(writer.pages[0].get_fields().keys()) if hasattr(writer.pages[0], 'get_fields') else None)
-        except (AttributeError, TypeError):
-            # Si flatten no está disponible o falla, continuar sin aplanar
-            # Los campos seguirán siendo rellenados pero interactivos
-            pass
-        
-        # Escribir el PDF en un buffer
-        output_buffer = BytesIO()
-        writer.write(output_buffer)
-        output_buffer.seek(0)
-        
-        return output_buffer.getvalue()
-        
-    except FileNotFoundError as e:
-        st.error(f"❌ {str(e)}")
-        st.error("🔍 Archivos disponibles en el directorio:")
-        st.code("\n".join(os.listdir(".")))
-        raise
+        historial.registrar(username, datos, pdf)
+        historial.registrar_usos(username, vademecum.registrar_uso(username, formatear_contenido(datos.contenido)))
     except Exception as e:
-        st.error(f"❌ Error al generar PDF: {str(e)}")
-        st.error(f"📁 Directorio actual: {os.getcwd()}")
-        raise
+        aviso_historial = str(e)
+    return {"handle": spool.guardar(pdf, reemplaza=handle_anterior), "aviso_historial": aviso_historial}
+
+
+def precompilar_favoritos(favoritos, username):
+    """
+    Trabajo en segundo plano: registra el texto normalizado de los favoritos y los
+    maqueta en la plantilla del médico. No usa Streamlit (corre fuera del script).
+    """
+    for favorito in favoritos:
+        precompilar(favorito['contenido'], favorito['texto'], username, favorito['tipo_documento'])
+
 
+def programar_precompilacion(favoritos):
+    """Encola la precompilación de favoritos (con la cola llena se generan igual, sin ella)"""
+    try:
+        trabajo_id = cola.enviar(f"{st.session_state.sesion_id}:favoritos", tuple(f['id'] for f in favoritos),
+                                 precompilar_favoritos, favoritos, st.session_state.user_data['username'])
+    except ColaLlenaError:
+        return
+    if trabajo_id not in st.session_state.precompilaciones:
+        st.session_state.precompilaciones.append(trabajo_id)
+
+
+def descartar_precompilaciones():
+    """Saca de la cola las precompilaciones terminadas (nadie consulta su resultado)"""
+    pendientes = []
+    for trabajo_id in st.session_state.precompilaciones:
+        estado_trabajo = cola.estado(trabajo_id)
+        if estado_trabajo is not None and estado_trabajo['estado'] in (PENDIENTE, EN_PROCESO):
+            pendientes.append(trabajo_id)
+        else:
+            cola.descartar(trabajo_id)
+    st.session_state.precompilaciones = pendientes
+
+
+# Endpoint/archivo de métricas si METRICAS_PUERTO o METRICAS_ARCHIVO están definidos
+iniciar_exportacion()
 
-# Inicializar el gestor de autenticación
-auth_manager = AuthManager()
+# Inicializar el gestor de autenticación (compartido por el proceso)
+auth_manager = obtener_auth_manager(os.getenv('USERS_FILE', 'users.json'))
 
 # Inicializar session state para autenticación
 if 'logged_in' not in st.session_state:
@@ -188,6 +105,21 @@ if 'logged_in' not in st.session_state:
     
     st.session_state.show_register = False
 
+def cliente_actual():
+    """
+    Dirección del cliente del intento de login para el limitador: la del socket
+    de la sesión (o la que agregó un proxy confiable, ver limitador.direccion_cliente).
+    None si no se conoce: entonces solo se limita por usuario.
+    """
+    try:
+        from streamlit import runtime
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        contexto = get_script_run_ctx()
+        solicitud = runtime.get_instance().get_client(contexto.session_id).request
+    except Exception:
+        return None
+    return direccion_cliente(solicitud.remote_ip, solicitud.headers.get('X-Forwarded-For'))
+
 # Función para mostrar el formulario de login
 def show_login_page():
     st.markdown("<div class='main-title'>🔐 Iniciar Sesión</div>", unsafe_allow_html=True)
@@ -204,7 +136,9 @@ def show_login_page():
             login_button = st.form_submit_button("🔓 Iniciar Sesión", use_container_width=True)
             
             if login_button:
-                success, user_data, message = auth_manager.login(username, password)
+                with medir("auth"):
+                    success, user_data, message = auth_manager.login(username, password, cliente_actual())
+                contar("logins", resultado="ok" if success else "limitado" if message == MENSAJE_LIMITADO else "fallido")
                 
                 if success:
                     st.session_state.logged_in = True
@@ -223,6 +157,31 @@ if not st.session_state.logged_in:
     show_login_page()
     st.stop()
 
+# Solo la página principal necesita el editor y el motor de generación
+from st_tiny_editor import st_editor
+from historial import obtener_historial
+from spool import obtener_spool
+from cola_generacion import ColaLlenaError, EN_PROCESO, LISTO, PENDIENTE, obtener_cola
+from motor_pdf import DatosReceta, formatear_contenido, precompilar, renderizar
+from vademecum import obtener_vademecum
+
+# Historial de recetas generadas (compartido por el proceso)
+historial = obtener_historial(os.getenv('HISTORIAL_DB', 'historial.db'), os.getenv('HISTORIAL_PDFS', 'historial_pdfs'))
+
+# Vademécum indexado una vez por proceso; los usos de cada médico salen del historial
+vademecum = obtener_vademecum(os.getenv('VADEMECUM_CSV', 'vademecum.csv'), historial.usos_medicamentos)
+
+# Spool de PDFs generados: la sesión guarda solo el handle, no los bytes
+spool = obtener_spool()
+
+# Cola acotada para generar PDFs fuera del rerun del script; mientras el trabajo
+# está en curso el script se vuelve a ejecutar cada INTERVALO_CONSULTA segundos
+INTERVALO_CONSULTA = 0.1
+cola = obtener_cola(
+    max_workers=int(os.getenv('GENERACION_WORKERS', '2')),
+    max_pendientes=int(os.getenv('GENERACION_MAX_PENDIENTES', '32'))
+)
+
 # Si llegamos aquí, el usuario está autenticado
 # Mostrar información del usuario en la barra lateral
 with st.sidebar:
@@ -231,9 +190,39 @@ with st.sidebar:
     st.write(f"Usuario: `{st.session_state.user_data['username']}`")
     
     if st.button("🚪 Cerrar Sesión", use_container_width=True):
+        spool.liberar(st.session_state.get('pdf_handle'))
+        st.session_state.pdf_handle = None
+        st.session_state.trabajo_id = None
+        st.session_state.pdf_generated = False
         st.session_state.logged_in = False
         st.session_state.user_data = None
+        st.session_state.favoritos_de = None
         st.rerun()
+    
+    # Historial de documentos del usuario
+    st.markdown("---")
+    st.markdown("### 📚 Historial")
+    busqueda = st.text_input("Buscar paciente o diagnóstico", key='historial_busqueda')
+    rango_fechas = st.date_input("Rango de fechas", value=(), key='historial_fechas')
+    desde = rango_fechas[0] if len(rango_fechas) > 0 else None
+    hasta = rango_fechas[1] if len(rango_fechas) > 1 else desde
+    
+    with medir("historial"):
+        registros = historial.buscar(st.session_state.user_data['username'], busqueda, desde, hasta, limite=20)
+    
+    for registro in registros:
+        fecha_registro = datetime.strptime(registro['fecha'], '%Y-%m-%d').strftime('%d/%m/%Y')
+        if st.button(f"📄 {registro['apellido']}, {registro['nombre']} · {fecha_registro} · {registro['diagnostico'][:30]}",
+                     key=f"historial_{registro['id']}", use_container_width=True):
+            # Reabrir el documento guardado sin volver a generarlo
+            pdf_guardado = historial.obtener_pdf(st.session_state.user_data['username'], registro['id'])
+            if pdf_guardado:
+                datos_guardados = historial.datos_receta(registro)
+                st.session_state.form_data = dict(datos_guardados.__dict__)
+                st.session_state.pdf_handle = spool.guardar(pdf_guardado, reemplaza=st.session_state.get('pdf_handle'))
+                st.session_state.pdf_generated = True
+            else:
+                st.error("❌ No se encontró el PDF guardado de este documento.")
 
 # Título principal
 st.markdown("<div class='main-title'>📋 Generador de Recetas Médicas</div>", unsafe_allow_html=True)
@@ -252,11 +241,69 @@ if 'form_data' not in st.session_state:
 if 'pdf_generated' not in st.session_state:
     st.session_state.pdf_generated = False
 
-if 'pdf_data' not in st.session_state:
-    st.session_state.pdf_data = None
+if 'pdf_handle' not in st.session_state:
+    st.session_state.pdf_handle = None
+
+if 'trabajo_id' not in st.session_state:
+    st.session_state.trabajo_id = None
+
+if 'sesion_id' not in st.session_state:
+    st.session_state.sesion_id = uuid.uuid4().hex
+
+if 'precompilaciones' not in st.session_state:
+    st.session_state.precompilaciones = []
+descartar_precompilaciones()
+
+# Favoritos del médico: se leen una vez por sesión y se precompilan en segundo plano
+username = st.session_state.user_data['username']
+if st.session_state.get('favoritos_de') != username:
+    st.session_state.favoritos = historial.favoritos(username)
+    st.session_state.favoritos_de = username
+    if st.session_state.favoritos:
+        programar_precompilacion(st.session_state.favoritos)
+
+with st.sidebar:
+    st.markdown("---")
+    st.markdown("### ⭐ Favoritos")
+    for favorito in st.session_state.favoritos:
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            if st.button(f"⭐ {favorito['titulo']}", key=f"favorito_{favorito['id']}",
+                         use_container_width=True, disabled=st.session_state.pdf_generated):
+                # Insertar el favorito en el formulario (su texto ya está normalizado y maquetado)
+                st.session_state.form_data = {
+                    **st.session_state.form_data,
+                    'tipo_documento': favorito['tipo_documento'],
+                    'contenido': favorito['contenido']
+                }
+        with col2:
+            if st.button("🗑️", key=f"borrar_favorito_{favorito['id']}"):
+                historial.borrar_favorito(username, favorito['id'])
+                st.session_state.favoritos = [f for f in st.session_state.favoritos if f['id'] != favorito['id']]
+                st.rerun()
+    
+    if not st.session_state.favoritos:
+        st.caption("Después de generar un documento puedes guardar su contenido como favorito.")
+
+# Sugerencias del vademécum: fuera del formulario para que se actualicen al escribir
+if len(vademecum) and not st.session_state.pdf_generated:
+    with st.expander("💊 Buscar medicamento en el vademécum"):
+        termino = st.text_input("Medicamento o principio activo", key='vademecum_busqueda', placeholder="Ej.: ibu, amoxi...")
+        try:
+            with medir("vademecum"):
+                sugerencias = vademecum.sugerir(termino, st.session_state.user_data['username'])
+        except Exception as e:
+            contar("errores", etapa="vademecum", tipo=type(e).__name__)
+            sugerencias = vademecum.sugerir(termino)
+        if sugerencias:
+            st.caption("Copia la indicación y pégala en el contenido:" if termino else "Tus medicamentos más recetados:")
+            for sugerencia in sugerencias:
+                st.code(sugerencia.texto, language=None)
+        elif termino:
+            st.caption("Sin coincidencias en el vademécum.")
 
 # Formulario principal
-with st.form(key='receta_form', clear_on_submit=False):
+with medir("formulario"), st.form(key='receta_form', clear_on_submit=False):
     
     st.markdown("<div class='section-header'>👤 Información del Paciente</div>", unsafe_allow_html=True)
     
@@ -337,35 +384,58 @@ if submit_button:
         st.error("⚠️ Por favor, completa todos los campos antes de generar el documento.")
         st.session_state.pdf_generated = False
     else:
+        # Encolar la generación; si la sesión ya envió estos mismos datos se reutiliza el trabajo
+        datos = DatosReceta(**st.session_state.form_data)
         try:
+            st.session_state.trabajo_id = cola.enviar(
+                st.session_state.sesion_id, datos,
+                generar_documento, datos, st.session_state.user_data['username'], st.session_state.pdf_handle
+            )
+        except ColaLlenaError as e:
+            contar("errores", etapa="cola", tipo=type(e).__name__)
+            st.warning(f"⏳ {str(e)}")
+
+# Consultar el trabajo de generación en curso (salvo que se esté limpiando el formulario)
+if st.session_state.trabajo_id and not clear_button:
+    estado_trabajo = cola.estado(st.session_state.trabajo_id)
+    
+    if estado_trabajo is None:
+        st.session_state.trabajo_id = None
+        st.error("❌ Se perdió el trabajo de generación. Por favor, genera el documento nuevamente.")
+    elif estado_trabajo['estado'] in (PENDIENTE, EN_PROCESO):
+        # Aún en curso: mostrar el estado y volver a consultar en el próximo rerun
+        st.info("⏳ Generando documento...")
+        time.sleep(INTERVALO_CONSULTA)
+        st.rerun()
+    else:
+        cola.descartar(st.session_state.trabajo_id)
+        st.session_state.trabajo_id = None
+        
+        if estado_trabajo['estado'] == LISTO:
+            st.session_state.pdf_handle = estado_trabajo['resultado']['handle']
+            st.session_state.pdf_generated = True
             st.success("✅ Documento generado exitosamente.")
             
-            # Formatear el contenido antes de generar el PDF
-            contenido_formateado = formatear_contenido(contenido)
-            
-            # Generar PDF
-            pdf_buffer = generar_pdf(nombre, apellido, fecha, diagnostico, tipo_documento, contenido)
-            
-            # Guardar PDF en session state
-            st.session_state.pdf_data = pdf_buffer
-            st.session_state.pdf_generated = True
+            if estado_trabajo['resultado']['aviso_historial']:
+                st.warning(f"⚠️ No se pudo guardar en el historial: {estado_trabajo['resultado']['aviso_historial']}")
             
             # Mostrar vista previa del documento
+            datos = DatosReceta(**st.session_state.form_data)
+            contenido_formateado = formatear_contenido(datos.contenido)
             st.markdown("<div class='section-header'>👁️ Vista Previa del Documento</div>", unsafe_allow_html=True)
             st.markdown(f"""
             <div class='info-box'>
-                <b>Paciente:</b> {nombre} {apellido}<br>
-                <b>Fecha:</b> {fecha.strftime('%d/%m/%Y')}<br>
-                <b>Diagnóstico:</b> {diagnostico}<br>
-                <b>Tipo de Documento:</b> {tipo_documento}<br>
+                <b>Paciente:</b> {datos.nombre} {datos.apellido}<br>
+                <b>Fecha:</b> {datos.fecha.strftime('%d/%m/%Y')}<br>
+                <b>Diagnóstico:</b> {datos.diagnostico}<br>
+                <b>Tipo de Documento:</b> {datos.tipo_documento}<br>
                 <hr>
                 <b>Contenido:</b><br>
-                <pre>{contenido_formateado}</pre>
+                <pre>{escape(contenido_formateado)}</pre>
             </div>
             """, unsafe_allow_html=True)
-            
-        except Exception as e:
-            st.error(f"❌ Error al generar el documento: {str(e)}")
+        else:
+            mostrar_error_generacion(estado_trabajo['error'], estado_trabajo['tipo_error'])
             st.session_state.pdf_generated = False
 
 if clear_button:
@@ -378,29 +448,64 @@ if clear_button:
         'contenido': ''
     }
     st.session_state.pdf_generated = False
-    st.session_state.pdf_data = None
+    spool.liberar(st.session_state.pdf_handle)
+    st.session_state.pdf_handle = None
+    st.session_state.trabajo_id = None
     st.rerun()
 
 # Botón de descarga FUERA del formulario - Solución para sandbox de Streamlit Cloud
-if st.session_state.pdf_generated and st.session_state.pdf_data:
-    try:
-        # Verificar que pdf_data tenga contenido
-        if isinstance(st.session_state.pdf_data, bytes) and len(st.session_state.pdf_data) > 0:
-            # Usar st.download_button - funciona mejor en Streamlit Cloud
-            st.markdown("---")
-            st.markdown("### 📥 Descarga del Documento")
+if st.session_state.pdf_generated and st.session_state.pdf_handle:
+    with medir("descarga"):
+        try:
+            # Leer el PDF directamente del spool (sin copias intermedias en la sesión)
+            pdf_archivo = spool.abrir(st.session_state.pdf_handle)
+            pdf_tamano = spool.tamano(st.session_state.pdf_handle)
+        
+            if pdf_archivo is None:
+                st.error("❌ El documento expiró. Por favor, genéralo nuevamente o ábrelo desde el historial.")
+            elif pdf_tamano > 0:
+                # Usar st.download_button - funciona mejor en Streamlit Cloud
+                st.markdown("---")
+                st.markdown("### 📥 Descarga del Documento")
             
-            st.download_button(
-                label="📥 Descargar PDF",
-                data=st.session_state.pdf_data,
-                file_name=f"Receta_{st.session_state.form_data['apellido']}_{st.session_state.form_data['nombre']}_{st.session_state.form_data['fecha'].strftime('%Y%m%d')}.pdf",
-                mime="application/pdf",
-                use_container_width=True
-            )
-            st.info(f"✅ PDF listo para descargar ({len(st.session_state.pdf_data)} bytes)\n\n**💡 Nota:** Si el navegador te pide permiso, autoriza la descarga. Si aún así no descargas, intenta con otro navegador.")
+                with pdf_archivo:
+                    st.download_button(
+                        label="📥 Descargar PDF",
+                        data=pdf_archivo,
+                        file_name=DatosReceta(**st.session_state.form_data).nombre_archivo(),
+                        mime="application/pdf",
+                        use_container_width=True
+                    )
+                st.info(f"✅ PDF listo para descargar ({pdf_tamano} bytes)\n\n**💡 Nota:** Si el navegador te pide permiso, autoriza la descarga. Si aún así no descargas, intenta con otro navegador.")
+            else:
+                pdf_archivo.close()
+                st.error("❌ El PDF generado está vacío. Por favor, genera el documento nuevamente.")
+        except Exception as e:
+            contar("errores", etapa="descarga", tipo=type(e).__name__)
+            st.error(f"❌ Error al preparar la descarga: {str(e)}")
+            st.error(f"Documento: {st.session_state.pdf_handle}")
+
+# Guardar el contenido del documento generado como favorito del médico
+if st.session_state.pdf_generated:
+    st.markdown("---")
+    st.markdown("### ⭐ Guardar como Favorito")
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        titulo_favorito = st.text_input("Título del favorito", key='favorito_titulo',
+                                        placeholder="Ej.: Preoperatorio general", label_visibility="collapsed")
+    with col2:
+        guardar_favorito = st.button("💾 Guardar favorito", use_container_width=True)
+    if guardar_favorito:
+        if not titulo_favorito.strip():
+            st.warning("⚠️ Escribe un título para el favorito.")
         else:
-            st.error("❌ El PDF generado está vacío. Por favor, genera el documento nuevamente.")
-    except Exception as e:
-        st.error(f"❌ Error al preparar la descarga: {str(e)}")
-        st.error(f"Tipo de datos: {type(st.session_state.pdf_data)}")
-        st.error(f"Tamaño: {len(st.session_state.pdf_data) if isinstance(st.session_state.pdf_data, (bytes, bytearray)) else 'N/A'}")
\ No newline at end of file
+            favorito = historial.guardar_favorito(
+                username, titulo_favorito.strip(),
+                st.session_state.form_data['tipo_documento'], st.session_state.form_data['contenido']
+            )
+            st.session_state.favoritos = sorted(
+                [f for f in st.session_state.favoritos if f['id'] != favorito['id']] + [favorito],
+                key=lambda f: f['titulo']
+            )
+            programar_precompilacion([favorito])
+            st.rerun()
@@ -0,0 +1,253 @@
+"""
+Registro de auditoría de inicios de sesión y generaciones de PDF (JSONL, solo se agrega)
+
+Desactivado por defecto. Se activa con AUDITORIA_ARCHIVO y se ajusta con:
+    AUDITORIA_ARCHIVO=auditoria.jsonl   archivo de eventos, una línea JSON por evento
+    AUDITORIA_FSYNC_S=1                 segundos entre fsync (0 = después de cada lote)
+    AUDITORIA_MAX_MB=64                 al superarlo se rota a auditoria.jsonl.AAAAMMDD-HHMMSS
+    AUDITORIA_MAX_PENDIENTES=10000      eventos en memoria esperando ser escritos
+    AUDITORIA_MAX_PENDIENTES_MB=16      bytes de PDF en memoria esperando su hash
+
+Uso:
+    registrar("login", usuario="dra_lopez", resultado="ok")
+    registrar("generacion", usuario="dra_lopez", apellido="Núñez", nombre="Ana", pdf=pdf_bytes)
+
+registrar() solo toma la hora y agrega el evento a una cola en memoria: un hilo
+escritor los junta en lotes, calcula el sha256 de `pdf`, escribe cada lote con
+una sola escritura y hace fsync cada AUDITORIA_FSYNC_S segundos. La cola está
+acotada en eventos y en bytes de PDF: con AUDITORIA_MAX_PENDIENTES_MB ocupados
+(p. ej. el disco no responde) el hash se calcula en registrar() y solo se encola
+el resultado; con AUDITORIA_MAX_PENDIENTES eventos el evento se descarta y se
+cuenta (recetas_auditoria_descartados_total) en vez de frenar la solicitud.
+Los archivos rotados no se borran.
+"""
+import atexit
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from metricas import contar
+
+MAX_LOTE = 512
+ESPERA_LOTE = 0.05  # segundos que el escritor junta eventos antes de escribirlos
+
+
+class _Marca:
+    """Evento interno de vaciar(): se activa cuando lo anterior quedó escrito"""
+
+    __slots__ = ("listo",)
+
+    def __init__(self):
+        self.listo = threading.Event()
+
+
+def _resumir_pdf(campos):
+    """Reemplaza campos["pdf"] por su sha256 y su tamaño. Retorna el tamaño."""
+    pdf = campos.pop("pdf")
+    campos["pdf_sha256"] = hashlib.sha256(pdf).hexdigest()
+    campos["pdf_bytes"] = len(pdf)
+    return len(pdf)
+
+
+class Auditoria:
+    """
+    Cola de eventos acotada (en cantidad y en bytes de PDF) y su hilo escritor.
+
+    intervalo_fsync: segundos entre fsync del archivo (0 = después de cada lote)
+    max_bytes: tamaño a partir del cual se rota el archivo
+    max_pendientes: eventos en cola; los que llegan con la cola llena se descartan
+    max_bytes_pendientes: bytes de PDF en cola; al pasarse, el hash se calcula al registrar
+    espera_lote: segundos que se juntan eventos después del primero (menos despertares del escritor)
+    """
+
+    def __init__(self, ruta, intervalo_fsync=1.0, max_bytes=64 * 1024 * 1024, max_pendientes=10000,
+                 max_bytes_pendientes=16 * 1024 * 1024, espera_lote=ESPERA_LOTE):
+        self.ruta = ruta
+        self.intervalo_fsync = intervalo_fsync
+        self.max_bytes = max_bytes
+        self.max_pendientes = max_pendientes
+        self.max_bytes_pendientes = max_bytes_pendientes
+        self.espera_lote = espera_lote
+        self.registrados = 0
+        self.escritos = 0
+        self.descartados = 0
+        self.rotaciones = 0
+        self._cola = deque()
+        self._bytes_pendientes = 0
+        self._lock = threading.Lock()
+        self._hay_eventos = threading.Event()
+        self._cerrando = False
+        self._archivo = None
+        self._tamano = 0
+        self._ultimo_fsync = time.monotonic()
+        self._secuencia = 0
+        self._hilo = threading.Thread(target=self._escribir, name="auditoria", daemon=True)
+        self._hilo.start()
+
+    def registrar(self, evento, **campos):
+        """Encola un evento con la hora actual. Retorna False si se descartó por la cola llena."""
+        if len(self._cola) >= self.max_pendientes:
+            self.descartados += 1
+            contar("auditoria_descartados")
+            return False
+        pdf = campos.get("pdf")
+        if pdf is not None:
+            with self._lock:
+                cabe = self._bytes_pendientes + len(pdf) <= self.max_bytes_pendientes
+                if cabe:
+                    self._bytes_pendientes += len(pdf)
+            if not cabe:
+                _resumir_pdf(campos)
+        campos["ts"] = time.time()
+        campos["evento"] = evento
+        self._cola.append(campos)
+        self.registrados += 1
+        self._hay_eventos.set()
+        return True
+
+    def vaciar(self, timeout=5.0):
+        """Espera a que lo encolado hasta ahora quede escrito y sincronizado. Retorna False si vence."""
+        marca = _Marca()
+        self._cola.append(marca)
+        self._hay_eventos.set()
+        return marca.listo.wait(timeout)
+
+    def cerrar(self, timeout=5.0):
+        """Escribe lo pendiente, sincroniza y detiene el escritor"""
+        self._cerrando = True
+        self._hay_eventos.set()
+        self._hilo.join(timeout)
+
+    def _linea(self, campos):
+        self._secuencia += 1
+        registro = {"ts": datetime.fromtimestamp(campos.pop("ts")).isoformat(timespec="milliseconds"),
+                    "seq": self._secuencia, "evento": campos.pop("evento")}
+        if campos.get("pdf") is not None:
+            tamano = _resumir_pdf(campos)
+            with self._lock:
+                self._bytes_pendientes -= tamano
+        registro.update(campos)
+        return (json.dumps(registro, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+    def _abrir(self):
+        if self._archivo is None:
+            directorio = os.path.dirname(self.ruta)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            self._archivo = open(self.ruta, "ab")
+            self._tamano = self._archivo.tell()
+        return self._archivo
+
+    def _sincronizar(self):
+        if self._archivo is not None:
+            self._archivo.flush()
+            os.fsync(self._archivo.fileno())
+        self._ultimo_fsync = time.monotonic()
+
+    def _rotar(self):
+        self._sincronizar()
+        self._archivo.close()
+        self._archivo = None
+        destino = f"{self.ruta}.{datetime.now():%Y%m%d-%H%M%S}"
+        sufijo = 1
+        while os.path.exists(destino):
+            destino = f"{self.ruta}.{datetime.now():%Y%m%d-%H%M%S}.{sufijo}"
+            sufijo += 1
+        os.replace(self.ruta, destino)
+        self.rotaciones += 1
+
+    def _guardar(self, lineas):
+        """Escribe líneas ya serializadas rotando al llegar a max_bytes; si falla, avisa y reintenta sin perderlas"""
+        while lineas:
+            try:
+                archivo = self._abrir()
+                disponible = self.max_bytes - self._tamano
+                cantidad = tamano = 0
+                for linea in lineas:
+                    # Una línea más grande que max_bytes va sola en un archivo
+                    if tamano + len(linea) > disponible and (cantidad or self._tamano):
+                        break
+                    cantidad += 1
+                    tamano += len(linea)
+                if not cantidad:
+                    self._rotar()
+                    continue
+                archivo.write(b"".join(lineas[:cantidad]))
+                archivo.flush()
+                self._tamano += tamano
+                self.escritos += cantidad
+                lineas = lineas[cantidad:]
+            except OSError as e:
+                print(f"⚠️  No se pudo escribir la auditoría en {self.ruta}: {e}", file=sys.stderr)
+                self._archivo = None
+                time.sleep(1.0)
+        if time.monotonic() - self._ultimo_fsync >= self.intervalo_fsync:
+            self._sincronizar()
+
+    def _escribir(self):
+        while True:
+            # Sin eventos se despierta igual para el fsync pendiente
+            if self._hay_eventos.wait(self.intervalo_fsync or None) and not self._cerrando:
+                time.sleep(self.espera_lote)
+            self._hay_eventos.clear()
+            while self._cola:
+                lineas, marcas = [], []
+                while self._cola and len(lineas) < MAX_LOTE:
+                    campos = self._cola.popleft()
+                    if isinstance(campos, _Marca):
+                        marcas.append(campos)
+                    else:
+                        lineas.append(self._linea(campos))
+                if lineas:
+                    self._guardar(lineas)
+                if marcas:
+                    self._sincronizar()
+                    for marca in marcas:
+                        marca.listo.set()
+            if self._archivo is not None and time.monotonic() - self._ultimo_fsync >= self.intervalo_fsync:
+                self._sincronizar()
+            if self._cerrando and not self._cola:
+                self._sincronizar()
+                if self._archivo is not None:
+                    self._archivo.close()
+                    self._archivo = None
+                return
+
+
+def _desde_entorno():
+    ruta = os.getenv("AUDITORIA_ARCHIVO")
+    if not ruta:
+        return None
+    auditoria = Auditoria(
+        ruta,
+        intervalo_fsync=float(os.getenv("AUDITORIA_FSYNC_S", "1")),
+        max_bytes=int(float(os.getenv("AUDITORIA_MAX_MB", "64")) * 1024 * 1024),
+        max_pendientes=int(os.getenv("AUDITORIA_MAX_PENDIENTES", "10000")),
+        max_bytes_pendientes=int(float(os.getenv("AUDITORIA_MAX_PENDIENTES_MB", "16")) * 1024 * 1024),
+    )
+    atexit.register(auditoria.cerrar)
+    return auditoria
+
+
+_auditoria = _desde_entorno()
+
+
+def activa():
+    """True si AUDITORIA_ARCHIVO activó el registro de auditoría"""
+    return _auditoria is not None
+
+
+def obtener_auditoria():
+    """Auditoría del proceso, o None si está desactivada"""
+    return _auditoria
+
+
+def registrar(evento, **campos):
+    """Encola un evento de auditoría (no hace nada si está desactivada)"""
+    if _auditoria is not None:
+        _auditoria.registrar(evento, **campos)
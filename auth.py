@@ -1,67 +1,51 @@
 """
 Sistema de autenticación simple para la aplicación de recetas
 """
-import json
 import hashlib
-import os
-from pathlib import Path
+import threading
+
+from almacen_usuarios import crear_almacen
+from auditoria import registrar
+from limitador import crear_limitador_login
+from metricas import contar
+
+MENSAJE_LIMITADO = "⏳ Demasiados intentos. Espera unos segundos e intenta nuevamente."
+MENSAJE_OBLIGATORIOS = "⚠️ Usuario y contraseña son obligatorios"
 
 
 class AuthManager:
     """Gestor de autenticación de usuarios"""
     
-    def __init__(self, users_file="users.json", use_secrets=False):
+    def __init__(self, users_file="users.json", use_secrets=False, almacen=None, limitador=None):
+        """
+        users_file: users.json, o una base SQLite si termina en .db/.sqlite
+        almacen: instancia de AlmacenUsuarios a usar en lugar de la detectada
+        limitador: LimitadorLogin de los intentos (por defecto, el de las variables LOGIN_*)
+        """
         self.users_file = users_file
         self.use_secrets = use_secrets
         
-        # Detectar automáticamente si estamos en Streamlit Cloud
-        try:
-            import streamlit as st
-            if hasattr(st, 'secrets') and 'users' in st.secrets:
-                self.use_secrets = True
-        except:
-            pass
+        if almacen is None:
+            # Detectar automáticamente si estamos en Streamlit Cloud
+            try:
+                import streamlit as st
+                # load_if_toml_exists no muestra st.error si no hay secrets.toml (p. ej. en api.py)
+                if hasattr(st, 'secrets') and st.secrets.load_if_toml_exists() and 'users' in st.secrets:
+                    self.use_secrets = True
+            except:
+                pass
+            almacen = crear_almacen(users_file, self.use_secrets)
         
-        if not self.use_secrets:
-            self._inicializar_archivo()
-    
-    def _inicializar_archivo(self):
-        """Crea el archivo de usuarios si no existe"""
-        if not os.path.exists(self.users_file):
-            with open(self.users_file, 'w') as f:
-                json.dump({}, f)
+        self.almacen = almacen
+        self.limitador = limitador if limitador is not None else crear_limitador_login()
     
     def _hash_password(self, password):
         """Hashea la contraseña usando SHA-256"""
         return hashlib.sha256(password.encode()).hexdigest()
     
-    def _load_users(self):
-        """Carga los usuarios desde el archivo o Streamlit Secrets"""
-        if self.use_secrets:
-            try:
-                import streamlit as st
-                # Convertir los secrets a diccionario
-                users = {}
-                for username in st.secrets.users:
-                    users[username] = dict(st.secrets.users[username])
-                return users
-            except:
-                return {}
-        else:
-            try:
-                with open(self.users_file, 'r') as f:
-                    return json.load(f)
-            except:
-                return {}
-    
-    def _save_users(self, users):
-        """Guarda los usuarios en el archivo (solo modo local)"""
-        if self.use_secrets:
-            # En modo secrets, no podemos guardar automáticamente
-            raise Exception("❌ No se pueden crear usuarios automáticamente con Streamlit Secrets. Debes agregarlos manualmente en la configuración de Streamlit Cloud.")
-        
-        with open(self.users_file, 'w') as f:
-            json.dump(users, f, indent=2)
+    def estadisticas_usuarios(self):
+        """Métricas del almacén de usuarios (cargas, consultas, tiempos, total)"""
+        return self.almacen.estadisticas()
     
     def register_user(self, username, password, nombre, apellido):
         """
@@ -70,7 +54,7 @@ class AuthManager:
         """
         # Validaciones
         if not username or not password:
-            return False, "⚠️ Usuario y contraseña son obligatorios"
+            return False, MENSAJE_OBLIGATORIOS
         
         if len(username) < 3:
             return False, "⚠️ El usuario debe tener al menos 3 caracteres"
@@ -81,39 +65,50 @@ class AuthManager:
         if not nombre or not apellido:
             return False, "⚠️ Nombre y apellido son obligatorios"
         
-        # Cargar usuarios existentes
-        users = self._load_users()
-        
-        # Verificar si el usuario ya existe
-        if username in users:
-            return False, "⚠️ El usuario ya existe"
-        
-        # Crear nuevo usuario
-        users[username] = {
+        # Crear nuevo usuario (falla si ya existe)
+        creado = self.almacen.crear(username, {
             "password": self._hash_password(password),
             "nombre": nombre,
             "apellido": apellido
-        }
+        })
         
-        # Guardar
-        self._save_users(users)
+        if not creado:
+            return False, "⚠️ El usuario ya existe"
         
         return True, "✅ Usuario registrado exitosamente"
     
-    def login(self, username, password):
+    def login(self, username, password, cliente=None):
         """
         Autentica un usuario
+        cliente: dirección IP del cliente, para limitar también los intentos por cliente
         Retorna (success: bool, user_data: dict or None, message: str)
+        Con demasiados intentos fallidos se rechaza sin consultar el almacén
+        ni hashear la contraseña (ver limitador.py).
+        El resultado queda en la auditoría si está activa (ver auditoria.py).
         """
+        if not isinstance(username, str) or not isinstance(password, str):
+            return False, None, MENSAJE_OBLIGATORIOS
+        limitado = self.limitador.intentar(username, cliente)
+        if limitado:
+            contar("logins_limitados", por=limitado)
+            registrar("login", usuario=username, cliente=cliente, resultado="limitado", por=limitado)
+            return False, None, MENSAJE_LIMITADO
+        
+        success, user_data, message = self._autenticar(username, password)
+        if success:
+            self.limitador.exito(username, cliente)
+        registrar("login", usuario=username, cliente=cliente, resultado="ok" if success else "fallido")
+        return success, user_data, message
+    
+    def _autenticar(self, username, password):
         if not username or not password:
-            return False, None, "⚠️ Usuario y contraseña son obligatorios"
+            return False, None, MENSAJE_OBLIGATORIOS
         
-        users = self._load_users()
+        user_data = self.almacen.obtener(username)
         
-        if username not in users:
+        if user_data is None:
             return False, None, "❌ Usuario o contraseña incorrectos"
         
-        user_data = users[username]
         password_hash = self._hash_password(password)
         
         if user_data["password"] != password_hash:
@@ -134,17 +129,34 @@ class AuthManager:
         if len(new_password) < 6:
             return False, "⚠️ La nueva contraseña debe tener al menos 6 caracteres"
         
-        users = self._load_users()
+        user_data = self.almacen.obtener(username)
         
-        if username not in users:
+        if user_data is None:
             return False, "❌ Usuario no encontrado"
         
         # Verificar contraseña actual
-        if users[username]["password"] != self._hash_password(old_password):
+        if user_data["password"] != self._hash_password(old_password):
             return False, "❌ Contraseña actual incorrecta"
         
         # Actualizar contraseña
-        users[username]["password"] = self._hash_password(new_password)
-        self._save_users(users)
+        if not self.almacen.actualizar_password(username, self._hash_password(new_password)):
+            return False, "❌ Usuario no encontrado"
         
         return True, "✅ Contraseña actualizada exitosamente"
+
+
+_auth_managers = {}
+_auth_managers_lock = threading.Lock()
+
+
+def obtener_auth_manager(users_file="users.json"):
+    """
+    Gestor de autenticación compartido por el proceso para el archivo indicado.
+    Evita detectar Secrets y abrir el almacén de usuarios en cada rerun.
+    """
+    with _auth_managers_lock:
+        auth_manager = _auth_managers.get(users_file)
+        if auth_manager is None:
+            auth_manager = AuthManager(users_file)
+            _auth_managers[users_file] = auth_manager
+        return auth_manager
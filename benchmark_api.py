@@ -0,0 +1,224 @@
+"""
+Prueba de carga de la API HTTP (api.py)
+
+Lanza clientes concurrentes con conexiones keep-alive durante un tiempo fijo y
+reporta solicitudes por segundo, latencias (p50/p95/p99/máx) y códigos de estado.
+Sin --url levanta la API en un proceso aparte, en un directorio temporal con un
+usuario de prueba. Cada solicitud usa datos distintos (la caché de PDFs no
+ayuda) salvo con --repetir.
+
+Uso:
+    python benchmark_api.py --clientes 8 --duracion 10
+    python benchmark_api.py --clientes 8 --lote 10 --salida api.json
+    python benchmark_api.py --url http://127.0.0.1:8600 --usuario dra_lopez --password ...
+"""
+import argparse
+import hashlib
+import http.client
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+from benchmark_pdf import comparar, metadata, resumen_tiempos
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+USUARIO_PRUEBA = ("carga", "carga123")
+
+
+def receta(numero, repetir=False):
+    """Cuerpo de una receta; con `repetir` siempre la misma"""
+    numero = 0 if repetir else numero
+    return {
+        "nombre": f"Paciente{numero}",
+        "apellido": "Prueba",
+        "fecha": "2025-11-18",
+        "diagnostico": "Control",
+        "tipo_documento": "Receta (Rp.)",
+        "contenido": f"<p>Rp./</p><ul><li>Ibuprofeno 400mg c/8h</li><li>Control {numero}</li></ul>",
+    }
+
+
+class ServidorLocal:
+    """api.py en un proceso aparte, con users.json y plantilla en un directorio temporal"""
+
+    def __init__(self, workers=None, max_pendientes=64):
+        self.directorio = tempfile.mkdtemp(prefix="bench-api-")
+        shutil.copy(os.path.join(DIRECTORIO, "modeloReceta.pdf"), self.directorio)
+        usuario, password = USUARIO_PRUEBA
+        with open(os.path.join(self.directorio, "users.json"), "w", encoding="utf-8") as f:
+            json.dump({usuario: {
+                "password": hashlib.sha256(password.encode()).hexdigest(), "nombre": "Carga", "apellido": "Prueba",
+            }}, f)
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.puerto = s.getsockname()[1]
+        comando = [sys.executable, os.path.join(DIRECTORIO, "api.py"), "--puerto", str(self.puerto),
+                   "--max-pendientes", str(max_pendientes)]
+        if workers:
+            comando += ["--workers", str(workers)]
+        entorno = dict(os.environ, PYTHONPATH=DIRECTORIO)
+        self.proceso = subprocess.Popen(comando, cwd=self.directorio, env=entorno,
+                                        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        # api.py imprime una línea al quedar escuchando
+        linea = self.proceso.stdout.readline()
+        if "🚀" not in linea:
+            self.cerrar()
+            raise RuntimeError(f"La API no arrancó: {linea}{self.proceso.stdout.read()}")
+        self.url = f"http://127.0.0.1:{self.puerto}"
+
+    def cerrar(self):
+        self.proceso.terminate()
+        self.proceso.wait(timeout=10)
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+
+def _cliente(url, autorizacion, ruta, siguiente, fin, latencias, estados, recetas, lock):
+    destino = urlparse(url)
+    conexion = http.client.HTTPConnection(destino.hostname, destino.port, timeout=60)
+    encabezados = {"Content-Type": "application/json", "Authorization": autorizacion}
+    while time.perf_counter() < fin:
+        cuerpo = json.dumps(siguiente()).encode("utf-8")
+        inicio = time.perf_counter()
+        try:
+            conexion.request("POST", ruta, body=cuerpo, headers=encabezados)
+            respuesta = conexion.getresponse()
+            datos = respuesta.read()
+            estado = respuesta.status
+        except (OSError, http.client.HTTPException) as e:
+            estado = type(e).__name__
+            conexion.close()
+            conexion = http.client.HTTPConnection(destino.hostname, destino.port, timeout=60)
+        duracion = (time.perf_counter() - inicio) * 1000
+        generadas = 0
+        if estado == 200:
+            # En un lote cada receta puede fallar por separado
+            generadas = json.loads(datos)["generadas"] if ruta.endswith("/lote") else 1
+        with lock:
+            latencias.append(duracion)
+            estados[estado] += 1
+            recetas[0] += generadas
+    conexion.close()
+
+
+def _autorizacion(url, usuario, password):
+    """Token Bearer de POST /v1/token"""
+    destino = urlparse(url)
+    conexion = http.client.HTTPConnection(destino.hostname, destino.port, timeout=30)
+    conexion.request("POST", "/v1/token", body=json.dumps({"usuario": usuario, "password": password}),
+                     headers={"Content-Type": "application/json"})
+    respuesta = conexion.getresponse()
+    cuerpo = json.loads(respuesta.read())
+    conexion.close()
+    if respuesta.status != 200:
+        raise RuntimeError(f"No se pudo obtener un token: {cuerpo.get('error')}")
+    return f"Bearer {cuerpo['token']}"
+
+
+def cargar(url, autorizacion, clientes=8, duracion=10.0, lote=0, repetir=False, calentamiento=1.0):
+    """Corre la carga y devuelve el escenario con latencias, rps y códigos de estado"""
+    contador = iter(range(10 ** 12))
+    lock_contador = threading.Lock()
+
+    def siguiente():
+        with lock_contador:
+            numero = next(contador)
+        if lote:
+            return {"recetas": [receta(numero * lote + i, repetir) for i in range(lote)]}
+        return receta(numero, repetir)
+
+    ruta = "/v1/recetas/lote" if lote else "/v1/recetas"
+    resultados = {}
+    for fase, segundos in (("calentamiento", calentamiento), ("medicion", duracion)):
+        if segundos <= 0:
+            continue
+        latencias, estados, recetas, lock = [], Counter(), [0], threading.Lock()
+        fin = time.perf_counter() + segundos
+        hilos = [
+            threading.Thread(target=_cliente, args=(url, autorizacion, ruta, siguiente, fin, latencias, estados, recetas, lock))
+            for _ in range(clientes)
+        ]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        resultados[fase] = (latencias, estados, recetas[0], time.perf_counter() - inicio)
+
+    latencias, estados, generadas, transcurrido = resultados["medicion"]
+    nombre = f"api/{'lote' + str(lote) if lote else 'receta'} c={clientes}{' repetida' if repetir else ''}"
+    return {
+        "escenario": nombre,
+        **resumen_tiempos(latencias),
+        "segundos": round(transcurrido, 3),
+        "solicitudes_por_s": round(len(latencias) / transcurrido, 2),
+        "recetas_por_s": round(generadas / transcurrido, 2),
+        "recetas_fallidas": len(latencias) * (lote or 1) - generadas,
+        "estados": {str(estado): cantidad for estado, cantidad in sorted(estados.items(), key=str)},
+    }
+
+
+def imprimir(resultado):
+    print(f"{'escenario':<28} {'sol/s':>8} {'recetas/s':>10} {'p50':>9} {'p95':>9} {'p99':>9} {'máx':>9}")
+    for e in resultado["escenarios"]:
+        print(
+            f"{e['escenario']:<28} {e['solicitudes_por_s']:>8.1f} {e['recetas_por_s']:>10.1f} "
+            f"{e['p50_ms']:>7.2f}ms {e['p95_ms']:>7.2f}ms {e['p99_ms']:>7.2f}ms {e['max_ms']:>7.2f}ms"
+        )
+        estados = ', '.join(f'{k}={v}' for k, v in e['estados'].items())
+        print(f"{'':<28} estados: {estados}; recetas fallidas: {e['recetas_fallidas']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API de recetas")
+    parser.add_argument("--url", help="API ya en marcha (por defecto se levanta una local)")
+    parser.add_argument("--usuario", default=USUARIO_PRUEBA[0])
+    parser.add_argument("--password", default=USUARIO_PRUEBA[1])
+    parser.add_argument("--clientes", type=int, default=8, help="Conexiones concurrentes")
+    parser.add_argument("--duracion", type=float, default=10, help="Segundos de medición")
+    parser.add_argument("--calentamiento", type=float, default=1, help="Segundos de carga previa no medidos")
+    parser.add_argument("--lote", type=int, default=0, help="Recetas por solicitud a /v1/recetas/lote (0 = una por solicitud)")
+    parser.add_argument("--repetir", action="store_true", help="Enviar siempre la misma receta (caché de PDFs)")
+    parser.add_argument("--workers", type=int, help="Workers de la API local (por defecto, CPUs)")
+    parser.add_argument("--salida", default="bench_api.json", help="Archivo JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para detectar regresiones")
+    parser.add_argument("--umbral", type=float, default=0.2, help="Empeoramiento relativo tolerado de p50")
+    args = parser.parse_args(argv)
+
+    servidor = None if args.url else ServidorLocal(args.workers)
+    url = args.url or servidor.url
+    try:
+        print(f"⏱️  {args.clientes} clientes contra {url} durante {args.duracion} s...\n")
+        autorizacion = _autorizacion(url, args.usuario, args.password)
+        escenario = cargar(url, autorizacion, args.clientes, args.duracion, args.lote, args.repetir, args.calentamiento)
+    finally:
+        if servidor is not None:
+            servidor.cerrar()
+
+    resultado = {"metadata": metadata(), "escenarios": [escenario]}
+    imprimir(resultado)
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            anterior = json.load(f)
+        print(f"\n📊 Comparando p50 con {args.comparar}:")
+        regresiones = comparar(resultado, anterior, args.umbral)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} escenario(s) empeoraron más de {args.umbral:.0%}")
+            return 1
+        print("\n✅ Sin regresiones")
+    return 0 if escenario["estados"].get("200") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""
+Benchmark de arranque y reruns de app.py
+
+Ejecuta la app con streamlit.testing (AppTest) y mide el tiempo de ejecución del
+script (sin la espera de AppTest), cada escenario en un proceso nuevo para medir
+el arranque en frío:
+    frio/login         primera ejecución del script con la página de login
+    frio/formulario    primera ejecución ya autenticado (DEV_MODE)
+    rerun/login        reruns siguientes de la página de login
+    rerun/formulario   reruns siguientes del formulario
+
+También informa qué módulos pesados quedan importados en la página de login y
+cuánto cuesta importar cada uno. Los escenarios corren en un directorio temporal
+(users.json, historial.db y spool propios).
+
+Uso:
+    python benchmark_arranque.py --salida arranque.json
+    python benchmark_arranque.py --comparar arranque.json
+"""
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+MODULOS_PESADOS = ("st_tiny_editor", "PyPDF2", "motor_pdf", "historial", "sqlite3", "cola_generacion", "spool")
+
+
+class _EditorCompatible:
+    """
+    Importa el st_tiny_editor instalado cuando la app lo importa (así el arranque
+    paga su costo real) y, si no trae st_editor con la API que usa app.py, agrega
+    uno: el que arma `crear_editor` o, por defecto, uno que devuelve el valor inicial.
+    """
+
+    def __init__(self, crear_editor=None):
+        self.crear_editor = crear_editor
+
+    def find_spec(self, nombre, path=None, target=None):
+        if nombre != "st_tiny_editor":
+            return None
+        sys.meta_path.remove(self)
+        spec = importlib.util.find_spec(nombre)
+        if spec is None:
+            return None
+        ejecutar_original = spec.loader.exec_module
+
+        def exec_module(modulo):
+            ejecutar_original(modulo)
+            if not hasattr(modulo, "st_editor"):
+                modulo.st_editor = self.crear_editor() if self.crear_editor else (lambda value="", **kwargs: value)
+                modulo.editor_simulado = True
+
+        spec.loader.exec_module = exec_module
+        return spec
+
+
+def _hijo(escenario, repeticiones):
+    """Corre un escenario en este proceso e imprime el resultado en JSON"""
+    trabajo = tempfile.mkdtemp(prefix="bench-arranque-")
+    shutil.copy(os.path.join(DIRECTORIO, "modeloReceta.pdf"), trabajo)
+    os.chdir(trabajo)
+    os.environ["SPOOL_DIR"] = trabajo
+    os.environ["DEV_MODE"] = "true" if escenario == "formulario" else "false"
+    sys.path.insert(0, DIRECTORIO)
+
+    inicio = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    from streamlit.testing.v1 import local_script_runner
+    from streamlit.runtime.scriptrunner import script_runner
+    importar_streamlit = (time.perf_counter() - inicio) * 1000
+    # AppTest consulta cada 100 ms si el script terminó: se acorta para que el benchmark no tarde de más
+    esperar_original = local_script_runner.require_widgets_deltas
+
+    def esperar(runner, timeout=3):
+        limite = time.perf_counter() + timeout
+        while time.perf_counter() < limite:
+            if runner.script_stopped() and "client_state" in runner.event_data[-1]:
+                return
+            time.sleep(0.0005)
+        esperar_original(runner, 0)
+
+    local_script_runner.require_widgets_deltas = esperar
+    # El servidor compila app.py una vez por proceso; AppTest crea una ScriptCache por
+    # ejecución y lo recompilaría en cada rerun
+    cache_compartida = local_script_runner.ScriptCache()
+    local_script_runner.ScriptCache = lambda: cache_compartida
+    # Se mide la ejecución del script (en su propio hilo), sin la espera de AppTest
+    tiempos = []
+    correr_original = script_runner.ScriptRunner._run_script
+
+    def correr(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return correr_original(self, *args, **kwargs)
+        finally:
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+
+    script_runner.ScriptRunner._run_script = correr
+    modulos_antes = set(sys.modules)
+    sys.meta_path.insert(0, _EditorCompatible())
+
+    app = AppTest.from_file(os.path.join(DIRECTORIO, "app.py"), default_timeout=60)
+    app.run()
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    for _ in range(repeticiones):
+        app.run()
+
+    nuevos = set(sys.modules) - modulos_antes
+    print(json.dumps({
+        "importar_streamlit_ms": round(importar_streamlit, 3),
+        "primera_ms": round(tiempos[0], 3),
+        "reruns_ms": tiempos[1:],
+        "modulos": sorted(m for m in MODULOS_PESADOS if m in nuevos),
+        "editor_simulado": getattr(sys.modules.get("st_tiny_editor"), "editor_simulado", False),
+    }))
+    shutil.rmtree(trabajo, ignore_errors=True)
+
+
+def _correr_hijo(escenario, repeticiones):
+    proceso = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--hijo", escenario, "--repeticiones", str(repeticiones)],
+        capture_output=True, text=True, timeout=600,
+    )
+    if proceso.returncode != 0:
+        raise RuntimeError(f"El escenario {escenario} falló:\n{proceso.stderr[-2000:]}")
+    return json.loads(proceso.stdout.strip().splitlines()[-1])
+
+
+def costo_importacion(modulo):
+    """ms de importar `modulo` en un proceso nuevo que ya importó streamlit"""
+    codigo = (
+        "import sys, time; sys.path.insert(0, %r); import streamlit; "
+        "t = time.perf_counter(); import %s; print((time.perf_counter() - t) * 1000)"
+    ) % (DIRECTORIO, modulo)
+    proceso = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, timeout=120)
+    if proceso.returncode != 0:
+        return None
+    return round(float(proceso.stdout.strip().splitlines()[-1]), 3)
+
+
+def ejecutar(repeticiones=20, procesos=3):
+    """Mide cada página `procesos` veces en frío y `repeticiones` reruns por proceso"""
+    # Importado acá: los procesos hijos no deben cargar motor_pdf antes que la app
+    from benchmark_pdf import metadata, resumen_tiempos
+
+    escenarios = []
+    detalle = {}
+    for pagina in ("login", "formulario"):
+        primeras, reruns = [], []
+        for _ in range(procesos):
+            resultado = _correr_hijo(pagina, repeticiones)
+            primeras.append(resultado["primera_ms"])
+            reruns.extend(resultado["reruns_ms"])
+        detalle[pagina] = {"modulos": resultado["modulos"], "editor_simulado": resultado["editor_simulado"]}
+        escenarios.append({"escenario": f"frio/{pagina}", **resumen_tiempos(primeras)})
+        escenarios.append({"escenario": f"rerun/{pagina}", **resumen_tiempos(reruns)})
+    importaciones = {modulo: costo_importacion(modulo) for modulo in MODULOS_PESADOS}
+    return {"metadata": metadata(), "escenarios": escenarios, "paginas": detalle, "importaciones_ms": importaciones}
+
+
+def imprimir(resultado):
+    print(f"{'escenario':<20} {'p50':>10} {'p95':>10} {'máx':>10}")
+    for e in resultado["escenarios"]:
+        print(f"{e['escenario']:<20} {e['p50_ms']:>8.2f}ms {e['p95_ms']:>8.2f}ms {e['max_ms']:>8.2f}ms")
+    print("\nMódulos pesados importados por la primera ejecución:")
+    for pagina, detalle in resultado["paginas"].items():
+        simulado = " (editor simulado)" if detalle["editor_simulado"] else ""
+        print(f"   {pagina:<11} {', '.join(detalle['modulos']) or '-'}{simulado}")
+    print("\nCosto de importación (ms, con streamlit ya importado):")
+    for modulo, ms in resultado["importaciones_ms"].items():
+        print(f"   {modulo:<16} {'n/d' if ms is None else f'{ms:.1f}'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de arranque y reruns de app.py")
+    parser.add_argument("--repeticiones", type=int, default=20, help="Reruns medidos por proceso")
+    parser.add_argument("--procesos", type=int, default=3, help="Procesos nuevos por página (arranque en frío)")
+    parser.add_argument("--salida", default="bench_arranque.json", help="Archivo JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para detectar regresiones")
+    parser.add_argument("--umbral", type=float, default=0.2, help="Empeoramiento relativo tolerado de p50")
+    parser.add_argument("--hijo", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.hijo:
+        _hijo(args.hijo, args.repeticiones)
+        return 0
+
+    print("⏱️  Midiendo arranque y reruns de app.py...\n")
+    resultado = ejecutar(args.repeticiones, args.procesos)
+    imprimir(resultado)
+
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        from benchmark_pdf import comparar
+
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            anterior = json.load(f)
+        print(f"\n📊 Comparando p50 con {args.comparar}:")
+        regresiones = comparar(resultado, anterior, args.umbral)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} escenario(s) empeoraron más de {args.umbral:.0%}")
+            return 1
+        print("\n✅ Sin regresiones")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
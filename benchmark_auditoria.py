@@ -0,0 +1,151 @@
+"""
+Benchmark del registro de auditoría (auditoria.py): latencia agregada al login y a la generación
+
+Mide AuthManager.login (correcto y fallido) y renderizar() con la auditoría
+desactivada y activa, en rondas alternadas para que el ruido afecte a ambas
+por igual, y reporta la diferencia de p50 y p95. También mide registrar() solo
+y el caudal del escritor (eventos por segundo escritos en disco) con fsync
+después de cada lote y cada segundo. En esa ráfaga los PDF en cola superan
+max_bytes_pendientes, así que incluye el hash calculado en registrar().
+
+Uso:
+    python benchmark_auditoria.py
+    python benchmark_auditoria.py --rondas 20 --salida bench_auditoria.json
+    python benchmark_auditoria.py --comparar bench_auditoria.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+import auditoria
+from almacen_usuarios import AlmacenJSON
+from auditoria import Auditoria
+from auth import AuthManager
+from benchmark_pdf import comparar, medir, metadata, resumen_tiempos
+from motor_pdf import DatosReceta, renderizar
+
+RONDAS = 10
+REPETICIONES = {"login_ok": 200, "login_fallido": 200, "generacion": 20}
+EVENTOS_CAUDAL = 50_000
+
+
+def escenarios(directorio):
+    auth = AuthManager(almacen=AlmacenJSON(os.path.join(directorio, "users.json")))
+    auth.register_user("dra_lopez", "secreta1", "Ana", "López")
+    datos = DatosReceta("Ana", "Núñez", date(2025, 11, 18), "Control", "Receta (Rp.)",
+                        "Rp./\nIbuprofeno 400 mg - 1 comprimido cada 8 horas")
+    renderizar(datos, usar_cache=False)
+    return {
+        "login_ok": lambda: auth.login("dra_lopez", "secreta1"),
+        "login_fallido": lambda: auth.login("dra_lopez", "incorrecta"),
+        "generacion": lambda: renderizar(datos, usar_cache=False, usuario="dra_lopez"),
+    }
+
+
+def sobrecosto(directorio, rondas=RONDAS):
+    """Tiempos de cada escenario sin y con auditoría, alternando rondas"""
+    registro = Auditoria(os.path.join(directorio, "auditoria.jsonl"))
+    funciones = escenarios(directorio)
+    tiempos = {(nombre, activa): [] for nombre in funciones for activa in (False, True)}
+    for _ in range(rondas):
+        for activa in (False, True):
+            auditoria._auditoria = registro if activa else None
+            for nombre, funcion in funciones.items():
+                tiempos[(nombre, activa)] += medir(funcion, REPETICIONES[nombre])[0]
+            # El escritor termina su trabajo fuera de la medición
+            registro.vaciar()
+    auditoria._auditoria = None
+    registro.cerrar()
+
+    resultados = []
+    for nombre in funciones:
+        sin, con = resumen_tiempos(tiempos[(nombre, False)]), resumen_tiempos(tiempos[(nombre, True)])
+        resultados.append({"escenario": f"{nombre}/sin_auditoria", **sin})
+        resultados.append({
+            "escenario": f"{nombre}/con_auditoria", **con,
+            "sobrecosto_p50_us": round((con["p50_ms"] - sin["p50_ms"]) * 1000, 2),
+            "sobrecosto_p95_us": round((con["p95_ms"] - sin["p95_ms"]) * 1000, 2),
+        })
+    return resultados
+
+
+def caudal(directorio, eventos=EVENTOS_CAUDAL):
+    """Costo de registrar() y eventos por segundo escritos, con fsync por lote y cada segundo"""
+    resultados = []
+    pdf = b"%PDF-1.4\n" + b"0 0 m 100 100 l S\n" * 2000
+    for intervalo in (0.0, 1.0):
+        registro = Auditoria(os.path.join(directorio, f"caudal_{intervalo}.jsonl"), intervalo_fsync=intervalo,
+                             max_pendientes=eventos + 1)
+        inicio = time.perf_counter()
+        tiempos, _ = medir(lambda: registro.registrar("generacion", usuario="dra_lopez", apellido="Núñez",
+                                                      nombre="Ana", resultado="ok", pdf=pdf), eventos)
+        registro.vaciar(timeout=120)
+        segundos = time.perf_counter() - inicio
+        registro.cerrar()
+        resultados.append({
+            "escenario": f"registrar/fsync_{'lote' if intervalo == 0 else f'{intervalo:g}s'}",
+            **resumen_tiempos(tiempos),
+            "eventos_por_segundo": round(eventos / segundos, 1),
+            "descartados": registro.descartados,
+        })
+    return resultados
+
+
+def ejecutar(rondas=RONDAS):
+    directorio = tempfile.mkdtemp()
+    return {"metadata": metadata(), "escenarios": sobrecosto(directorio, rondas) + caudal(directorio)}
+
+
+def imprimir(resultado):
+    print(f"{'escenario':<30} {'p50':>10} {'p95':>10} {'p99':>10}   extra")
+    for e in resultado["escenarios"]:
+        extra = ""
+        if "sobrecosto_p50_us" in e:
+            extra = f"+{e['sobrecosto_p50_us']:.1f} µs p50, +{e['sobrecosto_p95_us']:.1f} µs p95"
+        elif "eventos_por_segundo" in e:
+            extra = f"{e['eventos_por_segundo']:.0f} eventos/s escritos"
+        print(f"{e['escenario']:<30} {e['p50_ms'] * 1000:>8.1f}µs {e['p95_ms'] * 1000:>8.1f}µs"
+              f" {e['p99_ms'] * 1000:>8.1f}µs   {extra}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del registro de auditoría")
+    parser.add_argument("--rondas", type=int, default=RONDAS, help="Rondas alternadas sin y con auditoría")
+    parser.add_argument("--max-sobrecosto-us", type=float, default=100.0,
+                        help="Sobrecosto máximo de p50 por llamada, en µs")
+    parser.add_argument("--salida", help="Archivo JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para detectar regresiones")
+    parser.add_argument("--umbral", type=float, default=0.2, help="Empeoramiento relativo tolerado de p50")
+    args = parser.parse_args(argv)
+
+    resultado = ejecutar(args.rondas)
+    imprimir(resultado)
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados guardados en {args.salida}")
+
+    excedidos = [e["escenario"] for e in resultado["escenarios"]
+                 if e.get("sobrecosto_p50_us", 0) > args.max_sobrecosto_us]
+    if excedidos:
+        print(f"\n❌ Sobrecosto de p50 mayor que {args.max_sobrecosto_us} µs en: {', '.join(excedidos)}")
+        return 1
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            anterior = json.load(f)
+        print(f"\n📊 Comparando p50 con {args.comparar}:")
+        regresiones = comparar(resultado, anterior, args.umbral)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} escenario(s) empeoraron más de {args.umbral:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+Benchmark de la exportación de recetas a ZIP (exportacion.py) de 10 a 100.000 documentos
+
+Arma un historial sintético con 100.000 recetas (cada una con su PDF de unos
+KB en el almacenamiento) repartidas en días consecutivos, de modo que los
+rangos de uno a cuatro días tengan 10, 1.000, 10.000 y 100.000 recetas, y
+exporta cada rango a un destino que solo cuenta bytes. Mide el tiempo total,
+las recetas por segundo y el pico de memoria asignada (tracemalloc) durante la
+exportación, que debe quedar plano: no depende de la cantidad de documentos.
+
+Uso:
+    python benchmark_exportacion.py
+    python benchmark_exportacion.py --documentos 10 --documentos 5000 --salida bench_exportacion.json
+    python benchmark_exportacion.py --comparar bench_exportacion.json
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+from benchmark_pdf import comparar, medir, metadata, pico_tracemalloc, resumen_tiempos
+from exportacion import exportar
+from historial import HistorialRecetas
+
+TAMANOS = (10, 1_000, 10_000, 100_000)
+PRIMER_DIA = date(2025, 1, 1)
+RELLENO_PDF = b"0 0 m 100 100 l S\n" * 100
+LOTE_ALTA = 5_000
+
+
+class Contador(io.RawIOBase):
+    """Destino que descarta lo escrito y solo cuenta los bytes"""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self.bytes += len(datos)
+        return len(datos)
+
+
+def poblar(historial, tamanos):
+    """Recetas sintéticas: el día i completa las primeras tamanos[i] recetas. Retorna {tamaño: (desde, hasta)}."""
+    rangos, anterior, numero = {}, 0, 0
+    conexion = historial._conexion()
+    for dia, tamano in enumerate(sorted(tamanos)):
+        fecha = (PRIMER_DIA + timedelta(days=dia)).isoformat()
+        for inicio in range(anterior, tamano, LOTE_ALTA):
+            filas = []
+            for _ in range(inicio, min(inicio + LOTE_ALTA, tamano)):
+                numero += 1
+                pdf = b"%PDF-1.4\n% receta " + str(numero).encode() + b"\n" + RELLENO_PDF + b"%%EOF\n"
+                sha256 = historial._guardar_pdf(pdf)
+                filas.append((f"medico{numero % 20}", f"Paciente{numero}", f"Apellido{numero}", fecha,
+                              "Control", "Receta (Rp.)", "Rp./ Reposo", sha256, len(pdf)))
+            with conexion:
+                conexion.executemany(
+                    """INSERT INTO recetas (username, nombre, apellido, fecha, diagnostico,
+                                            tipo_documento, contenido, pdf_sha256, pdf_bytes)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", filas
+                )
+        rangos[tamano] = (PRIMER_DIA, PRIMER_DIA + timedelta(days=dia))
+        anterior = tamano
+    return rangos
+
+
+def ejecutar(tamanos=TAMANOS, directorio=None):
+    directorio = directorio or tempfile.mkdtemp()
+    historial = HistorialRecetas(os.path.join(directorio, "historial.db"), os.path.join(directorio, "pdfs"))
+    rangos = poblar(historial, tamanos)
+    escenarios = []
+    for tamano in sorted(tamanos):
+        desde, hasta = rangos[tamano]
+        for comprimir in (False, True):
+            destino = Contador()
+
+            def exportar_rango():
+                destino.bytes = 0
+                return exportar(historial, destino, desde=desde, hasta=hasta, comprimir=comprimir)
+
+            tiempos, resumen = medir(exportar_rango, 3 if tamano <= 10_000 else 1)
+            pico = pico_tracemalloc(exportar_rango)
+            if resumen["exportadas"] != tamano or resumen["bytes_zip"] != destino.bytes:
+                raise RuntimeError(f"Exportación incompleta de {tamano} recetas: {resumen}")
+            escenarios.append({
+                "escenario": f"{'deflate' if comprimir else 'stored'}/{tamano}",
+                "documentos": tamano,
+                "mb_zip": round(destino.bytes / 1024 / 1024, 2),
+                "recetas_por_segundo": round(tamano / (min(tiempos) / 1000), 1),
+                "pico_kb": round(pico / 1024, 1),
+                **resumen_tiempos(tiempos),
+            })
+    return {"metadata": metadata(), "escenarios": escenarios}
+
+
+def imprimir(resultado):
+    print(f"{'escenario':<18} {'documentos':>10} {'p50':>11} {'recetas/s':>11} {'ZIP':>10} {'pico memoria':>13}")
+    for e in resultado["escenarios"]:
+        print(f"{e['escenario']:<18} {e['documentos']:>10} {e['p50_ms']:>9.1f}ms {e['recetas_por_segundo']:>11.0f}"
+              f" {e['mb_zip']:>8.1f}MB {e['pico_kb']:>10.1f} KB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de la exportación de recetas a ZIP")
+    parser.add_argument("--documentos", type=int, action="append", help="Recetas a exportar (repetible)")
+    parser.add_argument("--max-pico-mb", type=float, default=4.0,
+                        help="Pico de memoria asignada máximo de una exportación, en MB")
+    parser.add_argument("--salida", help="Archivo JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para detectar regresiones")
+    parser.add_argument("--umbral", type=float, default=0.2, help="Empeoramiento relativo tolerado de p50")
+    args = parser.parse_args(argv)
+
+    resultado = ejecutar(tuple(args.documentos or TAMANOS))
+    imprimir(resultado)
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados guardados en {args.salida}")
+
+    picos = [e["pico_kb"] for e in resultado["escenarios"]]
+    print(f"\n📈 Pico de memoria entre {min(picos):.0f} KB y {max(picos):.0f} KB")
+    if max(picos) > args.max_pico_mb * 1024:
+        print(f"❌ La exportación superó {args.max_pico_mb} MB de memoria asignada")
+        return 1
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            anterior = json.load(f)
+        print(f"\n📊 Comparando p50 con {args.comparar}:")
+        regresiones = comparar(resultado, anterior, args.umbral)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} escenario(s) empeoraron más de {args.umbral:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Benchmark del limitador de intentos de login (limitador.py) frente a una ráfaga de credenciales
+
+Mide el costo de un login fallido que llega al almacén de usuarios (búsqueda y
+SHA-256) y el de uno rechazado por el limitador, y simula ráfagas de 10.000 a
+1.000.000 de intentos con usuarios distintos desde pocos clientes y desde un
+cliente distinto por intento: tiempo por intento, intentos rechazados, cubos en
+memoria (acotados por LOGIN_MAX_CLAVES) y pico de memoria.
+Un usuario real que entra durante la ráfaga desde otro cliente no debe ser
+rechazado.
+
+Uso:
+    python benchmark_limitador.py
+    python benchmark_limitador.py --intentos 100000 --salida bench_limitador.json
+    python benchmark_limitador.py --comparar bench_limitador.json
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+
+from almacen_usuarios import AlmacenJSON
+from auth import MENSAJE_LIMITADO, AuthManager
+from benchmark_pdf import comparar, medir, metadata, pico_tracemalloc, resumen_tiempos
+from limitador import LimitadorLogin
+
+USUARIOS = 1000
+RAFAGAS = (10_000, 100_000, 1_000_000)
+CLIENTES_ATACANTES = 16
+REPETICIONES = 20_000
+
+
+def almacen_con_usuarios(directorio, cantidad=USUARIOS):
+    with open(os.path.join(directorio, "users.json"), "w", encoding="utf-8") as f:
+        json.dump({f"medico{i}": {"password": "x" * 64, "nombre": "N", "apellido": "A"} for i in range(cantidad)}, f)
+    return AlmacenJSON(os.path.join(directorio, "users.json"))
+
+
+def costo_por_intento(almacen):
+    """Latencia de un login fallido sin limitador y de uno rechazado por el limitador"""
+    escenarios = []
+    sin_limite = AuthManager(almacen=almacen, limitador=LimitadorLogin(0, 1.0, 0, 1.0))
+    con_limite = AuthManager(almacen=almacen, limitador=LimitadorLogin())
+    while con_limite.login("medico1", "incorrecta", "10.0.0.1")[2] != MENSAJE_LIMITADO:
+        pass
+    for nombre, auth in (("fallido/sin_limitador", sin_limite), ("fallido/limitado", con_limite)):
+        tiempos, _ = medir(lambda: auth.login("medico1", "incorrecta", "10.0.0.1"), REPETICIONES)
+        escenarios.append({"escenario": nombre, **resumen_tiempos(tiempos)})
+    return escenarios
+
+
+def _clientes(atacantes):
+    """Direcciones de los atacantes: unas pocas que se repiten o una distinta por intento"""
+    if atacantes:
+        return itertools.cycle(f"203.0.113.{i}" for i in range(atacantes))
+    return (f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in itertools.count())
+
+
+def atacar(auth, intentos, atacantes, medico=None):
+    """Intentos con usuarios distintos; con `medico` (dict) un médico entra en el medio. Retorna rechazados."""
+    rechazados = 0
+    clientes = _clientes(atacantes)
+    for i in range(intentos):
+        if auth.login(f"usuario{i}", "123456", next(clientes))[2] == MENSAJE_LIMITADO:
+            rechazados += 1
+        if medico is not None and i == intentos // 2:
+            medico["entra"] = auth.login("dra_lopez", "secreta1", "198.51.100.7")[0]
+    return rechazados
+
+
+def rafaga(almacen, intentos, atacantes):
+    """Ráfaga desde `atacantes` clientes (0 = uno distinto por intento)"""
+    auth = AuthManager(almacen=almacen, limitador=LimitadorLogin())
+    auth.register_user("dra_lopez", "secreta1", "Ana", "López")
+    medico = {}
+    inicio = time.perf_counter()
+    rechazados = atacar(auth, intentos, atacantes, medico)
+    segundos = time.perf_counter() - inicio
+    pico = pico_tracemalloc(lambda: atacar(AuthManager(almacen=almacen, limitador=LimitadorLogin()),
+                                           intentos, atacantes))
+    return {
+        "escenario": f"{'rafaga' if atacantes else 'distribuida'}/{intentos}",
+        "intentos": intentos,
+        "p50_ms": round(segundos * 1000, 3),
+        "us_por_intento": round(segundos / intentos * 1e6, 3),
+        "rechazados": rechazados,
+        "cubos_usuario": len(auth.limitador.por_usuario),
+        "cubos_cliente": len(auth.limitador.por_cliente),
+        "medico_entra": medico["entra"],
+        "pico_kb": round(pico / 1024, 1),
+    }
+
+
+def ejecutar(rafagas=RAFAGAS):
+    almacen = almacen_con_usuarios(tempfile.mkdtemp())
+    escenarios = costo_por_intento(almacen)
+    escenarios += [rafaga(almacen, intentos, atacantes) for atacantes in (CLIENTES_ATACANTES, 0)
+                   for intentos in rafagas]
+    return {"metadata": metadata(), "escenarios": escenarios}
+
+
+def imprimir(resultado):
+    for e in resultado["escenarios"]:
+        if "intentos" in e:
+            print(f"{e['escenario']:<24} {e['us_por_intento']:>7.2f} µs/intento  rechazados {e['rechazados']:>8}"
+                  f"  cubos {e['cubos_usuario']}+{e['cubos_cliente']}  pico {e['pico_kb']:.0f} KB"
+                  f"  médico {'entra' if e['medico_entra'] else 'RECHAZADO'}")
+        else:
+            print(f"{e['escenario']:<24} p50 {e['p50_ms'] * 1000:>6.2f} µs  p95 {e['p95_ms'] * 1000:>6.2f} µs"
+                  f"  p99 {e['p99_ms'] * 1000:>6.2f} µs")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del limitador de intentos de login")
+    parser.add_argument("--intentos", type=int, action="append", help="Intentos de la ráfaga (repetible)")
+    parser.add_argument("--salida", help="Archivo JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para detectar regresiones")
+    parser.add_argument("--umbral", type=float, default=0.2, help="Empeoramiento relativo tolerado de p50")
+    args = parser.parse_args(argv)
+
+    resultado = ejecutar(tuple(args.intentos or RAFAGAS))
+    imprimir(resultado)
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados guardados en {args.salida}")
+
+    rechazados = [e["escenario"] for e in resultado["escenarios"] if e.get("medico_entra") is False]
+    if rechazados:
+        print(f"\n❌ Un médico con su contraseña fue rechazado durante: {', '.join(rechazados)}")
+        return 1
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            anterior = json.load(f)
+        print(f"\n📊 Comparando p50 con {args.comparar}:")
+        regresiones = comparar(resultado, anterior, args.umbral)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} escenario(s) empeoraron más de {args.umbral:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
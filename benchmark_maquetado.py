@@ -0,0 +1,125 @@
+"""
+Benchmark del maquetado de texto (maquetado.py) con documentos de miles de líneas
+
+Mide, para indicaciones de 500 a 8000 líneas, el maquetado solo (partir en
+líneas y páginas y armar los content streams) y la generación completa del PDF
+por empalme, y verifica que el costo crezca de forma lineal (tiempo por línea
+estable al multiplicar el largo). Incluye una palabra sin espacios de 200 KB,
+que se corta por caracteres. Antes de medir comprueba que el PDF más largo tenga
+todas las páginas esperadas y que su última línea esté en la última página.
+
+Uso:
+    python benchmark_maquetado.py
+    python benchmark_maquetado.py --repeticiones 10 --salida bench_maquetado.json
+"""
+import argparse
+import json
+import sys
+from datetime import date
+from io import BytesIO
+
+from benchmark_pdf import medir, metadata, resumen_tiempos
+from motor_pdf import METADATOS, DatosReceta, campos_formulario
+from plantillas import obtener_cache
+
+FACTORES = (1, 2, 4, 8, 16)
+LINEAS_BASE = 500
+
+
+def indicaciones(lineas):
+    """Texto de `lineas` indicaciones, algunas más anchas que el campo"""
+    return "\n".join(
+        f"{i}. Paracetamol 500 mg - 1 tableta cada 6 horas"
+        + (" por 5 días, con abundante líquido y después de las comidas" if i % 3 == 0 else "")
+        for i in range(lineas)
+    )
+
+
+def campos(contenido):
+    return campos_formulario(DatosReceta('Ana', 'Núñez', date(2025, 11, 18), 'Control', 'Receta (Rp.)', contenido))
+
+
+def verificar(empalme, lineas):
+    """El PDF de `lineas` indicaciones termina con la última en su última página"""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(BytesIO(empalme.renderizar(campos(indicaciones(lineas)))), strict=True)
+    ultima = reader.pages[-1].extract_text()
+    return len(reader.pages) > 1 and f"{lineas - 1}. Paracetamol" in ultima
+
+
+def _fila(nombre, funcion, repeticiones, lineas):
+    tiempos, resultado = medir(funcion, repeticiones)
+    resumen = resumen_tiempos(tiempos)
+    return {
+        "escenario": nombre,
+        "lineas": lineas,
+        **resumen,
+        "us_por_linea": round(resumen["p50_ms"] * 1000 / lineas, 3),
+        "resultado": resultado,
+    }
+
+
+def ejecutar(repeticiones=5):
+    plantilla = obtener_cache("modeloReceta.pdf")
+    plana = plantilla.obtener_plana()
+    empalme = plantilla.obtener_empalme(METADATOS)
+
+    escenarios = []
+    for factor in FACTORES:
+        lineas = LINEAS_BASE * factor
+        valores = campos(indicaciones(lineas))
+        veces = max(repeticiones * FACTORES[-1] // factor, 3)
+        maquetado = _fila(f"maquetado/{lineas}", lambda: len(plana.contenidos(valores)), veces, lineas)
+        maquetado["paginas"] = maquetado.pop("resultado")
+        pdf = _fila(f"pdf/{lineas}", lambda: len(empalme.renderizar(valores)), veces, lineas)
+        pdf["bytes"] = pdf.pop("resultado")
+        escenarios += [maquetado, pdf]
+
+    palabra = campos("x" * 200_000)
+    fila = _fila("palabra/200KB", lambda: len(plana.contenidos(palabra)), repeticiones, 1)
+    fila["paginas"] = fila.pop("resultado")
+    del fila["us_por_linea"]
+    escenarios.append(fila)
+
+    for prefijo in ("maquetado/", "pdf/"):
+        filas = [e for e in escenarios if e["escenario"].startswith(prefijo)]
+        base = filas[0]["us_por_linea"]
+        for e in filas:
+            e["relativo"] = round(e["us_por_linea"] / base, 3) if base else None
+    return {"metadata": metadata(), "escenarios": escenarios}
+
+
+def imprimir(resultado):
+    print(f"{'escenario':<16} {'páginas':>8} {'p50':>11} {'p95':>11} {'µs/línea':>9} {'relativo':>9}")
+    for e in resultado["escenarios"]:
+        paginas = e.get("paginas", "")
+        relativo = f"{e['relativo']:>8.2f}x" if "relativo" in e else ""
+        por_linea = f"{e['us_por_linea']:>9.2f}" if "us_por_linea" in e else f"{'':>9}"
+        print(f"{e['escenario']:<16} {paginas:>8} {e['p50_ms']:>9.3f}ms {e['p95_ms']:>9.3f}ms {por_linea} {relativo}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del maquetado con miles de líneas")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Repeticiones del escenario más largo")
+    parser.add_argument("--salida", help="Archivo JSON de resultados")
+    args = parser.parse_args(argv)
+
+    empalme = obtener_cache("modeloReceta.pdf").obtener_empalme(METADATOS)
+    if not verificar(empalme, LINEAS_BASE * FACTORES[-1]):
+        print("❌ El PDF largo no tiene todas las páginas de continuación")
+        return 1
+    print("✅ El texto largo sigue en páginas de continuación hasta la última línea\n")
+
+    resultado = ejecutar(args.repeticiones)
+    imprimir(resultado)
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados guardados en {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Micro-benchmark del normalizador de contenido (normalizador.py)
+
+Compara el normalizador con la cadena original de str.replace sobre texto plano
+y HTML del editor, corto y muy largo, y verifica que el costo crezca de forma
+lineal (tiempo por KB estable al multiplicar el tamaño de la nota). Antes de
+medir comprueba que, en texto plano, el resultado sea idéntico al de la cadena
+original.
+
+Uso:
+    python benchmark_normalizador.py
+    python benchmark_normalizador.py --repeticiones 200 --salida bench_normalizador.json
+"""
+import argparse
+import json
+import random
+import sys
+
+from benchmark_pdf import CONTENIDO_CORTO, CONTENIDO_LARGO, medir, metadata, resumen_tiempos
+from normalizador import normalizar_contenido
+
+
+def formatear_encadenado(contenido):
+    """Implementación anterior de formatear_contenido (referencia)"""
+    contenido = contenido.replace("Rp.\n/", "Rp./")
+    contenido = contenido.replace("Rp. \n/", "Rp./")
+    contenido = contenido.replace("Rp.\n /", "Rp./")
+    contenido = contenido.replace("Rp. \n /", "Rp./")
+    return contenido
+
+
+def html_editor(items):
+    """HTML con la forma que produce TinyMCE: párrafos, negritas, listas y enlaces"""
+    filas = "".join(
+        f"<li><strong>Paracetamol</strong> 500&nbsp;mg - 1 tableta cada 6 horas "
+        f"(<em>máx. 4 al día</em>) <a href=\"https://vademecum.example/p{i}\">ficha</a></li>\n"
+        for i in range(items)
+    )
+    return (
+        "<p><strong>Rp.</strong></p>\n<p>/ Indicaciones:</p>\n"
+        f"<ol>\n{filas}</ol>\n<p>&nbsp;</p>\n<ul><li>Control en 7 días</li><li>Reposo &amp; hidratación</li></ul>"
+    )
+
+
+def verificar_texto_plano(casos=2000, semilla=0):
+    """Compara con la cadena original sobre texto plano aleatorio; retorna las diferencias"""
+    azar = random.Random(semilla)
+    piezas = ["Rp.", "Rp. ", "\n", " ", "/", "Rp.\n/", "Rp. \n /", "a", "ñ", "1.", "\t", "&amp;"]
+    diferencias = []
+    for _ in range(casos):
+        texto = "".join(azar.choice(piezas) for _ in range(azar.randint(0, 40)))
+        if formatear_encadenado(texto) != normalizar_contenido(texto):
+            diferencias.append(texto)
+    for texto in (CONTENIDO_CORTO, CONTENIDO_LARGO):
+        if formatear_encadenado(texto) != normalizar_contenido(texto):
+            diferencias.append(texto)
+    return diferencias
+
+
+def entradas():
+    yield "texto/corto", CONTENIDO_CORTO
+    yield "texto/largo", CONTENIDO_LARGO
+    yield "html/corto", html_editor(3)
+    yield "html/largo", html_editor(400)
+
+
+def _fila(nombre, implementacion, contenido, repeticiones):
+    tiempos, _ = medir(lambda: implementacion(contenido), repeticiones)
+    resumen = resumen_tiempos(tiempos)
+    return {
+        "escenario": nombre,
+        "bytes_entrada": len(contenido.encode("utf-8")),
+        **resumen,
+        "us_por_kb": round(resumen["p50_ms"] * 1000 / max(len(contenido) / 1024, 1e-9), 3),
+    }
+
+
+def linealidad(repeticiones, factores=(1, 4, 16, 64)):
+    """Tiempo por KB del normalizador al multiplicar el largo del HTML"""
+    filas = [
+        _fila(f"html/x{factor}", normalizar_contenido, html_editor(100 * factor), max(repeticiones // factor, 3))
+        for factor in factores
+    ]
+    base = filas[0]["us_por_kb"]
+    for fila in filas:
+        fila["relativo"] = round(fila["us_por_kb"] / base, 3) if base else None
+    return filas
+
+
+def ejecutar(repeticiones=200):
+    escenarios = []
+    for nombre, contenido in entradas():
+        escenarios.append({**_fila(nombre, formatear_encadenado, contenido, repeticiones), "implementacion": "encadenado"})
+        escenarios.append({**_fila(nombre, normalizar_contenido, contenido, repeticiones), "implementacion": "normalizador"})
+    return {"metadata": metadata(), "escenarios": escenarios, "linealidad": linealidad(repeticiones)}
+
+
+def imprimir(resultado):
+    print(f"{'escenario':<14} {'implementación':<14} {'bytes':>8} {'p50':>10} {'p95':>10} {'µs/KB':>9}")
+    for e in resultado["escenarios"]:
+        print(
+            f"{e['escenario']:<14} {e['implementacion']:<14} {e['bytes_entrada']:>8} "
+            f"{e['p50_ms']:>8.4f}ms {e['p95_ms']:>8.4f}ms {e['us_por_kb']:>9.2f}"
+        )
+    print("\nLinealidad (tiempo por KB relativo al tamaño base):")
+    for e in resultado["linealidad"]:
+        print(f"   {e['escenario']:<10} {e['bytes_entrada']:>9} bytes {e['p50_ms']:>9.3f}ms {e['relativo']:>6.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmark del normalizador de contenido")
+    parser.add_argument("--repeticiones", type=int, default=200, help="Repeticiones por escenario")
+    parser.add_argument("--salida", help="Archivo JSON de resultados")
+    args = parser.parse_args(argv)
+
+    diferencias = verificar_texto_plano()
+    if diferencias:
+        print(f"❌ {len(diferencias)} texto(s) plano(s) difieren de la cadena original, p. ej. {diferencias[0]!r}")
+        return 1
+    print("✅ Texto plano idéntico a la cadena original\n")
+
+    resultado = ejecutar(args.repeticiones)
+    imprimir(resultado)
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados guardados en {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""
+Benchmark de la generación de PDFs de recetas
+
+Mide latencia (p50/p95/p99), memoria (pico de tracemalloc y RSS) y tamaño
+del PDF para distintos escenarios: plantilla fría vs caliente, contenido
+corto vs muy largo, receta vs indicaciones. Como referencia incluye el
+relleno del formulario editable (aplanar=False), el PDF plano escrito con
+PyPDF2 en vez del empalme de bytes y un documento repetido servido desde la
+caché de PDFs.
+
+Uso:
+    python benchmark_pdf.py                                  # imprime y guarda bench_resultados.json
+    python benchmark_pdf.py --salida base.json
+    python benchmark_pdf.py --comparar base.json --umbral 0.2   # falla si p50 empeora >20%
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime
+
+from motor_pdf import DatosReceta, renderizar
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CONTENIDO_CORTO = "Rp.\n/\nIbuprofeno 400mg - 1 tableta cada 8 horas por 5 días"
+CONTENIDO_LARGO = "Rp.\n/\n" + "\n".join(
+    f"{i}. Paracetamol 500mg - 1 tableta cada 6 horas si hay dolor o fiebre (máx. 4 al día)"
+    for i in range(1, 401)
+)
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano (p entre 0 y 100)"""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    rango = math.ceil(p / 100 * len(ordenados))
+    return ordenados[min(max(rango, 1), len(ordenados)) - 1]
+
+
+def resumen_tiempos(tiempos_ms):
+    """Estadísticas de latencia en milisegundos"""
+    return {
+        "n": len(tiempos_ms),
+        "media_ms": round(sum(tiempos_ms) / len(tiempos_ms), 3) if tiempos_ms else 0.0,
+        "p50_ms": round(percentil(tiempos_ms, 50), 3),
+        "p95_ms": round(percentil(tiempos_ms, 95), 3),
+        "p99_ms": round(percentil(tiempos_ms, 99), 3),
+        "max_ms": round(max(tiempos_ms), 3) if tiempos_ms else 0.0,
+    }
+
+
+def rss_maximo_kb():
+    """Pico de memoria residente del proceso en KB (None si no está disponible)"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reporta bytes; Linux reporta KB
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def medir(funcion, repeticiones, preparar=None):
+    """Ejecuta `funcion` varias veces y devuelve (tiempos_ms, último resultado)"""
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos, resultado
+
+
+def pico_tracemalloc(funcion, preparar=None):
+    """Pico de memoria asignada (bytes) durante una ejecución de `funcion`"""
+    if preparar:
+        preparar()
+    tracemalloc.start()
+    try:
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return pico
+
+
+def _invalidar_plantilla():
+    from plantillas import obtener_cache
+    obtener_cache("modeloReceta.pdf").invalidar()
+
+
+def escenarios():
+    """Combinaciones de estado de la plantilla, longitud del contenido y tipo de documento"""
+    for estado in ("frio", "caliente"):
+        for longitud, contenido in (("corto", CONTENIDO_CORTO), ("largo", CONTENIDO_LARGO)):
+            for tipo in ("Receta (Rp.)", "Indicaciones / Notas"):
+                yield estado, longitud, tipo, DatosReceta(
+                    nombre="Juan",
+                    apellido="Pérez",
+                    fecha=date(2025, 11, 18),
+                    diagnostico="Faringitis aguda",
+                    tipo_documento=tipo,
+                    contenido=contenido,
+                )
+
+
+def ejecutar(repeticiones=50, repeticiones_frio=10):
+    """Ejecuta todos los escenarios y devuelve el resultado como diccionario"""
+    resultados = []
+    for estado, longitud, tipo, datos in escenarios():
+        preparar = _invalidar_plantilla if estado == "frio" else None
+        n = repeticiones_frio if estado == "frio" else repeticiones
+
+        def render():
+            return renderizar(datos, usar_cache=False)
+
+        if estado == "caliente":
+            render()  # asegurar la plantilla en caché
+        rss_antes = rss_maximo_kb()
+        tiempos, pdf = medir(render, n, preparar)
+        rss_despues = rss_maximo_kb()
+
+        resultados.append({
+            "escenario": f"{estado}/{longitud}/{'receta' if tipo.startswith('Receta') else 'indicaciones'}",
+            "estado": estado,
+            "contenido": longitud,
+            "tipo_documento": tipo,
+            **resumen_tiempos(tiempos),
+            "pico_tracemalloc_bytes": pico_tracemalloc(render, preparar),
+            "rss_max_kb": rss_despues,
+            "rss_incremento_kb": (rss_despues - rss_antes) if rss_antes is not None else None,
+            "bytes_salida": len(pdf),
+        })
+    resultados.append(_escenario_referencia("formulario", _render_formulario, repeticiones))
+    resultados.append(_escenario_referencia("pypdf2", _render_plano_pypdf2, repeticiones))
+    resultados.append(_escenario_cache_pdf(repeticiones))
+    return {"metadata": metadata(), "escenarios": resultados, "optimizacion": _informe_optimizacion()}
+
+
+def _informe_optimizacion():
+    """Bytes de la plantilla plana antes y después de optimizador.py"""
+    from plantillas import obtener_cache
+    return obtener_cache("modeloReceta.pdf").obtener_plana().optimizacion
+
+
+def _escenario_referencia(nombre, render, repeticiones):
+    """Escenario caliente/corto/receta con otra forma de generar el PDF"""
+    _, _, _, datos = next(escenarios())
+    render(datos)
+    tiempos, pdf = medir(lambda: render(datos), repeticiones)
+    return {
+        "escenario": f"{nombre}/corto/receta",
+        "estado": nombre,
+        "contenido": "corto",
+        "tipo_documento": datos.tipo_documento,
+        **resumen_tiempos(tiempos),
+        "pico_tracemalloc_bytes": pico_tracemalloc(lambda: render(datos)),
+        "rss_max_kb": rss_maximo_kb(),
+        "rss_incremento_kb": None,
+        "bytes_salida": len(pdf),
+    }
+
+
+def _render_formulario(datos):
+    """Referencia: rellenar los campos del formulario editable"""
+    return renderizar(datos, usar_cache=False, aplanar=False)
+
+
+def _render_plano_pypdf2(datos):
+    """Referencia: PDF plano escrito con PyPDF2 en vez del empalme de bytes"""
+    from motor_pdf import METADATOS, campos_formulario
+    from plantillas import obtener_cache
+    return obtener_cache("modeloReceta.pdf").obtener_plana().renderizar(campos_formulario(datos), METADATOS)
+
+
+def _escenario_cache_pdf(repeticiones):
+    """Documento repetido servido desde la caché de PDFs compartida"""
+    _, _, _, datos = next(escenarios())
+
+    def render():
+        return renderizar(datos)
+
+    render()
+    tiempos, pdf = medir(render, repeticiones)
+    return {
+        "escenario": "cache/corto/receta",
+        "estado": "cache",
+        "contenido": "corto",
+        "tipo_documento": datos.tipo_documento,
+        **resumen_tiempos(tiempos),
+        "pico_tracemalloc_bytes": pico_tracemalloc(render),
+        "rss_max_kb": rss_maximo_kb(),
+        "rss_incremento_kb": None,
+        "bytes_salida": len(pdf),
+    }
+
+
+def metadata():
+    """Información del entorno para poder comparar resultados entre commits"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+    try:
+        import PyPDF2
+        version_pypdf2 = PyPDF2.__version__
+    except Exception:
+        version_pypdf2 = None
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "pypdf2": version_pypdf2,
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def comparar(actual, anterior, umbral=0.2, metrica="p50_ms"):
+    """
+    Compara dos resultados escenario por escenario.
+    Retorna la lista de regresiones (cambio relativo mayor que `umbral`).
+    """
+    previos = {e["escenario"]: e for e in anterior["escenarios"]}
+    regresiones = []
+    for escenario in actual["escenarios"]:
+        previo = previos.get(escenario["escenario"])
+        if not previo or not previo.get(metrica):
+            continue
+        cambio = (escenario[metrica] - previo[metrica]) / previo[metrica]
+        fila = {
+            "escenario": escenario["escenario"],
+            "anterior": previo[metrica],
+            "actual": escenario[metrica],
+            "cambio": round(cambio, 3),
+        }
+        print(f"   {fila['escenario']:<28} {fila['anterior']:>10.3f} -> {fila['actual']:>10.3f} ({cambio:+.1%})")
+        if cambio > umbral:
+            regresiones.append(fila)
+    return regresiones
+
+
+def imprimir(resultado):
+    print(f"{'escenario':<28} {'p50':>9} {'p95':>9} {'p99':>9} {'pico alloc':>12} {'bytes':>9}")
+    for e in resultado["escenarios"]:
+        print(
+            f"{e['escenario']:<28} {e['p50_ms']:>7.2f}ms {e['p95_ms']:>7.2f}ms {e['p99_ms']:>7.2f}ms "
+            f"{e['pico_tracemalloc_bytes'] / 1024:>9.0f} KB {e['bytes_salida']:>9}"
+        )
+    optimizacion = resultado.get("optimizacion")
+    if optimizacion:
+        print(
+            f"\n📦 Plantilla optimizada: {optimizacion['bytes_antes']} -> {optimizacion['bytes_despues']} bytes "
+            f"(-{optimizacion['ahorro']:.1%})"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de generación de PDFs")
+    parser.add_argument("--repeticiones", type=int, default=50, help="Repeticiones por escenario caliente")
+    parser.add_argument("--repeticiones-frio", type=int, default=10, help="Repeticiones por escenario frío")
+    parser.add_argument("--salida", default="bench_resultados.json", help="Archivo JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para detectar regresiones")
+    parser.add_argument("--umbral", type=float, default=0.2, help="Empeoramiento relativo tolerado de p50")
+    args = parser.parse_args(argv)
+
+    print("⏱️  Ejecutando benchmark de generación de PDF...\n")
+    resultado = ejecutar(args.repeticiones, args.repeticiones_frio)
+    imprimir(resultado)
+
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            anterior = json.load(f)
+        print(f"\n📊 Comparando p50 con {args.comparar}:")
+        regresiones = comparar(resultado, anterior, args.umbral)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} escenario(s) empeoraron más de {args.umbral:.0%}")
+            return 1
+        print("\n✅ Sin regresiones")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,538 @@
+"""
+Prueba de carga de la app completa con sesiones concurrentes
+
+Levanta `streamlit run app.py` en un proceso aparte (directorio temporal con
+usuarios, historial y spool propios) y lo maneja como el navegador, por el
+websocket de Streamlit: cada sesión simulada inicia sesión con su médico
+(AuthManager), llena el formulario, genera la receta y descarga el PDF del botón
+de descarga; después limpia el formulario y repite. La carga sube por escalones
+de sesiones concurrentes y para cada uno informa recetas por segundo, latencias
+(p50/p95/p99) de login, generación y descarga, la memoria del servidor por sesión
+y el primer escalón en el que las sesiones empiezan a fallar.
+
+Los clientes corren en un solo hilo (asyncio) en la misma máquina: en un servidor
+con pocas CPUs compiten con la app y los resultados son una cota inferior.
+
+Uso:
+    python benchmark_sesiones.py
+    python benchmark_sesiones.py --escalones 1 4 16 64 --recetas 3 --salida sesiones.json
+    python benchmark_sesiones.py --url http://127.0.0.1:8501 --usuario dra_lopez --password ...
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import Counter
+from datetime import date
+
+from benchmark_arranque import _EditorCompatible
+from benchmark_pdf import comparar, metadata, resumen_tiempos
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+USUARIO_PRUEBA = ("carga", "carga123")
+ESCALONES = (1, 2, 4, 8, 16, 32, 64)
+
+# Etiquetas de app.py que usa la sesión simulada
+USUARIO = "Usuario"
+CONTRASENA = "Contraseña"
+INICIAR_SESION = "🔓 Iniciar Sesión"
+NOMBRE = "Nombre del Paciente"
+APELLIDO = "Apellido del Paciente"
+FECHA = "Fecha"
+DIAGNOSTICO = "Diagnóstico"
+GENERAR = "✅ Generar Documento"
+LIMPIAR = "🔄 Limpiar Formulario"
+DESCARGAR = "📥 Descargar PDF"
+
+
+def _editor_sin_frontend():
+    """
+    st_editor headless: un componente con la misma firma que el de st_tiny_editor,
+    cuyo valor la sesión simulada envía como lo haría el editor del navegador
+    """
+    import streamlit.components.v1 as components
+
+    componente = components.declare_component("st_editor_carga", url="http://127.0.0.1:9")
+
+    def st_editor(value="", key=None, **kwargs):
+        return componente(value=value, key=key, default=value, **kwargs)
+
+    return st_editor
+
+
+def _servidor(puerto):
+    """Corre `streamlit run app.py` en este proceso (modo --servidor)"""
+    sys.meta_path.insert(0, _EditorCompatible(_editor_sin_frontend))
+    from streamlit.web import cli
+
+    sys.argv = [
+        "streamlit", "run", os.path.join(DIRECTORIO, "app.py"),
+        "--server.port", str(puerto), "--server.address", "127.0.0.1", "--server.headless", "true",
+        "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false",
+        "--global.developmentMode", "false",
+    ]
+    cli.main()
+
+
+def rss_kb(pid):
+    """Memoria residente de un proceso en KB (None si /proc no está disponible)"""
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="ascii") as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+class ServidorApp:
+    """app.py servida por Streamlit en un proceso aparte, con `usuarios` médicos de prueba"""
+
+    def __init__(self, usuarios, workers=None, max_pendientes=None):
+        self.directorio = tempfile.mkdtemp(prefix="bench-sesiones-")
+        shutil.copy(os.path.join(DIRECTORIO, "modeloReceta.pdf"), self.directorio)
+        prefijo, password = USUARIO_PRUEBA
+        clave = hashlib.sha256(password.encode()).hexdigest()
+        with open(os.path.join(self.directorio, "users.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                f"{prefijo}{i}": {"password": clave, "nombre": "Carga", "apellido": f"Prueba{i}"}
+                for i in range(usuarios)
+            }, f)
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.puerto = s.getsockname()[1]
+        entorno = dict(os.environ, PYTHONPATH=DIRECTORIO, DEV_MODE="false", SPOOL_DIR=self.directorio)
+        if workers:
+            entorno["GENERACION_WORKERS"] = str(workers)
+        if max_pendientes:
+            entorno["GENERACION_MAX_PENDIENTES"] = str(max_pendientes)
+        self.registro = open(os.path.join(self.directorio, "streamlit.log"), "w", encoding="utf-8")
+        self.proceso = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--servidor", str(self.puerto)],
+            cwd=self.directorio, env=entorno, stdout=self.registro, stderr=subprocess.STDOUT,
+        )
+        self.url = f"http://127.0.0.1:{self.puerto}"
+        self._esperar_salud()
+
+    def _esperar_salud(self, timeout=90):
+        limite = time.perf_counter() + timeout
+        while time.perf_counter() < limite:
+            if self.proceso.poll() is not None:
+                break
+            try:
+                with urllib.request.urlopen(f"{self.url}/_stcore/health", timeout=2) as respuesta:
+                    if respuesta.status == 200:
+                        return
+            except OSError:
+                time.sleep(0.2)
+        self.registro.flush()
+        with open(self.registro.name, "r", encoding="utf-8") as f:
+            salida = f.read()[-2000:]
+        self.cerrar()
+        raise RuntimeError(f"La app no arrancó:\n{salida}")
+
+    def rss_kb(self):
+        return rss_kb(self.proceso.pid)
+
+    def cerrar(self):
+        self.proceso.terminate()
+        try:
+            self.proceso.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.proceso.kill()
+        self.registro.close()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+
+class ErrorSesion(Exception):
+    """Una sesión simulada no pudo completar una etapa"""
+
+    def __init__(self, etapa, mensaje):
+        super().__init__(f"{etapa}: {mensaje}")
+        self.etapa = etapa
+
+
+class SesionSimulada:
+    """
+    Navegador mínimo: un websocket de Streamlit, los elementos del último run del
+    script y la caché de mensajes a la que el servidor manda referencias
+    """
+
+    def __init__(self, url, timeout=60):
+        self.url = url
+        self.timeout = timeout
+        self.elementos = {}
+        self._mensajes = {}
+        self.ws = None
+
+    async def conectar(self):
+        from tornado.websocket import websocket_connect
+
+        self.ws = await websocket_connect(
+            self.url.replace("http", "ws", 1) + "/_stcore/stream",
+            connect_timeout=self.timeout, subprotocols=["streamlit"],
+        )
+
+    def cerrar(self):
+        if self.ws is not None:
+            self.ws.close()
+            self.ws = None
+
+    async def ejecutar(self, widgets=(), etapa="rerun"):
+        """Pide un run del script con los valores de `widgets` y espera a que la app quede quieta"""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+
+        mensaje = BackMsg()
+        mensaje.rerun_script.widget_states.widgets.extend(widgets)
+        await self.ws.write_message(mensaje.SerializeToString(), binary=True)
+        limite = time.perf_counter() + self.timeout
+        # st.rerun() termina el run con FINISHED_EARLY_FOR_RERUN y arranca otro solo
+        while not self._procesar(await self._leer(limite, etapa), etapa):
+            pass
+
+    async def _leer(self, limite, etapa):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        try:
+            datos = await asyncio.wait_for(self.ws.read_message(), max(limite - time.perf_counter(), 0))
+        except asyncio.TimeoutError:
+            raise ErrorSesion(etapa, f"la app no respondió en {self.timeout} s") from None
+        if datos is None:
+            raise ErrorSesion(etapa, "el servidor cerró el websocket")
+        mensaje = ForwardMsg()
+        mensaje.ParseFromString(datos)
+        if mensaje.WhichOneof("type") == "ref_hash":
+            mensaje = self._mensajes.get(mensaje.ref_hash) or await self._pedir_mensaje(mensaje.ref_hash)
+        elif mensaje.metadata.cacheable:
+            self._mensajes[mensaje.hash] = mensaje
+        return mensaje
+
+    async def _pedir_mensaje(self, hash_mensaje):
+        """Mensaje referenciado que esta sesión no tiene en caché (como hace el navegador)"""
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        from tornado.httpclient import AsyncHTTPClient
+
+        respuesta = await AsyncHTTPClient().fetch(f"{self.url}/_stcore/message?hash={hash_mensaje}")
+        mensaje = ForwardMsg()
+        mensaje.ParseFromString(respuesta.body)
+        self._mensajes[hash_mensaje] = mensaje
+        return mensaje
+
+    def _procesar(self, mensaje, etapa):
+        """Actualiza los elementos; True cuando el script terminó sin pedir otro run"""
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        tipo = mensaje.WhichOneof("type")
+        if tipo == "new_session":
+            self.elementos = {}
+        elif tipo == "delta" and mensaje.delta.WhichOneof("type") == "new_element":
+            self.elementos[tuple(mensaje.metadata.delta_path)] = mensaje.delta.new_element
+        elif tipo == "script_finished":
+            if mensaje.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                raise ErrorSesion(etapa, "app.py no compila")
+            return mensaje.script_finished == ForwardMsg.FINISHED_SUCCESSFULLY
+        return False
+
+    def widget(self, tipo, etiqueta=None):
+        """Proto del widget `tipo` con esa etiqueta en el último run (None si no está)"""
+        for elemento in self.elementos.values():
+            if elemento.WhichOneof("type") == tipo:
+                proto = getattr(elemento, tipo)
+                if etiqueta is None or proto.label == etiqueta:
+                    return proto
+        return None
+
+    def avisos(self):
+        """Errores, advertencias y excepciones que muestra la página"""
+        from streamlit.proto.Alert_pb2 import Alert
+
+        mensajes = []
+        for elemento in self.elementos.values():
+            tipo = elemento.WhichOneof("type")
+            if tipo == "alert" and elemento.alert.format in (Alert.ERROR, Alert.WARNING):
+                mensajes.append(elemento.alert.body)
+            elif tipo == "exception":
+                mensajes.append(f"{elemento.exception.type}: {elemento.exception.message}")
+        return "; ".join(mensajes) or "sin mensaje"
+
+    def valor(self, tipo, etiqueta, **valores):
+        """WidgetState del widget indicado (p. ej. string_value='Ana', trigger_value=True)"""
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        proto = self.widget(tipo, etiqueta)
+        if proto is None:
+            raise ErrorSesion("formulario", f"no se encontró el widget '{etiqueta or tipo}'")
+        return WidgetState(id=proto.id, **valores)
+
+
+def receta(numero):
+    """Datos de una receta distinta por número (la caché de PDFs no ayuda)"""
+    return {
+        "nombre": f"Paciente{numero}",
+        "apellido": "Prueba",
+        "diagnostico": f"Control {numero}",
+        "contenido": f"<p>Rp./</p><ul><li>Ibuprofeno 400mg c/8h</li><li>Control {numero}</li></ul>",
+    }
+
+
+async def _descargar(sesion):
+    from tornado.httpclient import AsyncHTTPClient
+
+    boton = sesion.widget("download_button", DESCARGAR)
+    if boton is None:
+        raise ErrorSesion("generacion", sesion.avisos())
+    respuesta = await AsyncHTTPClient().fetch(
+        sesion.url + boton.url, raise_error=False, request_timeout=sesion.timeout,
+    )
+    if respuesta.code != 200 or not respuesta.body.startswith(b"%PDF"):
+        raise ErrorSesion("descarga", f"HTTP {respuesta.code}")
+    return len(respuesta.body)
+
+
+async def recorrer_sesion(url, usuario, password, recetas, primera, tiempos, timeout=60):
+    """
+    Una visita completa: carga la página, inicia sesión y genera y descarga
+    `recetas` recetas. Agrega las latencias (ms) a `tiempos` por etapa.
+    """
+    sesion = SesionSimulada(url, timeout)
+    try:
+        inicio = time.perf_counter()
+        await sesion.conectar()
+        await sesion.ejecutar(etapa="carga")
+        tiempos["carga"].append((time.perf_counter() - inicio) * 1000)
+
+        inicio = time.perf_counter()
+        await sesion.ejecutar([
+            sesion.valor("text_input", USUARIO, string_value=usuario),
+            sesion.valor("text_input", CONTRASENA, string_value=password),
+            sesion.valor("button", INICIAR_SESION, trigger_value=True),
+        ], etapa="login")
+        if sesion.widget("button", GENERAR) is None:
+            raise ErrorSesion("login", sesion.avisos())
+        tiempos["login"].append((time.perf_counter() - inicio) * 1000)
+
+        for numero in range(primera, primera + recetas):
+            datos = receta(numero)
+            inicio = time.perf_counter()
+            await sesion.ejecutar([
+                sesion.valor("text_input", NOMBRE, string_value=datos["nombre"]),
+                sesion.valor("text_input", APELLIDO, string_value=datos["apellido"]),
+                sesion.valor("date_input", FECHA, string_array_value={"data": [date.today().strftime("%Y/%m/%d")]}),
+                sesion.valor("text_area", DIAGNOSTICO, string_value=datos["diagnostico"]),
+                sesion.valor("component_instance", None, json_value=json.dumps(datos["contenido"])),
+                sesion.valor("button", GENERAR, trigger_value=True),
+            ], etapa="generacion")
+            if sesion.widget("download_button", DESCARGAR) is None:
+                raise ErrorSesion("generacion", sesion.avisos())
+            tiempos["generacion"].append((time.perf_counter() - inicio) * 1000)
+
+            inicio = time.perf_counter()
+            await _descargar(sesion)
+            tiempos["descarga"].append((time.perf_counter() - inicio) * 1000)
+
+            if numero < primera + recetas - 1:
+                await sesion.ejecutar([sesion.valor("button", LIMPIAR, trigger_value=True)], etapa="limpiar")
+    finally:
+        sesion.cerrar()
+
+
+async def _muestrear_memoria(servidor, picos, intervalo=0.2):
+    while True:
+        rss = servidor.rss_kb() if servidor else None
+        if rss is not None:
+            picos.append(rss)
+        await asyncio.sleep(intervalo)
+
+
+async def escalon(url, sesiones, recetas, credenciales, servidor=None, timeout=60, primera=0):
+    """Corre `sesiones` visitas a la vez y devuelve el escenario con latencias, errores y memoria"""
+    tiempos = {"carga": [], "login": [], "generacion": [], "descarga": []}
+    errores = Counter()
+    rss_antes = servidor.rss_kb() if servidor else None
+    picos = []
+    muestreo = asyncio.ensure_future(_muestrear_memoria(servidor, picos))
+
+    async def visita(indice):
+        usuario, password = credenciales(indice)
+        try:
+            await recorrer_sesion(url, usuario, password, recetas, primera + indice * recetas, tiempos, timeout)
+            return True
+        except ErrorSesion as e:
+            errores[f"{e.etapa}: {str(e).split(': ', 1)[1][:80]}"] += 1
+        except Exception as e:
+            errores[f"{type(e).__name__}: {str(e)[:80]}"] += 1
+        return False
+
+    inicio = time.perf_counter()
+    completadas = sum(await asyncio.gather(*(visita(i) for i in range(sesiones))))
+    transcurrido = time.perf_counter() - inicio
+    muestreo.cancel()
+    # Las sesiones desconectadas quedan un rato en el servidor por si el navegador vuelve
+    await asyncio.sleep(1)
+    rss_despues = servidor.rss_kb() if servidor else None
+    rss_pico = max(picos + [rss_despues or 0]) or None
+
+    return {
+        "escenario": f"sesiones/{sesiones}",
+        "sesiones": sesiones,
+        **resumen_tiempos(tiempos["generacion"]),
+        "segundos": round(transcurrido, 3),
+        "completadas": completadas,
+        "fallidas": sesiones - completadas,
+        "recetas": len(tiempos["descarga"]),
+        "recetas_por_s": round(len(tiempos["descarga"]) / transcurrido, 2),
+        "etapas": {etapa: resumen_tiempos(valores) for etapa, valores in tiempos.items()},
+        "rss_antes_kb": rss_antes,
+        "rss_pico_kb": rss_pico,
+        "rss_despues_kb": rss_despues,
+        "kb_por_sesion": round((rss_pico - rss_antes) / sesiones, 1) if rss_antes and rss_pico else None,
+        "errores": dict(errores.most_common()),
+    }
+
+
+def falla(escenario, max_p95_ms, umbral_errores):
+    """Motivo por el que el escalón se considera fallido (None si aguantó)"""
+    if escenario["fallidas"] > umbral_errores * escenario["sesiones"]:
+        return f"{escenario['fallidas']} de {escenario['sesiones']} sesiones fallaron"
+    if escenario["p95_ms"] > max_p95_ms:
+        return f"p95 de generación {escenario['p95_ms'] / 1000:.1f} s > {max_p95_ms / 1000:.1f} s"
+    return None
+
+
+async def rampa(url, escalones, recetas, credenciales, servidor=None, timeout=60,
+                max_p95_ms=10000, umbral_errores=0.0, continuar=False):
+    """Sube la carga por escalones hasta el primero que falla (o todos con `continuar`)"""
+    from tornado.httpclient import AsyncHTTPClient
+
+    # Las descargas de todas las sesiones van en paralelo, como desde navegadores distintos
+    AsyncHTTPClient.configure(None, max_clients=max(escalones) * 2)
+    # Una visita sin medir: la primera receta importa el motor de PDFs y prepara la plantilla
+    await recorrer_sesion(url, *credenciales(0), 1, 0, {"carga": [], "login": [], "generacion": [], "descarga": []}, timeout)
+    escenarios = []
+    punto_de_falla = None
+    rss_inicio = servidor.rss_kb() if servidor else None
+    primera = 1
+    for sesiones in escalones:
+        escenario = await escalon(url, sesiones, recetas, credenciales, servidor, timeout, primera)
+        primera += sesiones * recetas
+        escenarios.append(escenario)
+        imprimir_escalon(escenario)
+        motivo = falla(escenario, max_p95_ms, umbral_errores)
+        if motivo:
+            escenario["falla"] = motivo
+            if punto_de_falla is None:
+                punto_de_falla = {"sesiones": sesiones, "motivo": motivo}
+            if not continuar:
+                break
+    sanos = [e["sesiones"] for e in escenarios if "falla" not in e]
+    rss_fin = servidor.rss_kb() if servidor else None
+    total = sum(e["sesiones"] for e in escenarios)
+    return {
+        "escenarios": escenarios,
+        "punto_de_falla": punto_de_falla,
+        "capacidad_sesiones": max(sanos) if sanos else 0,
+        "rss_inicio_kb": rss_inicio,
+        "rss_fin_kb": rss_fin,
+        "kb_retenidos_por_sesion": round((rss_fin - rss_inicio) / total, 1) if rss_inicio and rss_fin else None,
+    }
+
+
+def imprimir_escalon(e):
+    memoria = f"{e['kb_por_sesion']:>8.0f} KB/sesión" if e["kb_por_sesion"] is not None else ""
+    print(
+        f"{e['sesiones']:>4} sesiones {e['recetas_por_s']:>7.1f} recetas/s "
+        f"generación p50 {e['p50_ms']:>8.1f}ms p95 {e['p95_ms']:>8.1f}ms p99 {e['p99_ms']:>8.1f}ms "
+        f"login p95 {e['etapas']['login']['p95_ms']:>7.1f}ms {memoria} fallidas {e['fallidas']}"
+    )
+    for error, cantidad in e["errores"].items():
+        print(f"     ⚠️  {cantidad} × {error}")
+
+
+def imprimir(resultado):
+    print()
+    if resultado["punto_de_falla"]:
+        falla_ = resultado["punto_de_falla"]
+        print(f"❌ Empieza a fallar con {falla_['sesiones']} sesiones: {falla_['motivo']}")
+    else:
+        print("✅ Ningún escalón falló")
+    print(f"📈 Capacidad medida: {resultado['capacidad_sesiones']} sesiones concurrentes")
+    if resultado["kb_retenidos_por_sesion"] is not None:
+        print(f"🧠 Memoria retenida tras las sesiones: {resultado['kb_retenidos_por_sesion']} KB por sesión "
+              f"({resultado['rss_inicio_kb']} -> {resultado['rss_fin_kb']} KB)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de app.py con sesiones concurrentes")
+    parser.add_argument("--url", help="App ya en marcha (por defecto se levanta una local)")
+    parser.add_argument("--usuario", help="Usuario de todas las sesiones con --url")
+    parser.add_argument("--password", help="Contraseña de --usuario")
+    parser.add_argument("--escalones", type=int, nargs="+", default=list(ESCALONES), help="Sesiones concurrentes por escalón")
+    parser.add_argument("--recetas", type=int, default=3, help="Recetas generadas y descargadas por sesión")
+    parser.add_argument("--timeout", type=float, default=60, help="Segundos máximos por etapa de una sesión")
+    parser.add_argument("--max-p95", type=float, default=10, help="p95 de generación (s) a partir del cual el escalón falla")
+    parser.add_argument("--umbral-errores", type=float, default=0.0, help="Fracción de sesiones fallidas tolerada")
+    parser.add_argument("--continuar", action="store_true", help="Seguir subiendo la carga después del primer escalón fallido")
+    parser.add_argument("--workers", type=int, help="GENERACION_WORKERS de la app local")
+    parser.add_argument("--max-pendientes", type=int, help="GENERACION_MAX_PENDIENTES de la app local")
+    parser.add_argument("--salida", default="bench_sesiones.json", help="Archivo JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para detectar regresiones")
+    parser.add_argument("--umbral", type=float, default=0.2, help="Empeoramiento relativo tolerado de p50")
+    parser.add_argument("--servidor", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.servidor:
+        _servidor(args.servidor)
+        return 0
+    if args.url and not (args.usuario and args.password):
+        parser.error("--url requiere --usuario y --password")
+
+    escalones = sorted(set(args.escalones))
+    servidor = None if args.url else ServidorApp(max(escalones), args.workers, args.max_pendientes)
+    url = args.url or servidor.url
+    if args.url:
+        def credenciales(indice):
+            return args.usuario, args.password
+    else:
+        def credenciales(indice):
+            return f"{USUARIO_PRUEBA[0]}{indice}", USUARIO_PRUEBA[1]
+
+    try:
+        print(f"⏱️  Sesiones concurrentes contra {url}: {', '.join(map(str, escalones))} "
+              f"({args.recetas} recetas por sesión)...\n")
+        resultado = asyncio.run(rampa(
+            url, escalones, args.recetas, credenciales, servidor, args.timeout,
+            args.max_p95 * 1000, args.umbral_errores, args.continuar,
+        ))
+    finally:
+        if servidor is not None:
+            servidor.cerrar()
+
+    resultado = {"metadata": metadata(), **resultado}
+    imprimir(resultado)
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            anterior = json.load(f)
+        print(f"\n📊 Comparando p50 de generación con {args.comparar}:")
+        regresiones = comparar(resultado, anterior, args.umbral)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} escenario(s) empeoraron más de {args.umbral:.0%}")
+            return 1
+        print("\n✅ Sin regresiones")
+    return 0 if resultado["capacidad_sesiones"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
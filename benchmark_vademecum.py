@@ -0,0 +1,214 @@
+"""
+Benchmark de las sugerencias del vademécum (vademecum.py) con decenas de miles de entradas
+
+Arma vademécums sintéticos de 10.000 a 80.000 presentaciones, los escribe como
+CSV y mide la carga e indexado (una vez por proceso) y la latencia de sugerir()
+por largo de prefijo, sin médico y con un médico que ya recetó 500 medicamentos.
+Antes de medir compara las sugerencias con un ordenamiento por fuerza bruta de
+todas las entradas, para un millar de consultas.
+
+Uso:
+    python benchmark_vademecum.py
+    python benchmark_vademecum.py --entradas 50000 --max-p95 1 --salida bench_vademecum.json
+    python benchmark_vademecum.py --comparar bench_vademecum.json
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmark_pdf import comparar, medir, metadata, resumen_tiempos
+from vademecum import MAX_SUGERENCIAS, cargar_csv, normalizar, Vademecum
+
+TAMANOS = (10_000, 40_000, 80_000)
+SILABAS = ("a", "ce", "di", "flu", "ga", "li", "mo", "na", "pra", "ro", "sal", "te", "ti", "xo", "zo", "cli", "do", "fe")
+TERMINACIONES = ("ina", "ol", "ona", "ano", "ida", "ato", "eno", "ilo")
+PRESENTACIONES = ("5 mg", "10 mg", "20 mg", "50 mg", "100 mg", "250 mg", "500 mg", "1 g", "100 mg/5 ml")
+FORMAS = ("comprimidos", "cápsulas", "suspensión", "gotas", "ampollas", "crema")
+USADOS = 500
+CONSULTAS_POR_ESCENARIO = 1000
+
+
+def sinteticos(cantidad, semilla=7):
+    """Filas (medicamento, presentacion, posologia, popularidad) con nombres de 1 a 3 palabras"""
+    azar = random.Random(semilla)
+    filas, vistas = [], set()
+    while len(filas) < cantidad:
+        palabra = "".join(azar.choice(SILABAS) for _ in range(azar.randint(2, 4))) + azar.choice(TERMINACIONES)
+        nombre = palabra.capitalize()
+        if azar.random() < 0.1:
+            nombre = f"Ácido {palabra}"
+        elif azar.random() < 0.1:
+            nombre = f"{nombre} con {azar.choice(SILABAS)}{azar.choice(TERMINACIONES)}"
+        for _ in range(azar.randint(1, 6)):
+            presentacion = f"{azar.choice(PRESENTACIONES)} {azar.choice(FORMAS)}"
+            if (nombre, presentacion) not in vistas and len(filas) < cantidad:
+                vistas.add((nombre, presentacion))
+                filas.append((nombre, presentacion, f"cada {azar.choice((6, 8, 12, 24))} horas", azar.randint(0, 100)))
+    return filas
+
+
+def escribir_csv(filas, ruta):
+    with open(ruta, "w", newline="", encoding="utf-8") as f:
+        escritor = csv.writer(f)
+        escritor.writerow(("medicamento", "presentacion", "posologia", "popularidad"))
+        escritor.writerows(filas)
+
+
+def usos_medico(vademecum, semilla=11):
+    """{descripción normalizada: usos} de un médico con USADOS medicamentos recetados"""
+    azar = random.Random(semilla)
+    elegidos = azar.sample(vademecum.medicamentos, min(USADOS, len(vademecum)))
+    return {normalizar(m.descripcion): azar.randint(1, 50) for m in elegidos}
+
+
+def consultas(vademecum, largo, cantidad=CONSULTAS_POR_ESCENARIO, semilla=3):
+    """Prefijos de `largo` letras de palabras de nombres del vademécum (0 = nombre y presentación)"""
+    azar = random.Random(semilla + largo)
+    resultado = []
+    for _ in range(cantidad):
+        medicamento = azar.choice(vademecum.medicamentos)
+        if largo == 0:
+            texto = medicamento.descripcion
+            resultado.append(texto[:len(medicamento.nombre) + 3])
+        else:
+            resultado.append(azar.choice(medicamento.nombre.split())[:largo])
+    return resultado
+
+
+def referencia(vademecum):
+    """(descripción normalizada, claves, medicamento) de cada entrada, calculadas aparte del índice"""
+    filas = []
+    for medicamento in vademecum.medicamentos:
+        descripcion = normalizar(medicamento.descripcion)
+        palabras = descripcion.split(" ")
+        en_nombre = len(normalizar(medicamento.nombre).split(" "))
+        filas.append((descripcion, [" ".join(palabras[j:]) for j in range(en_nombre)], medicamento))
+    return filas
+
+
+def fuerza_bruta(filas, texto, usos, limite=MAX_SUGERENCIAS):
+    """Sugerencias esperadas ordenando todas las entradas que coinciden"""
+    prefijo = normalizar(texto)
+    coinciden = [
+        (-usos.get(descripcion, 0), -medicamento.popularidad, descripcion, medicamento)
+        for descripcion, claves, medicamento in filas
+        if any(clave.startswith(prefijo) for clave in claves)
+    ]
+    coinciden.sort(key=lambda fila: fila[:3])
+    return [fila[3] for fila in coinciden[:limite]]
+
+
+def verificar(vademecum, usos, cantidad=1000):
+    """Cantidad de consultas cuyas sugerencias difieren de la fuerza bruta"""
+    filas = referencia(vademecum)
+    diferentes = 0
+    for largo in (1, 2, 3, 5, 0):
+        for texto in consultas(vademecum, largo, cantidad // 5):
+            for usuario, usos_usuario in (("medico", usos), (None, {})):
+                if vademecum.sugerir(texto, usuario) != fuerza_bruta(filas, texto, usos_usuario):
+                    diferentes += 1
+    return diferentes
+
+
+def ejecutar(tamanos=TAMANOS, directorio=None):
+    directorio = directorio or tempfile.mkdtemp()
+    escenarios = []
+    for tamano in tamanos:
+        ruta = os.path.join(directorio, f"vademecum_{tamano}.csv")
+        escribir_csv(sinteticos(tamano), ruta)
+
+        inicio = time.perf_counter()
+        medicamentos = cargar_csv(ruta)
+        leido = time.perf_counter()
+        vademecum = Vademecum(medicamentos)
+        indexado = time.perf_counter()
+        usos = usos_medico(vademecum)
+        vademecum.fuente_usos = lambda usuario: usos
+        escenarios.append({
+            "escenario": f"carga/{tamano}",
+            "entradas": len(vademecum),
+            "claves": len(vademecum._claves),
+            "lectura_ms": round((leido - inicio) * 1000, 3),
+            "indice_ms": round((indexado - leido) * 1000, 3),
+            "p50_ms": round((indexado - inicio) * 1000, 3),
+        })
+
+        for usuario in (None, "medico"):
+            for largo in (1, 2, 3, 5, 0):
+                textos = consultas(vademecum, largo)
+                # Una pasada sin medir: llena la caché de rangos y carga los usos del médico
+                for texto in textos:
+                    vademecum.sugerir(texto, usuario)
+                ciclo = itertools.cycle(textos)
+                tiempos, _ = medir(lambda: vademecum.sugerir(next(ciclo), usuario), len(textos))
+                nombre = f"{'palabra' if largo == 0 else f'prefijo{largo}'}/{'medico' if usuario else 'global'}/{tamano}"
+                escenarios.append({"escenario": nombre, "entradas": len(vademecum), **resumen_tiempos(tiempos)})
+    return {"metadata": metadata(), "escenarios": escenarios}
+
+
+def imprimir(resultado):
+    print(f"{'escenario':<28} {'entradas':>9} {'p50':>11} {'p95':>11} {'p99':>11} {'máx':>11}")
+    for e in resultado["escenarios"]:
+        if e["escenario"].startswith("carga/"):
+            print(f"{e['escenario']:<28} {e['entradas']:>9} {e['p50_ms']:>9.1f}ms"
+                  f"   (lectura {e['lectura_ms']:.1f} ms, índice {e['indice_ms']:.1f} ms, {e['claves']} claves)")
+            continue
+        print(f"{e['escenario']:<28} {e['entradas']:>9} {e['p50_ms']:>9.3f}ms {e['p95_ms']:>9.3f}ms"
+              f" {e['p99_ms']:>9.3f}ms {e['max_ms']:>9.3f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de las sugerencias del vademécum")
+    parser.add_argument("--entradas", type=int, action="append", help="Tamaño del vademécum (repetible)")
+    parser.add_argument("--max-p95", type=float, default=1.0, help="p95 máximo de una consulta, en ms")
+    parser.add_argument("--salida", help="Archivo JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para detectar regresiones")
+    parser.add_argument("--umbral", type=float, default=0.2, help="Empeoramiento relativo tolerado de p50")
+    args = parser.parse_args(argv)
+    tamanos = tuple(args.entradas or TAMANOS)
+
+    directorio = tempfile.mkdtemp()
+    ruta = os.path.join(directorio, "verificacion.csv")
+    escribir_csv(sinteticos(min(tamanos)), ruta)
+    vademecum = Vademecum(cargar_csv(ruta))
+    usos = usos_medico(vademecum)
+    vademecum.fuente_usos = lambda usuario: usos
+    diferentes = verificar(vademecum, usos)
+    if diferentes:
+        print(f"❌ {diferentes} consultas difieren del ordenamiento por fuerza bruta")
+        return 1
+    print("✅ Las sugerencias coinciden con el ordenamiento por fuerza bruta\n")
+
+    resultado = ejecutar(tamanos, directorio)
+    imprimir(resultado)
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados guardados en {args.salida}")
+
+    lentos = [e["escenario"] for e in resultado["escenarios"]
+              if not e["escenario"].startswith("carga/") and e["p95_ms"] > args.max_p95]
+    if lentos:
+        print(f"\n❌ p95 mayor que {args.max_p95} ms en: {', '.join(lentos)}")
+        return 1
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            anterior = json.load(f)
+        print(f"\n📊 Comparando p50 con {args.comparar}:")
+        regresiones = comparar(resultado, anterior, args.umbral)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} escenario(s) empeoraron más de {args.umbral:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Caché de PDFs ya generados, direccionada por contenido
+
+La clave es un hash de la versión del motor (motor_pdf.VERSION_RENDERIZADO y
+normalizador.VERSION), la de la plantilla y los valores normalizados de los
+campos, así que dos solicitudes con los mismos datos devuelven los mismos bytes
+sin volver a escribir el PDF, y un cambio en cómo se genera el PDF no sirve los
+guardados antes en disco. Tiene un nivel en memoria (LRU limitado en
+bytes) y un nivel opcional en disco, también limitado en bytes.
+
+Configuración por variables de entorno para la caché compartida:
+    CACHE_PDF_MB          tamaño máximo en memoria (por defecto 64, 0 = desactivada)
+    CACHE_PDF_DIR         directorio del nivel en disco (por defecto sin disco)
+    CACHE_PDF_DISCO_MB    tamaño máximo en disco (por defecto 1024)
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+def clave_pdf(version_plantilla, campos):
+    """Clave de caché para una versión (del motor y de la plantilla) y unos valores de campos"""
+    contenido = json.dumps([version_plantilla, campos], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+class CachePDF:
+    """LRU de PDFs en memoria limitado en bytes, con nivel opcional en disco"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, directorio=None, max_bytes_disco=1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.directorio = directorio
+        self.max_bytes_disco = max_bytes_disco
+        self._lock = threading.Lock()
+        self._memoria = OrderedDict()
+        self._bytes_memoria = 0
+        self._disco = OrderedDict()
+        self._bytes_disco = 0
+        self.hits_memoria = 0
+        self.hits_disco = 0
+        self.misses = 0
+        self.evicciones_memoria = 0
+        self.evicciones_disco = 0
+        if self.directorio:
+            os.makedirs(self.directorio, exist_ok=True)
+            self._indexar_disco()
+
+    def _indexar_disco(self):
+        """Reconstruye el índice del nivel en disco, de la entrada más antigua a la más reciente"""
+        entradas = []
+        for nombre in os.listdir(self.directorio):
+            if nombre.endswith(".pdf"):
+                stat = os.stat(os.path.join(self.directorio, nombre))
+                entradas.append((stat.st_mtime_ns, nombre[:-4], stat.st_size))
+        for _, clave, tamano in sorted(entradas):
+            self._disco[clave] = tamano
+            self._bytes_disco += tamano
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, f"{clave}.pdf")
+
+    def _guardar_memoria(self, clave, pdf):
+        if len(pdf) > self.max_bytes:
+            return
+        anterior = self._memoria.pop(clave, None)
+        if anterior is not None:
+            self._bytes_memoria -= len(anterior)
+        self._memoria[clave] = pdf
+        self._bytes_memoria += len(pdf)
+        while self._bytes_memoria > self.max_bytes:
+            _, expulsado = self._memoria.popitem(last=False)
+            self._bytes_memoria -= len(expulsado)
+            self.evicciones_memoria += 1
+
+    def _guardar_disco(self, clave, pdf):
+        if clave in self._disco or len(pdf) > self.max_bytes_disco:
+            return
+        temporal = f"{self._ruta(clave)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, "wb") as f:
+            f.write(pdf)
+        os.replace(temporal, self._ruta(clave))
+        self._disco[clave] = len(pdf)
+        self._bytes_disco += len(pdf)
+        while self._bytes_disco > self.max_bytes_disco:
+            expulsada, tamano = self._disco.popitem(last=False)
+            self._bytes_disco -= tamano
+            self.evicciones_disco += 1
+            try:
+                os.remove(self._ruta(expulsada))
+            except FileNotFoundError:
+                pass
+
+    def _leer_disco(self, clave):
+        if clave not in self._disco:
+            return None
+        try:
+            with open(self._ruta(clave), "rb") as f:
+                pdf = f.read()
+        except FileNotFoundError:
+            self._bytes_disco -= self._disco.pop(clave)
+            return None
+        self._disco.move_to_end(clave)
+        os.utime(self._ruta(clave))
+        return pdf
+
+    def obtener(self, clave):
+        """PDF guardado para la clave, o None"""
+        with self._lock:
+            pdf = self._memoria.get(clave)
+            if pdf is not None:
+                self._memoria.move_to_end(clave)
+                self.hits_memoria += 1
+                return pdf
+            if self.directorio:
+                pdf = self._leer_disco(clave)
+                if pdf is not None:
+                    self.hits_disco += 1
+                    self._guardar_memoria(clave, pdf)
+                    return pdf
+            self.misses += 1
+            return None
+
+    def guardar(self, clave, pdf):
+        """Guarda un PDF recién generado en memoria y, si está configurado, en disco"""
+        with self._lock:
+            self._guardar_memoria(clave, pdf)
+            if self.directorio:
+                self._guardar_disco(clave, pdf)
+
+    def limpiar(self):
+        """Vacía el nivel en memoria (el disco se conserva)"""
+        with self._lock:
+            self._memoria.clear()
+            self._bytes_memoria = 0
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.hits_memoria + self.hits_disco + self.misses
+            return {
+                "entradas_memoria": len(self._memoria),
+                "bytes_memoria": self._bytes_memoria,
+                "max_bytes": self.max_bytes,
+                "entradas_disco": len(self._disco),
+                "bytes_disco": self._bytes_disco,
+                "hits_memoria": self.hits_memoria,
+                "hits_disco": self.hits_disco,
+                "misses": self.misses,
+                "tasa_aciertos": round((self.hits_memoria + self.hits_disco) / consultas, 4) if consultas else 0.0,
+                "evicciones_memoria": self.evicciones_memoria,
+                "evicciones_disco": self.evicciones_disco,
+            }
+
+
+_cache_global = None
+_cache_global_lock = threading.Lock()
+
+
+def obtener_cache_pdf():
+    """Caché de PDFs compartida por el proceso (None si CACHE_PDF_MB=0 y sin disco)"""
+    global _cache_global
+    with _cache_global_lock:
+        if _cache_global is None:
+            max_mb = float(os.getenv("CACHE_PDF_MB", "64"))
+            directorio = os.getenv("CACHE_PDF_DIR") or None
+            if max_mb <= 0 and directorio is None:
+                return None
+            _cache_global = CachePDF(
+                max_bytes=int(max_mb * 1024 * 1024),
+                directorio=directorio,
+                max_bytes_disco=int(float(os.getenv("CACHE_PDF_DISCO_MB", "1024")) * 1024 * 1024),
+            )
+        return _cache_global
@@ -0,0 +1,195 @@
+"""
+Cola de generación en segundo plano
+
+Los trabajos se ejecutan en un pool acotado (hilos por defecto, o cualquier
+Executor de concurrent.futures). `enviar` devuelve un id de inmediato y la
+página consulta el estado en cada rerun. Si una sesión envía dos veces el
+mismo trabajo mientras está en curso, se devuelve el id existente.
+Con la cola llena se rechazan los envíos (ColaLlenaError) en vez de acumularlos.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+PENDIENTE = "pendiente"
+EN_PROCESO = "en_proceso"
+LISTO = "listo"
+ERROR = "error"
+
+
+class ColaLlenaError(Exception):
+    """La cola alcanzó su límite de trabajos pendientes"""
+
+
+class Trabajo:
+    """Estado de un trabajo de la cola"""
+
+    def __init__(self, sesion, clave):
+        self.id = uuid.uuid4().hex
+        self.sesion = sesion
+        self.clave = clave
+        self.estado = PENDIENTE
+        self.resultado = None
+        self.error = None
+        self.tipo_error = None
+        self.creado = time.monotonic()
+        self.iniciado = None
+        self.terminado = None
+        self.evento = threading.Event()
+
+    @property
+    def activo(self):
+        return self.estado in (PENDIENTE, EN_PROCESO)
+
+    def resumen(self):
+        return {
+            "id": self.id,
+            "estado": self.estado,
+            "resultado": self.resultado,
+            "error": self.error,
+            "tipo_error": self.tipo_error,
+            "espera_ms": round(((self.iniciado or time.monotonic()) - self.creado) * 1000, 1),
+            "duracion_ms": round((self.terminado - self.iniciado) * 1000, 1) if self.terminado and self.iniciado else None,
+        }
+
+
+class ColaGeneracion:
+    """
+    Cola acotada de trabajos con deduplicación por sesión.
+
+    max_workers: trabajos ejecutándose a la vez
+    max_pendientes: trabajos activos (en espera + en proceso) en toda la cola
+    max_por_sesion: trabajos activos por sesión
+    retencion: segundos que se conservan los trabajos terminados para consultarlos
+    """
+
+    def __init__(self, max_workers=2, max_pendientes=32, max_por_sesion=1, retencion=600, ejecutor=None):
+        self.max_pendientes = max_pendientes
+        self.max_por_sesion = max_por_sesion
+        self.retencion = retencion
+        self._ejecutor = ejecutor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generacion")
+        self._lock = threading.Lock()
+        self._trabajos = {}
+        self._activos = 0
+        self.enviados = 0
+        self.deduplicados = 0
+        self.rechazados = 0
+        self.completados = 0
+        self.fallidos = 0
+
+    def _purgar_terminados(self, ahora):
+        vencidos = [
+            trabajo_id for trabajo_id, trabajo in self._trabajos.items()
+            if trabajo.terminado is not None and ahora - trabajo.terminado > self.retencion
+        ]
+        for trabajo_id in vencidos:
+            del self._trabajos[trabajo_id]
+
+    def enviar(self, sesion, clave, funcion, *args, **kwargs):
+        """
+        Encola `funcion(*args, **kwargs)` y devuelve el id del trabajo.
+        `clave` identifica el trabajo dentro de la sesión para deduplicarlo.
+        Lanza ColaLlenaError si la cola o la sesión están al límite.
+        """
+        with self._lock:
+            self._purgar_terminados(time.monotonic())
+            activos_sesion = [t for t in self._trabajos.values() if t.sesion == sesion and t.activo]
+            for trabajo in activos_sesion:
+                if trabajo.clave == clave:
+                    self.deduplicados += 1
+                    return trabajo.id
+            if len(activos_sesion) >= self.max_por_sesion:
+                self.rechazados += 1
+                raise ColaLlenaError("Ya tienes un documento en generación. Espera a que termine.")
+            if self._activos >= self.max_pendientes:
+                self.rechazados += 1
+                raise ColaLlenaError("El servidor está ocupado. Intenta nuevamente en unos segundos.")
+
+            trabajo = Trabajo(sesion, clave)
+            self._trabajos[trabajo.id] = trabajo
+            self._activos += 1
+            self.enviados += 1
+
+        try:
+            self._ejecutor.submit(self._ejecutar, trabajo, funcion, args, kwargs)
+        except RuntimeError:
+            # El pool se está cerrando
+            with self._lock:
+                del self._trabajos[trabajo.id]
+                self._activos -= 1
+            raise ColaLlenaError("El servidor se está reiniciando. Intenta nuevamente en unos segundos.")
+        return trabajo.id
+
+    def _ejecutar(self, trabajo, funcion, args, kwargs):
+        with self._lock:
+            trabajo.estado = EN_PROCESO
+            trabajo.iniciado = time.monotonic()
+        try:
+            resultado = funcion(*args, **kwargs)
+        except Exception as e:
+            with self._lock:
+                trabajo.error = str(e)
+                trabajo.tipo_error = type(e).__name__
+                trabajo.estado = ERROR
+                self.fallidos += 1
+        else:
+            with self._lock:
+                trabajo.resultado = resultado
+                trabajo.estado = LISTO
+                self.completados += 1
+        finally:
+            with self._lock:
+                trabajo.terminado = time.monotonic()
+                self._activos -= 1
+            trabajo.evento.set()
+
+    def estado(self, trabajo_id):
+        """Resumen del trabajo (estado, resultado, error, tiempos) o None si no existe"""
+        with self._lock:
+            trabajo = self._trabajos.get(trabajo_id)
+            return trabajo.resumen() if trabajo else None
+
+    def esperar(self, trabajo_id, timeout=None):
+        """Espera hasta `timeout` segundos a que el trabajo termine y devuelve su estado"""
+        with self._lock:
+            trabajo = self._trabajos.get(trabajo_id)
+        if trabajo is None:
+            return None
+        trabajo.evento.wait(timeout)
+        return self.estado(trabajo_id)
+
+    def descartar(self, trabajo_id):
+        """Olvida un trabajo terminado cuyo resultado ya se consumió"""
+        with self._lock:
+            trabajo = self._trabajos.get(trabajo_id)
+            if trabajo is not None and not trabajo.activo:
+                del self._trabajos[trabajo_id]
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "activos": self._activos,
+                "max_pendientes": self.max_pendientes,
+                "enviados": self.enviados,
+                "deduplicados": self.deduplicados,
+                "rechazados": self.rechazados,
+                "completados": self.completados,
+                "fallidos": self.fallidos,
+            }
+
+    def cerrar(self, esperar=True):
+        self._ejecutor.shutdown(wait=esperar)
+
+
+_cola_global = None
+_cola_global_lock = threading.Lock()
+
+
+def obtener_cola(max_workers=2, max_pendientes=32):
+    """Cola compartida por el proceso (se crea en la primera llamada)"""
+    global _cola_global
+    with _cola_global_lock:
+        if _cola_global is None:
+            _cola_global = ColaGeneracion(max_workers=max_workers, max_pendientes=max_pendientes)
+        return _cola_global
@@ -0,0 +1,167 @@
+"""
+Generación del PDF plano por empalme de bytes
+
+La plantilla plana (aplanado.py) se serializa una sola vez con un content stream
+de marcador como último objeto del archivo. En cada solicitud se copian los bytes
+fijos, se escribe el stream con el texto de los campos en lugar del marcador y se
+rehacen solo la última entrada de la tabla xref y el startxref: no se construye
+ningún objeto de PyPDF2 ni se vuelve a escribir el documento.
+
+Si el texto sigue en páginas de continuación (ver maquetado.py), después del
+stream se escriben, por cada página, su stream y una copia del diccionario de la
+primera página, y al final una nueva definición del árbol de páginas con todas
+ellas: su entrada en la tabla xref apunta a esa definición y la original queda
+sin referencias, como en una actualización incremental.
+
+El resultado es equivalente al de PlantillaPlana.renderizar (mismas páginas,
+recursos y contenido); test_empalme_pdf.py compara ambos caminos.
+"""
+import re
+import zlib
+from io import BytesIO
+
+from PyPDF2.generic import ArrayObject, DictionaryObject, NameObject
+
+MARCADOR = b"%% texto de los campos %%"
+_HUECO = b"/HuecoEmpalme"
+_CANTIDAD = b"/CantidadEmpalme"
+
+_STARTXREF = re.compile(rb"startxref\s+(\d+)\s+%%EOF\s*$")
+_SUBSECCION = re.compile(rb"xref\s+(\d+)\s+(\d+)\s+")
+_ENTRADA = re.compile(rb"(\d{10}) (\d{5}) ([nf])\s{1,2}")
+_TAMANO = re.compile(rb"/Size \d+")
+
+
+def _serializar(objeto):
+    salida = BytesIO()
+    objeto.write_to_stream(salida, None)
+    return salida.getvalue()
+
+
+def _objeto(numero, datos):
+    return b"%d 0 obj\n" % numero + datos + b"\nendobj\n"
+
+
+def _stream(numero, contenido):
+    contenido = zlib.compress(contenido)
+    return _objeto(numero, b"<<\n/Filter /FlateDecode\n/Length %d\n>>\nstream\n" % len(contenido) + contenido + b"\nendstream")
+
+
+class PlantillaBytes:
+    """Bytes fijos de la plantilla plana con la posición del stream variable"""
+
+    def __init__(self, plana, metadatos=None):
+        self._plana = plana
+        writer, referencias = plana.crear_writer([MARCADOR], metadatos)
+        salida = BytesIO()
+        writer.write(salida)
+        self._separar(salida.getvalue(), referencias[0].idnum)
+        self._preparar_continuaciones(writer)
+
+    def _separar(self, datos, numero):
+        """Divide el PDF serializado en prefijo, xref fija y trailer"""
+        fin = _STARTXREF.search(datos)
+        if fin is None:
+            raise ValueError("No se encontró startxref en la plantilla serializada")
+        inicio_xref = int(fin.group(1))
+
+        subseccion = _SUBSECCION.match(datos, inicio_xref)
+        if subseccion is None:
+            raise ValueError("La plantilla serializada no usa una tabla xref clásica")
+        primero, cantidad = int(subseccion.group(1)), int(subseccion.group(2))
+        if primero != 0 or cantidad != numero + 1:
+            raise ValueError("El stream de los campos no es el último objeto de la plantilla")
+
+        entradas = []
+        posicion = subseccion.end()
+        for _ in range(cantidad):
+            entrada = _ENTRADA.match(datos, posicion)
+            if entrada is None:
+                raise ValueError("Entrada xref inválida en la plantilla serializada")
+            entradas.append((int(entrada.group(1)), int(entrada.group(2)), entrada.group(3)))
+            posicion = entrada.end()
+        inicio_trailer = datos.index(b"trailer", posicion)
+        inicio_startxref = datos.index(b"startxref", inicio_trailer)
+
+        inicio_objeto = entradas[numero][0]
+        if not datos.startswith(b"%d 0 obj" % numero, inicio_objeto):
+            raise ValueError("La entrada xref del stream de los campos no apunta a su objeto")
+        if any(desplazamiento >= inicio_objeto for desplazamiento, _, tipo in entradas[:numero] if tipo == b"n"):
+            raise ValueError("Hay objetos después del stream de los campos")
+
+        self.numero = numero
+        self.prefijo = datos[:inicio_objeto]
+        self.entradas = [b"%010d %05d %s \n" % entrada for entrada in entradas[:numero]]
+        self.xref = b"xref\n0 %d\n" % cantidad + b"".join(self.entradas)
+        self.trailer = datos[inicio_trailer:inicio_startxref]
+
+    def _preparar_continuaciones(self, writer):
+        """
+        Bytes del diccionario de una página de continuación y del árbol de páginas,
+        con nombres de relleno donde van los valores que cambian en cada solicitud
+        """
+        pagina = writer.pages[0]
+        arbol = writer._pages.get_object()
+        self.numero_pagina = pagina.indirect_reference.idnum
+        self.numero_arbol = writer._pages.idnum
+        self.restantes = [kid.idnum for kid in arbol["/Kids"][1:]]
+
+        copia = DictionaryObject(pagina)
+        copia[NameObject("/Contents")] = ArrayObject(list(pagina.raw_get("/Contents"))[:-1] + [NameObject(_HUECO.decode())])
+        self.pagina = _serializar(copia)
+
+        copia = DictionaryObject(arbol)
+        copia[NameObject("/Kids")] = NameObject(_HUECO.decode())
+        copia[NameObject("/Count")] = NameObject(_CANTIDAD.decode())
+        self.arbol = _serializar(copia)
+        if self.pagina.count(_HUECO) != 1 or self.arbol.count(_HUECO) != 1 or not _TAMANO.search(self.trailer):
+            raise ValueError("No se pudo preparar la página de continuación de la plantilla")
+
+    def renderizar(self, valores):
+        """PDF plano en bytes con los valores escritos sobre la plantilla"""
+        contenidos = self._plana.contenidos(valores)
+        if len(contenidos) > 1:
+            return self._renderizar_paginas(contenidos)
+        objeto = _stream(self.numero, contenidos[0])
+        desplazamiento = len(self.prefijo)
+        return b"".join((
+            self.prefijo,
+            objeto,
+            self.xref,
+            b"%010d 00000 n \n" % desplazamiento,
+            self.trailer,
+            b"startxref\n%d\n%%%%EOF\n" % (desplazamiento + len(objeto)),
+        ))
+
+    def _renderizar_paginas(self, contenidos):
+        """PDF con páginas de continuación: un stream y una página nueva por cada una"""
+        objetos = [_stream(self.numero, contenidos[0])]
+        kids = [self.numero_pagina]
+        for contenido in contenidos[1:]:
+            numero = self.numero + len(objetos)
+            objetos.append(_stream(numero, contenido))
+            objetos.append(_objeto(numero + 1, self.pagina.replace(_HUECO, b"%d 0 R" % numero)))
+            kids.append(numero + 1)
+        kids += self.restantes
+        total = self.numero + len(objetos)
+
+        desplazamientos = []
+        posicion = len(self.prefijo)
+        for objeto in objetos:
+            desplazamientos.append(posicion)
+            posicion += len(objeto)
+        arbol = _objeto(self.numero_arbol, self.arbol.replace(
+            _HUECO, b"[ " + b" ".join(b"%d 0 R" % kid for kid in kids) + b" ]"
+        ).replace(_CANTIDAD, b"%d" % len(kids)))
+        entradas = list(self.entradas)
+        entradas[self.numero_arbol] = b"%010d 00000 n \n" % posicion
+        return b"".join((
+            self.prefijo,
+            *objetos,
+            arbol,
+            b"xref\n0 %d\n" % total,
+            *entradas,
+            *(b"%010d 00000 n \n" % d for d in desplazamientos),
+            _TAMANO.sub(b"/Size %d" % total, self.trailer, count=1),
+            b"startxref\n%d\n%%%%EOF\n" % (posicion + len(arbol)),
+        ))
@@ -0,0 +1,34 @@
+"""
+Estilos de la aplicación
+
+La hoja de estilos vive en estilos.css; se lee y se compacta una sola vez por
+proceso (y otra vez solo si el archivo cambia), no en cada rerun del script.
+"""
+import os
+import re
+import threading
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+_estilos = {}
+_estilos_lock = threading.Lock()
+
+
+def compactar_css(css):
+    """Quita comentarios y espacios sobrantes del CSS"""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s*([{}:;,])\s*", r"\1", css)
+    return re.sub(r"\s+", " ", css).strip()
+
+
+def obtener_estilos(ruta="estilos.css"):
+    """Bloque <style> listo para st.markdown(..., unsafe_allow_html=True)"""
+    ruta = os.path.join(DIRECTORIO, ruta)
+    mtime = os.stat(ruta).st_mtime_ns
+    with _estilos_lock:
+        guardado = _estilos.get(ruta)
+        if guardado is None or guardado[0] != mtime:
+            with open(ruta, "r", encoding="utf-8") as f:
+                guardado = (mtime, f"<style>{compactar_css(f.read())}</style>")
+            _estilos[ruta] = guardado
+        return guardado[1]
@@ -0,0 +1,284 @@
+"""
+Exportación de las recetas del historial a un ZIP, en streaming
+
+Uso:
+    python exportacion.py --dia 2025-11-18 recetas_20251118.zip
+    python exportacion.py --mes 2025-11 --usuario dra_lopez noviembre.zip
+    python exportacion.py --desde 2025-11-01 --hasta 2025-11-30 - > noviembre.zip
+
+El ZIP tiene un PDF por receta (usuario/fecha/id_Receta_Apellido_Nombre_fecha.pdf)
+y al final manifiesto.csv con los datos de cada una. Se escribe de corrido: las
+recetas se leen del historial de a lotes, cada PDF se copia por bloques desde su
+archivo y el directorio central del ZIP y el manifiesto se acumulan en archivos
+temporales, así que la memoria no depende de la cantidad de documentos y la
+salida puede ser un pipe (stdout, una respuesta HTTP). Los PDFs ya vienen
+comprimidos y se guardan tal cual salvo con --comprimir. Si el ZIP pasa de 4 GB
+o de 65.535 archivos se usan los registros ZIP64.
+"""
+import argparse
+import calendar
+import csv
+import io
+import os
+import re
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from datetime import date, datetime
+
+from historial import obtener_historial
+
+BLOQUE = 64 * 1024
+MAX_MEMORIA_TEMPORAL = 256 * 1024
+COLUMNAS_MANIFIESTO = ("id", "usuario", "creado", "fecha", "apellido", "nombre", "diagnostico",
+                       "tipo_documento", "archivo", "bytes", "sha256", "estado")
+
+_LIMITE_32 = 0xFFFFFFFF
+_LIMITE_16 = 0xFFFF
+_FLAG_DESCRIPTOR = 1 << 3  # crc y tamaños en un descriptor detrás de los datos
+_FLAG_UTF8 = 1 << 11
+_NO_PERMITIDO = re.compile(r'[\\/:*?"<>|\x00-\x1f]+')
+
+
+def _fecha_dos(momento):
+    """Fecha y hora en el formato de MS-DOS de los encabezados ZIP"""
+    momento = max(momento, datetime(1980, 1, 1))
+    return ((momento.hour << 11) | (momento.minute << 5) | (momento.second // 2),
+            ((momento.year - 1980) << 9) | (momento.month << 5) | momento.day)
+
+
+class ZipSecuencial:
+    """
+    Escritor de ZIP de una sola pasada sobre un archivo que no admite seek. Cada
+    entrada lleva un descriptor de datos con su crc y tamaños; los registros del
+    directorio central se van escribiendo en un temporal y se copian al cerrar.
+    """
+
+    def __init__(self, destino, comprimir=False):
+        self.destino = destino
+        self.comprimir = comprimir
+        self.posicion = 0
+        self.entradas = 0
+        self._central = tempfile.SpooledTemporaryFile(max_size=MAX_MEMORIA_TEMPORAL)
+
+    def _escribir(self, datos):
+        self.destino.write(datos)
+        self.posicion += len(datos)
+
+    def agregar(self, nombre, origen, momento=None):
+        """Agrega una entrada leyendo `origen` (archivo binario) por bloques. Retorna los bytes leídos."""
+        nombre = nombre.encode("utf-8")
+        hora, fecha = _fecha_dos(momento or datetime.now())
+        metodo = 8 if self.comprimir else 0
+        version = 20
+        desplazamiento = self.posicion
+        self._escribir(struct.pack("<IHHHHHIIIHH", 0x04034B50, version, _FLAG_DESCRIPTOR | _FLAG_UTF8, metodo,
+                                   hora, fecha, 0, 0, 0, len(nombre), 0) + nombre)
+
+        compresor = zlib.compressobj(6, zlib.DEFLATED, -15) if self.comprimir else None
+        crc = tamano = comprimido = 0
+        while True:
+            bloque = origen.read(BLOQUE)
+            if not bloque:
+                break
+            crc = zlib.crc32(bloque, crc)
+            tamano += len(bloque)
+            if compresor is not None:
+                bloque = compresor.compress(bloque)
+            comprimido += len(bloque)
+            self._escribir(bloque)
+        if compresor is not None:
+            resto = compresor.flush()
+            comprimido += len(resto)
+            self._escribir(resto)
+        if tamano > _LIMITE_32 or comprimido > _LIMITE_32:
+            raise ValueError(f"La entrada {nombre.decode()} supera los 4 GB")
+        self._escribir(struct.pack("<IIII", 0x08074B50, crc, comprimido, tamano))
+
+        # Directorio central: el desplazamiento pasa a un campo ZIP64 si no entra en 32 bits
+        extra = b""
+        if desplazamiento >= _LIMITE_32:
+            extra = struct.pack("<HHQ", 0x0001, 8, desplazamiento)
+            version, desplazamiento = 45, _LIMITE_32
+        self._central.write(struct.pack(
+            "<IHHHHHHIIIHHHHHII", 0x02014B50, (3 << 8) | 45, version, _FLAG_DESCRIPTOR | _FLAG_UTF8, metodo,
+            hora, fecha, crc, comprimido, tamano, len(nombre), len(extra), 0, 0, 0, 0o100644 << 16, desplazamiento
+        ) + nombre + extra)
+        self.entradas += 1
+        return tamano
+
+    def cerrar(self):
+        """Escribe el directorio central y los registros de fin (ZIP64 si hace falta)"""
+        inicio = self.posicion
+        self._central.seek(0)
+        while True:
+            bloque = self._central.read(BLOQUE)
+            if not bloque:
+                break
+            self._escribir(bloque)
+        self._central.close()
+        tamano = self.posicion - inicio
+        zip64 = self.entradas >= _LIMITE_16 or inicio >= _LIMITE_32 or tamano >= _LIMITE_32
+        if zip64:
+            fin64 = self.posicion
+            self._escribir(struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, (3 << 8) | 45, 45, 0, 0,
+                                       self.entradas, self.entradas, tamano, inicio))
+            self._escribir(struct.pack("<IIQI", 0x07064B50, 0, fin64, 1))
+        self._escribir(struct.pack(
+            "<IHHHHIIH", 0x06054B50, 0, 0, min(self.entradas, _LIMITE_16), min(self.entradas, _LIMITE_16),
+            min(tamano, _LIMITE_32), min(inicio, _LIMITE_32), 0
+        ))
+        self.destino.flush()
+
+
+def nombre_en_zip(registro):
+    """Ruta del PDF de una receta dentro del ZIP: usuario/fecha/id_Receta_Apellido_Nombre_fecha.pdf"""
+    def limpio(texto):
+        return _NO_PERMITIDO.sub("_", str(texto)).strip(" .") or "_"
+
+    archivo = f"Receta_{registro['apellido']}_{registro['nombre']}_{registro['fecha'].replace('-', '')}.pdf"
+    return f"{limpio(registro['username'])}/{registro['fecha']}/{registro['id']:06d}_{limpio(archivo)}"
+
+
+def _momento(registro):
+    try:
+        return datetime.strptime(registro["creado"], "%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        return datetime.strptime(registro["fecha"], "%Y-%m-%d")
+
+
+def exportar(historial, destino, username=None, desde=None, hasta=None, comprimir=False, progreso=None, lote=500):
+    """
+    Escribe en `destino` (archivo binario, no necesita seek) el ZIP con las recetas
+    del usuario (None = todos) entre `desde` y `hasta` (inclusive) y el manifiesto.
+    `progreso(hechas, total, bytes_escritos)` se llama después de cada receta.
+    Las recetas cuyo PDF ya no está quedan en el manifiesto con estado "sin_pdf".
+    Retorna un diccionario con el resumen.
+    """
+    inicio = time.perf_counter()
+    total = historial.contar(username, desde, hasta)
+    zip_salida = ZipSecuencial(destino, comprimir)
+    # El manifiesto se arma fila por fila en un temporal binario y entra último al ZIP
+    manifiesto = tempfile.SpooledTemporaryFile(max_size=MAX_MEMORIA_TEMPORAL)
+    fila = io.StringIO()
+    escritor = csv.writer(fila)
+
+    def escribir_fila(valores):
+        escritor.writerow(valores)
+        manifiesto.write(fila.getvalue().encode("utf-8"))
+        fila.seek(0)
+        fila.truncate()
+
+    escribir_fila(COLUMNAS_MANIFIESTO)
+    hechas = exportadas = sin_pdf = bytes_pdf = 0
+
+    for registro in historial.recorrer(username, desde, hasta, lote):
+        archivo = nombre_en_zip(registro)
+        pdf = historial.abrir_pdf(registro)
+        if pdf is None:
+            estado, archivo = "sin_pdf", ""
+            sin_pdf += 1
+        else:
+            with pdf:
+                bytes_pdf += zip_salida.agregar(archivo, pdf, _momento(registro))
+            estado = "ok"
+            exportadas += 1
+        escribir_fila((registro["id"], registro["username"], registro["creado"], registro["fecha"],
+                      registro["apellido"], registro["nombre"], registro["diagnostico"],
+                      registro["tipo_documento"], archivo, registro["pdf_bytes"], registro["pdf_sha256"], estado))
+        hechas += 1
+        if progreso:
+            progreso(hechas, total, zip_salida.posicion)
+
+    manifiesto.seek(0)
+    with manifiesto:
+        zip_salida.agregar("manifiesto.csv", manifiesto)
+    zip_salida.cerrar()
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "recetas": hechas,
+        "exportadas": exportadas,
+        "sin_pdf": sin_pdf,
+        "bytes_pdf": bytes_pdf,
+        "bytes_zip": zip_salida.posicion,
+        "segundos": round(segundos, 3),
+        "recetas_por_segundo": round(hechas / segundos, 2) if segundos > 0 else 0.0,
+    }
+
+
+def rango_fechas(dia=None, mes=None, desde=None, hasta=None):
+    """(desde, hasta) de un día (AAAA-MM-DD), un mes (AAAA-MM) o un rango explícito"""
+    if dia:
+        fecha = datetime.strptime(dia, "%Y-%m-%d").date()
+        return fecha, fecha
+    if mes:
+        primero = datetime.strptime(mes, "%Y-%m").date()
+        ultimo = calendar.monthrange(primero.year, primero.month)[1]
+        return primero, date(primero.year, primero.month, ultimo)
+    return (datetime.strptime(desde, "%Y-%m-%d").date() if desde else None,
+            datetime.strptime(hasta, "%Y-%m-%d").date() if hasta else None)
+
+
+class _Progreso:
+    """Línea de progreso en stderr, como mucho dos veces por segundo"""
+
+    def __init__(self, intervalo=0.5):
+        self.intervalo = intervalo
+        self.ultimo = 0.0
+
+    def __call__(self, hechas, total, escritos):
+        ahora = time.monotonic()
+        if ahora - self.ultimo < self.intervalo and hechas < total:
+            return
+        self.ultimo = ahora
+        porcentaje = hechas / total if total else 1.0
+        print(f"\r📦 {hechas}/{total} recetas ({porcentaje:.0%}) · {escritos / 1024 / 1024:.1f} MB",
+              end="", file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta las recetas del historial a un ZIP con manifiesto")
+    parser.add_argument("salida", help="Archivo .zip de salida ('-' = stdout)")
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument("--dia", help="Un día (AAAA-MM-DD)")
+    grupo.add_argument("--mes", help="Un mes (AAAA-MM)")
+    parser.add_argument("--desde", help="Desde esta fecha (AAAA-MM-DD), inclusive")
+    parser.add_argument("--hasta", help="Hasta esta fecha (AAAA-MM-DD), inclusive")
+    parser.add_argument("--usuario", help="Solo las recetas de este médico")
+    parser.add_argument("--comprimir", action="store_true", help="Comprimir los PDFs (deflate)")
+    parser.add_argument("--historial", default=os.getenv("HISTORIAL_DB", "historial.db"))
+    parser.add_argument("--pdfs", default=os.getenv("HISTORIAL_PDFS", "historial_pdfs"))
+    args = parser.parse_args(argv)
+    if (args.dia or args.mes) and (args.desde or args.hasta):
+        parser.error("--dia/--mes no se combinan con --desde/--hasta")
+    try:
+        desde, hasta = rango_fechas(args.dia, args.mes, args.desde, args.hasta)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if not os.path.exists(args.historial):
+        print(f"❌ No se encontró el historial {args.historial}", file=sys.stderr)
+        return 1
+    historial = obtener_historial(args.historial, args.pdfs)
+    a_stdout = args.salida == "-"
+    destino = sys.stdout.buffer if a_stdout else open(args.salida, "wb")
+    try:
+        resumen = exportar(historial, destino, args.usuario, desde, hasta, args.comprimir, _Progreso())
+    finally:
+        if not a_stdout:
+            destino.close()
+
+    print(file=sys.stderr)
+    print(f"✅ {resumen['exportadas']} de {resumen['recetas']} recetas exportadas"
+          f"{'' if a_stdout else ' en ' + args.salida} ({resumen['bytes_zip'] / 1024 / 1024:.1f} MB)", file=sys.stderr)
+    print(f"⏱️  {resumen['segundos']} s ({resumen['recetas_por_segundo']} recetas/s)", file=sys.stderr)
+    if resumen["sin_pdf"]:
+        print(f"⚠️  {resumen['sin_pdf']} recetas sin PDF guardado (ver manifiesto.csv)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,356 @@
+"""
+Historial persistente de recetas generadas, por usuario
+
+Cada documento se guarda con los datos del formulario y una referencia a su PDF
+(archivo direccionado por SHA-256 en `historial_pdfs/`), así que volver a abrir una
+receta no requiere generarla otra vez. Las búsquedas por paciente y diagnóstico usan
+un índice de texto completo (FTS5) y las de fechas un índice por (username, fecha).
+También cuenta cuántas veces recetó cada usuario cada medicamento del vademécum,
+para ordenar sus sugerencias (ver vademecum.py), y guarda sus favoritos: textos de
+Rp./ o indicaciones que se repiten, con el texto normalizado ya calculado.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+
+from motor_pdf import DatosReceta, formatear_contenido
+from normalizador import VERSION as VERSION_TEXTO
+
+COLUMNAS = ("id", "username", "creado", "nombre", "apellido", "fecha", "diagnostico",
+            "tipo_documento", "contenido", "pdf_sha256", "pdf_bytes")
+COLUMNAS_FAVORITOS = ("id", "titulo", "tipo_documento", "contenido", "texto", "version_texto")
+
+
+def _fts5_disponible():
+    try:
+        conexion = sqlite3.connect(":memory:")
+        conexion.execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+        conexion.close()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def _fecha_iso(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, (date, datetime)):
+        return valor.strftime('%Y-%m-%d')
+    return str(valor)
+
+
+class HistorialRecetas:
+    """Historial de recetas en SQLite (modo WAL) con los PDFs en disco"""
+
+    def __init__(self, ruta="historial.db", directorio_pdfs="historial_pdfs", timeout=5.0):
+        self.ruta = ruta
+        self.directorio_pdfs = directorio_pdfs
+        self.timeout = timeout
+        self.usa_fts = _fts5_disponible()
+        self._local = threading.local()
+        os.makedirs(self.directorio_pdfs, exist_ok=True)
+        self._crear_esquema()
+
+    def _conexion(self):
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta, timeout=self.timeout)
+            conexion.row_factory = sqlite3.Row
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            conexion.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+            self._local.conexion = conexion
+        return conexion
+
+    def _crear_esquema(self):
+        conexion = self._conexion()
+        with conexion:
+            conexion.executescript("""
+                CREATE TABLE IF NOT EXISTS recetas (
+                    id INTEGER PRIMARY KEY,
+                    username TEXT NOT NULL,
+                    creado TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    nombre TEXT NOT NULL,
+                    apellido TEXT NOT NULL,
+                    fecha TEXT NOT NULL,
+                    diagnostico TEXT NOT NULL,
+                    tipo_documento TEXT NOT NULL,
+                    contenido TEXT NOT NULL,
+                    pdf_sha256 TEXT NOT NULL,
+                    pdf_bytes INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_recetas_usuario_fecha
+                    ON recetas (username, fecha);
+                CREATE INDEX IF NOT EXISTS idx_recetas_usuario_paciente
+                    ON recetas (username, apellido, nombre);
+                CREATE INDEX IF NOT EXISTS idx_recetas_fecha
+                    ON recetas (fecha);
+                CREATE TABLE IF NOT EXISTS usos_medicamentos (
+                    username TEXT NOT NULL,
+                    medicamento TEXT NOT NULL,
+                    usos INTEGER NOT NULL,
+                    PRIMARY KEY (username, medicamento)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS favoritos (
+                    id INTEGER PRIMARY KEY,
+                    username TEXT NOT NULL,
+                    titulo TEXT NOT NULL,
+                    tipo_documento TEXT NOT NULL,
+                    contenido TEXT NOT NULL,
+                    texto TEXT NOT NULL,
+                    version_texto INTEGER NOT NULL,
+                    creado TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+                );
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_favoritos_usuario_titulo
+                    ON favoritos (username, titulo);
+            """)
+            if self.usa_fts:
+                conexion.executescript("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS recetas_fts USING fts5(
+                        nombre, apellido, diagnostico,
+                        content='recetas', content_rowid='id',
+                        tokenize='unicode61 remove_diacritics 2'
+                    );
+                    CREATE TRIGGER IF NOT EXISTS recetas_ai AFTER INSERT ON recetas BEGIN
+                        INSERT INTO recetas_fts (rowid, nombre, apellido, diagnostico)
+                        VALUES (new.id, new.nombre, new.apellido, new.diagnostico);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS recetas_ad AFTER DELETE ON recetas BEGIN
+                        INSERT INTO recetas_fts (recetas_fts, rowid, nombre, apellido, diagnostico)
+                        VALUES ('delete', old.id, old.nombre, old.apellido, old.diagnostico);
+                    END;
+                """)
+
+    def _ruta_pdf(self, sha256):
+        return os.path.join(self.directorio_pdfs, sha256[:2], f"{sha256}.pdf")
+
+    def _guardar_pdf(self, pdf):
+        sha256 = hashlib.sha256(pdf).hexdigest()
+        ruta = self._ruta_pdf(sha256)
+        if not os.path.exists(ruta):
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporal, "wb") as f:
+                f.write(pdf)
+            os.replace(temporal, ruta)
+        return sha256
+
+    def registrar(self, username, datos, pdf):
+        """Guarda una receta generada y su PDF. Retorna el id del registro."""
+        sha256 = self._guardar_pdf(pdf)
+        conexion = self._conexion()
+        with conexion:
+            cursor = conexion.execute(
+                """INSERT INTO recetas (username, nombre, apellido, fecha, diagnostico,
+                                        tipo_documento, contenido, pdf_sha256, pdf_bytes)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (username, datos.nombre, datos.apellido, _fecha_iso(datos.fecha), datos.diagnostico,
+                 datos.tipo_documento, datos.contenido, sha256, len(pdf))
+            )
+        return cursor.lastrowid
+
+    def registrar_usos(self, username, medicamentos):
+        """Suma un uso del usuario a cada medicamento (descripción normalizada del vademécum)"""
+        conexion = self._conexion()
+        with conexion:
+            conexion.executemany(
+                """INSERT INTO usos_medicamentos (username, medicamento, usos) VALUES (?, ?, 1)
+                   ON CONFLICT (username, medicamento) DO UPDATE SET usos = usos + 1""",
+                [(username, medicamento) for medicamento in medicamentos]
+            )
+
+    def usos_medicamentos(self, username):
+        """{medicamento: usos} del usuario"""
+        return dict(self._conexion().execute(
+            "SELECT medicamento, usos FROM usos_medicamentos WHERE username = ?", (username,)
+        ).fetchall())
+
+    def guardar_favorito(self, username, titulo, tipo_documento, contenido):
+        """
+        Guarda (o reemplaza, si ya hay uno con ese título) un favorito del usuario
+        con su texto normalizado. Retorna el registro guardado.
+        """
+        texto = formatear_contenido(contenido)
+        conexion = self._conexion()
+        with conexion:
+            conexion.execute(
+                """INSERT INTO favoritos (username, titulo, tipo_documento, contenido, texto, version_texto)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (username, titulo) DO UPDATE SET
+                       tipo_documento = excluded.tipo_documento, contenido = excluded.contenido,
+                       texto = excluded.texto, version_texto = excluded.version_texto""",
+                (username, titulo, tipo_documento, contenido, texto, VERSION_TEXTO)
+            )
+        fila = conexion.execute(
+            f"SELECT {', '.join(COLUMNAS_FAVORITOS)} FROM favoritos WHERE username = ? AND titulo = ?",
+            (username, titulo)
+        ).fetchone()
+        return dict(fila)
+
+    def favoritos(self, username):
+        """
+        Favoritos del usuario ordenados por título. Los guardados con otra versión
+        del normalizador se vuelven a normalizar (y se actualizan) al leerlos.
+        """
+        conexion = self._conexion()
+        registros = [dict(fila) for fila in conexion.execute(
+            f"SELECT {', '.join(COLUMNAS_FAVORITOS)} FROM favoritos WHERE username = ? ORDER BY titulo",
+            (username,)
+        )]
+        desactualizados = [r for r in registros if r["version_texto"] != VERSION_TEXTO]
+        for registro in desactualizados:
+            registro["texto"] = formatear_contenido(registro["contenido"])
+            registro["version_texto"] = VERSION_TEXTO
+        if desactualizados:
+            with conexion:
+                conexion.executemany(
+                    "UPDATE favoritos SET texto = ?, version_texto = ? WHERE id = ?",
+                    [(r["texto"], VERSION_TEXTO, r["id"]) for r in desactualizados]
+                )
+        return registros
+
+    def borrar_favorito(self, username, favorito_id):
+        """Borra un favorito del usuario. Retorna True si existía."""
+        conexion = self._conexion()
+        with conexion:
+            cursor = conexion.execute(
+                "DELETE FROM favoritos WHERE id = ? AND username = ?", (favorito_id, username)
+            )
+        return cursor.rowcount > 0
+
+    @staticmethod
+    def _consulta_fts(texto):
+        """Convierte el texto libre en una consulta FTS5 de prefijos (todas las palabras)"""
+        palabras = re.findall(r"\w+", texto, flags=re.UNICODE)
+        return " ".join(f'"{palabra}"*' for palabra in palabras)
+
+    def buscar(self, username, texto=None, desde=None, hasta=None, limite=50):
+        """
+        Busca recetas del usuario por paciente/diagnóstico y rango de fechas (inclusive).
+        Retorna una lista de diccionarios, de la más reciente a la más antigua.
+        """
+        columnas = ", ".join(f"r.{c}" for c in COLUMNAS)
+        condiciones = ["r.username = ?"]
+        parametros = [username]
+        desde, hasta = _fecha_iso(desde), _fecha_iso(hasta)
+        if desde:
+            condiciones.append("r.fecha >= ?")
+            parametros.append(desde)
+        if hasta:
+            condiciones.append("r.fecha <= ?")
+            parametros.append(hasta)
+
+        consulta = self._consulta_fts(texto) if texto else ""
+        if consulta and self.usa_fts:
+            # Subconsulta IN: el planificador resuelve primero el índice FTS
+            # en vez de recorrer todas las recetas del usuario
+            condiciones.append("r.id IN (SELECT rowid FROM recetas_fts WHERE recetas_fts MATCH ?)")
+            parametros.append(consulta)
+        elif consulta:
+            for palabra in re.findall(r"\w+", texto, flags=re.UNICODE):
+                condiciones.append("(r.nombre LIKE ? OR r.apellido LIKE ? OR r.diagnostico LIKE ?)")
+                parametros.extend([f"%{palabra}%"] * 3)
+        sql = f"SELECT {columnas} FROM recetas r WHERE {' AND '.join(condiciones)}"
+
+        sql += " ORDER BY r.fecha DESC, r.id DESC LIMIT ?"
+        parametros.append(limite)
+        return [dict(fila) for fila in self._conexion().execute(sql, parametros)]
+
+    def obtener(self, username, receta_id):
+        """Registro de una receta del usuario, o None si no existe"""
+        fila = self._conexion().execute(
+            f"SELECT {', '.join(COLUMNAS)} FROM recetas WHERE id = ? AND username = ?",
+            (receta_id, username)
+        ).fetchone()
+        return dict(fila) if fila else None
+
+    def obtener_pdf(self, username, receta_id):
+        """PDF almacenado de una receta del usuario (sin volver a generarlo), o None"""
+        registro = self.obtener(username, receta_id)
+        archivo = self.abrir_pdf(registro) if registro is not None else None
+        if archivo is None:
+            return None
+        with archivo:
+            return archivo.read()
+
+    @staticmethod
+    def datos_receta(registro):
+        """Convierte un registro del historial en DatosReceta"""
+        return DatosReceta(
+            nombre=registro["nombre"],
+            apellido=registro["apellido"],
+            fecha=datetime.strptime(registro["fecha"], '%Y-%m-%d').date(),
+            diagnostico=registro["diagnostico"],
+            tipo_documento=registro["tipo_documento"],
+            contenido=registro["contenido"],
+        )
+
+    @staticmethod
+    def _condiciones_rango(username, desde, hasta):
+        condiciones, parametros = [], []
+        if username is not None:
+            condiciones.append("username = ?")
+            parametros.append(username)
+        desde, hasta = _fecha_iso(desde), _fecha_iso(hasta)
+        if desde:
+            condiciones.append("fecha >= ?")
+            parametros.append(desde)
+        if hasta:
+            condiciones.append("fecha <= ?")
+            parametros.append(hasta)
+        return condiciones, parametros
+
+    def contar(self, username=None, desde=None, hasta=None):
+        """Recetas del usuario (None = todos) en el rango de fechas (inclusive)"""
+        condiciones, parametros = self._condiciones_rango(username, desde, hasta)
+        donde = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        return self._conexion().execute(f"SELECT COUNT(*) FROM recetas{donde}", parametros).fetchone()[0]
+
+    def recorrer(self, username=None, desde=None, hasta=None, lote=500):
+        """
+        Recorre las recetas del rango de fechas (inclusive) en orden de fecha e id,
+        de a `lote` registros por consulta (paginación por clave): la memoria no
+        depende del total y no queda una lectura abierta entre lotes.
+        """
+        condiciones, parametros = self._condiciones_rango(username, desde, hasta)
+        columnas = ", ".join(COLUMNAS)
+        ultimo = None
+        while True:
+            pagina = list(condiciones)
+            valores = list(parametros)
+            if ultimo is not None:
+                pagina.append("(fecha, id) > (?, ?)")
+                valores.extend(ultimo)
+            donde = f" WHERE {' AND '.join(pagina)}" if pagina else ""
+            filas = self._conexion().execute(
+                f"SELECT {columnas} FROM recetas{donde} ORDER BY fecha, id LIMIT ?", valores + [lote]
+            ).fetchall()
+            for fila in filas:
+                yield dict(fila)
+            if len(filas) < lote:
+                return
+            ultimo = (filas[-1]["fecha"], filas[-1]["id"])
+
+    def abrir_pdf(self, registro):
+        """Archivo binario abierto con el PDF de un registro, o None si ya no está"""
+        try:
+            return open(self._ruta_pdf(registro["pdf_sha256"]), "rb")
+        except FileNotFoundError:
+            return None
+
+
+_historiales = {}
+_historiales_lock = threading.Lock()
+
+
+def obtener_historial(ruta="historial.db", directorio_pdfs="historial_pdfs"):
+    """Devuelve el historial compartido por el proceso para la base indicada"""
+    with _historiales_lock:
+        historial = _historiales.get(ruta)
+        if historial is None:
+            historial = HistorialRecetas(ruta, directorio_pdfs)
+            _historiales[ruta] = historial
+        return historial
@@ -0,0 +1,141 @@
+"""
+Limitador de intentos de inicio de sesión (token bucket por usuario y por cliente)
+
+Cada intento toma una ficha del cubo del usuario y otra del cubo del cliente
+(su dirección IP); los cubos se recargan a un ritmo fijo hasta su capacidad. Sin
+fichas, el intento se rechaza antes de consultar el almacén de usuarios y de
+hashear la contraseña, así una ráfaga de credenciales cuesta un par de
+operaciones de diccionario por intento. Un login correcto devuelve sus fichas:
+solo los fallidos gastan.
+
+Configuración (variables de entorno, ver crear_limitador_login):
+    LOGIN_INTENTOS_USUARIO=5      ráfaga de intentos fallidos por usuario
+    LOGIN_RECARGA_USUARIO_S=12    segundos para recuperar un intento por usuario
+    LOGIN_INTENTOS_CLIENTE=20     ráfaga de intentos fallidos por cliente
+    LOGIN_RECARGA_CLIENTE_S=1     segundos para recuperar un intento por cliente
+    LOGIN_MAX_CLAVES=10000        cubos en memoria por tipo (se descartan los menos usados)
+    LOGIN_PROXIES_CONFIABLES=     direcciones de los proxies (separadas por comas, o *)
+                                  cuyo X-Forwarded-For se usa para identificar al cliente
+
+Con 0 intentos se desactiva ese tipo de límite.
+
+El cliente es la dirección del otro extremo del socket. Solo si esa dirección es
+un proxy confiable se usa X-Forwarded-For, y de él la última dirección: la que
+agregó ese proxy. Las anteriores las escribe el cliente y no identifican a nadie.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+MAX_LARGO_CLAVE = 128  # usuarios y clientes más largos se recortan: la memoria queda acotada
+
+
+def _clave(valor):
+    return str(valor)[:MAX_LARGO_CLAVE]
+
+
+class CubosTokens:
+    """
+    Cubos de fichas por clave, con a lo sumo `max_claves` en memoria: al pasarse
+    se descarta el usado hace más tiempo (un cubo descartado vuelve lleno).
+    Cada operación es O(1).
+    """
+
+    def __init__(self, capacidad, segundos_por_ficha, max_claves=10000, reloj=time.monotonic):
+        self.capacidad = float(capacidad)
+        self.por_segundo = 1.0 / segundos_por_ficha
+        self.max_claves = max_claves
+        self.reloj = reloj
+        self.descartados = 0
+        self._cubos = OrderedDict()  # clave -> [fichas, instante de la última recarga]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._cubos)
+
+    def tomar(self, clave):
+        """Toma una ficha del cubo de `clave`. Retorna False si está vacío."""
+        ahora = self.reloj()
+        with self._lock:
+            cubo = self._cubos.get(clave)
+            if cubo is None:
+                cubo = self._cubos[clave] = [self.capacidad, ahora]
+                if len(self._cubos) > self.max_claves:
+                    self._cubos.popitem(last=False)
+                    self.descartados += 1
+            else:
+                self._cubos.move_to_end(clave)
+                cubo[0] = min(self.capacidad, cubo[0] + (ahora - cubo[1]) * self.por_segundo)
+                cubo[1] = ahora
+            if cubo[0] < 1.0:
+                return False
+            cubo[0] -= 1.0
+            return True
+
+    def devolver(self, clave):
+        """Devuelve una ficha tomada (p. ej. el intento resultó válido)"""
+        with self._lock:
+            cubo = self._cubos.get(clave)
+            if cubo is not None:
+                cubo[0] = min(self.capacidad, cubo[0] + 1.0)
+
+
+class LimitadorLogin:
+    """Cubos por usuario y por cliente para AuthManager.login"""
+
+    def __init__(self, intentos_usuario=5, recarga_usuario_s=12.0, intentos_cliente=20, recarga_cliente_s=1.0,
+                 max_claves=10000, reloj=time.monotonic):
+        self.por_usuario = self.por_cliente = None
+        if intentos_usuario > 0:
+            self.por_usuario = CubosTokens(intentos_usuario, recarga_usuario_s, max_claves, reloj)
+        if intentos_cliente > 0:
+            self.por_cliente = CubosTokens(intentos_cliente, recarga_cliente_s, max_claves, reloj)
+
+    def intentar(self, usuario, cliente=None):
+        """
+        Toma una ficha del cliente y otra del usuario. Retorna None si el intento
+        puede seguir, o "cliente"/"usuario" según qué cubo estaba vacío.
+        El cliente va primero: un atacante frenado no sigue gastando las fichas del usuario.
+        """
+        if cliente is not None and self.por_cliente is not None and not self.por_cliente.tomar(_clave(cliente)):
+            return "cliente"
+        if self.por_usuario is not None and not self.por_usuario.tomar(_clave(usuario)):
+            return "usuario"
+        return None
+
+    def exito(self, usuario, cliente=None):
+        """Devuelve las fichas de un login correcto"""
+        if self.por_usuario is not None:
+            self.por_usuario.devolver(_clave(usuario))
+        if cliente is not None and self.por_cliente is not None:
+            self.por_cliente.devolver(_clave(cliente))
+
+
+def _proxies_confiables():
+    return {p.strip() for p in os.getenv("LOGIN_PROXIES_CONFIABLES", "").split(",") if p.strip()}
+
+
+def direccion_cliente(par, reenviado=None, proxies=None):
+    """
+    Dirección del cliente para el limitador: `par` (el otro extremo del socket)
+    o, si `par` es uno de los `proxies` confiables ("*" = cualquiera; por defecto
+    LOGIN_PROXIES_CONFIABLES), la última entrada de X-Forwarded-For (`reenviado`).
+    """
+    proxies = _proxies_confiables() if proxies is None else proxies
+    if reenviado and par and ("*" in proxies or par in proxies):
+        ultima = reenviado.split(",")[-1].strip()
+        if ultima:
+            return ultima
+    return par
+
+
+def crear_limitador_login():
+    """LimitadorLogin configurado con las variables LOGIN_* (ver el docstring del módulo)"""
+    return LimitadorLogin(
+        intentos_usuario=int(os.getenv("LOGIN_INTENTOS_USUARIO", "5")),
+        recarga_usuario_s=float(os.getenv("LOGIN_RECARGA_USUARIO_S", "12")),
+        intentos_cliente=int(os.getenv("LOGIN_INTENTOS_CLIENTE", "20")),
+        recarga_cliente_s=float(os.getenv("LOGIN_RECARGA_CLIENTE_S", "1")),
+        max_claves=int(os.getenv("LOGIN_MAX_CLAVES", "10000")),
+    )
@@ -0,0 +1,223 @@
+"""
+Generación de recetas en lote desde un archivo CSV, JSONL o JSON
+
+Uso:
+    python lote.py pacientes.csv recetas.zip
+    python lote.py pacientes.jsonl recetas.pdf --procesos 4
+    python lote.py pacientes.json recetas.zip      # una lista JSON de objetos
+
+Cada fila debe tener: nombre, apellido, fecha, diagnostico, tipo_documento, contenido
+y puede tener usuario (el médico cuyo membrete se usa, ver plantillas.py)
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from io import BytesIO
+
+from motor_pdf import METADATOS, DatosReceta, renderizar
+from plantillas import obtener_cache, obtener_registro
+
+CAMPOS = ("nombre", "apellido", "fecha", "diagnostico", "tipo_documento", "contenido")
+FORMATOS_FECHA = ("%d/%m/%Y", "%Y-%m-%d")
+
+
+def _fila_json(valor):
+    return valor if isinstance(valor, dict) else {"_error": f"Se esperaba un objeto JSON: {valor!r:.60}"}
+
+
+def _leer_jsonl(ruta):
+    with open(ruta, "r", encoding="utf-8") as f:
+        for linea in f:
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                yield _fila_json(json.loads(linea))
+            except json.JSONDecodeError as e:
+                yield {"_error": f"JSON inválido: {e}"}
+
+
+def _leer_csv(ruta):
+    with open(ruta, "r", encoding="utf-8-sig", newline="") as f:
+        yield from csv.DictReader(f)
+
+
+def leer_filas(ruta):
+    """
+    Iterador de las filas del archivo de entrada según la extensión: .csv, .jsonl
+    (un objeto por línea) o .json (una lista de objetos, se lee entero).
+    Las líneas JSONL inválidas se devuelven como error para no abortar el lote;
+    un .json inválido o que no es una lista lanza ValueError antes de empezar.
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension == ".jsonl":
+        return _leer_jsonl(ruta)
+    if extension == ".json":
+        with open(ruta, "r", encoding="utf-8") as f:
+            try:
+                filas = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{ruta}: JSON inválido: {e}") from e
+        if not isinstance(filas, list):
+            raise ValueError(f"{ruta}: se esperaba una lista de recetas (para un objeto por línea use .jsonl)")
+        return map(_fila_json, filas)
+    return _leer_csv(ruta)
+
+
+def _parsear_fecha(valor):
+    if isinstance(valor, datetime):
+        return valor
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(str(valor).strip(), formato)
+        except ValueError:
+            continue
+    raise ValueError(f"Fecha inválida: {valor!r} (use DD/MM/AAAA o AAAA-MM-DD)")
+
+
+def _inicializar_worker():
+    """
+    Carga el registro y prepara la plantilla por defecto para el PDF plano (la
+    que usa renderizar()) una vez por proceso antes de recibir filas
+    """
+    try:
+        obtener_cache(obtener_registro().resolver().ruta).obtener_empalme(METADATOS)
+    except Exception:
+        # El error se reportará en cada fila
+        pass
+
+
+def datos_desde_fila(fila):
+    """DatosReceta de una fila (dict con CAMPOS); lanza ValueError si está incompleta o es inválida"""
+    if "_error" in fila:
+        raise ValueError(fila["_error"])
+    faltantes = [campo for campo in CAMPOS if not fila.get(campo)]
+    if faltantes:
+        raise ValueError(f"Campos vacíos: {', '.join(faltantes)}")
+    valores = {campo: fila[campo] for campo in CAMPOS}
+    valores["fecha"] = _parsear_fecha(valores["fecha"])
+    datos = DatosReceta(**valores)
+    datos.validar()
+    return datos
+
+
+def procesar_fila(item):
+    """
+    Genera el PDF de una fila.
+    Retorna (indice, nombre_archivo, pdf_bytes, error); nunca lanza excepciones.
+    """
+    indice, fila = item
+    try:
+        datos = datos_desde_fila(fila)
+        pdf = renderizar(datos, usuario=fila.get("usuario") or None)
+        return indice, f"{indice:05d}_{datos.nombre_archivo()}", pdf, None
+    except Exception as e:
+        return indice, None, None, f"{type(e).__name__}: {e}"
+
+
+def _resultados(filas, procesos, chunksize):
+    items = enumerate(filas, start=1)
+    if procesos == 0:
+        # Sin pool: útil para depurar o para lotes muy pequeños
+        _inicializar_worker()
+        yield from map(procesar_fila, items)
+        return
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_worker) as executor:
+        yield from executor.map(procesar_fila, items, chunksize=chunksize)
+
+
+def generar_lote(entrada, salida, formato=None, procesos=None, chunksize=8):
+    """
+    Genera todas las recetas de `entrada` y las guarda en `salida`:
+    un ZIP con un PDF por fila o un único PDF con todas las páginas.
+
+    procesos: número de procesos del pool (None = CPUs disponibles, 0 = sin pool)
+    Retorna un diccionario con el resumen del lote y los errores por fila.
+    """
+    if formato is None:
+        formato = "pdf" if salida.lower().endswith(".pdf") else "zip"
+    if formato not in ("zip", "pdf"):
+        raise ValueError(f"Formato no soportado: {formato}")
+    if procesos is None:
+        procesos = os.cpu_count() or 1
+
+    inicio = time.perf_counter()
+    filas = leer_filas(entrada)
+    total = 0
+    generadas = 0
+    errores = []
+
+    if formato == "zip":
+        destino = zipfile.ZipFile(salida, "w", compression=zipfile.ZIP_DEFLATED)
+    else:
+        from PyPDF2 import PdfReader, PdfWriter
+        destino = PdfWriter()
+
+    try:
+        for indice, nombre_archivo, pdf, error in _resultados(filas, procesos, chunksize):
+            total += 1
+            if error:
+                errores.append({"fila": indice, "error": error})
+                continue
+            if formato == "zip":
+                destino.writestr(nombre_archivo, pdf)
+            else:
+                for page in PdfReader(BytesIO(pdf)).pages:
+                    destino.add_page(page)
+            generadas += 1
+    finally:
+        if formato == "zip":
+            destino.close()
+
+    if formato == "pdf":
+        with open(salida, "wb") as f:
+            destino.write(f)
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "entrada": entrada,
+        "salida": salida,
+        "formato": formato,
+        "procesos": procesos,
+        "filas": total,
+        "generadas": generadas,
+        "fallidas": len(errores),
+        "segundos": round(segundos, 3),
+        "filas_por_segundo": round(total / segundos, 2) if segundos > 0 else 0.0,
+        "errores": errores,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera recetas en lote desde CSV/JSONL/JSON")
+    parser.add_argument("entrada", help="Archivo .csv, .jsonl o .json con las filas")
+    parser.add_argument("salida", help="Archivo .zip (un PDF por fila) o .pdf (todas las páginas)")
+    parser.add_argument("--formato", choices=["zip", "pdf"], help="Forzar el formato de salida")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos del pool (0 = sin pool)")
+    parser.add_argument("--chunksize", type=int, default=8, help="Filas enviadas a cada proceso por tanda")
+    args = parser.parse_args(argv)
+
+    print(f"📋 Procesando {args.entrada}...")
+    try:
+        resumen = generar_lote(args.entrada, args.salida, args.formato, args.procesos, args.chunksize)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+    print(f"✅ {resumen['generadas']} de {resumen['filas']} recetas generadas en {resumen['salida']}")
+    print(f"⏱️  {resumen['segundos']} s ({resumen['filas_por_segundo']} filas/s, {resumen['procesos']} procesos)")
+    if resumen["errores"]:
+        print(f"⚠️  {resumen['fallidas']} filas con error:")
+        for error in resumen["errores"]:
+            print(f"   Fila {error['fila']}: {error['error']}")
+    return 1 if resumen["generadas"] == 0 and resumen["filas"] > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
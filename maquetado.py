@@ -0,0 +1,159 @@
+"""
+Maquetado de texto para el PDF plano
+
+Mide el texto con tablas de anchos de glifo (milésimas del cuerpo, por código
+WinAnsi) que se arman una sola vez por fuente: la de /Widths de la fuente de la
+plantilla o, para las fuentes estándar sin /Widths, las métricas de Helvetica
+(iguales a las de Arial) o de Courier. Con esas tablas parte el texto en líneas
+que entran en el ancho de un campo y las líneas en páginas.
+
+Todo el trabajo es lineal en el largo del texto: los párrafos que entran en una
+línea se miden de una vez, en los demás cada palabra se mide una vez (los anchos
+de las palabras repetidas salen de una caché) y las palabras más anchas que la
+línea se cortan en una sola pasada.
+"""
+from utiles_pdf import valor_pdf
+
+ANCHO_POR_DEFECTO = 556  # Helvetica/Arial: ancho medio en milésimas del cuerpo
+MAX_PALABRAS_CACHE = 4096
+MAX_LARGO_PALABRA_CACHE = 32
+
+# Helvetica (AFM estándar), códigos WinAnsi 32-255; los códigos sin glifo llevan el ancho medio
+_ANCHOS_HELVETICA = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584, 556,
+    556, 556, 222, 556, 333, 1000, 556, 556, 333, 1000, 667, 333, 1000, 556, 611, 556,
+    556, 222, 222, 333, 333, 350, 556, 1000, 333, 1000, 500, 333, 944, 556, 500, 667,
+    278, 333, 556, 556, 556, 556, 260, 556, 333, 737, 370, 556, 584, 333, 737, 333,
+    400, 584, 333, 333, 333, 556, 537, 278, 333, 333, 365, 556, 834, 834, 834, 611,
+    667, 667, 667, 667, 667, 667, 1000, 722, 667, 667, 667, 667, 278, 278, 278, 278,
+    722, 722, 778, 778, 778, 778, 778, 584, 778, 722, 722, 722, 722, 667, 667, 611,
+    556, 556, 556, 556, 556, 556, 889, 500, 556, 556, 556, 556, 278, 278, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 584, 611, 556, 556, 556, 556, 500, 556, 500,
+)
+
+
+def codificar(texto):
+    """Texto en WinAnsi (cp1252); los caracteres sin equivalente se reemplazan por '?'"""
+    return texto.encode("cp1252", errors="replace")
+
+
+class MetricasFuente:
+    """Tabla de anchos de los 256 códigos WinAnsi de una fuente, con caché de anchos de palabras"""
+
+    def __init__(self, anchos):
+        self.anchos = tuple(float(a) for a in anchos)
+        self._palabras = {}
+
+    @classmethod
+    def desde_fuente(cls, fuente):
+        """Métricas de un diccionario /Font de PyPDF2 (None = Helvetica)"""
+        if fuente is None or "/Widths" not in fuente:
+            base = str(fuente.get("/BaseFont", "")) if fuente is not None else ""
+            return COURIER if "Courier" in base else HELVETICA
+        primero = int(fuente.get("/FirstChar", 0))
+        faltante = float(valor_pdf(valor_pdf(fuente, "/FontDescriptor", {}), "/MissingWidth", 0)) or ANCHO_POR_DEFECTO
+        anchos = [faltante] * 256
+        for i, ancho in enumerate(valor_pdf(fuente, "/Widths")):
+            if 0 <= primero + i < 256:
+                anchos[primero + i] = float(ancho)
+        return cls(anchos)
+
+    def ancho_palabra(self, palabra):
+        """Ancho en milésimas del cuerpo de un texto ya codificado"""
+        if len(palabra) > MAX_LARGO_PALABRA_CACHE:
+            return sum(map(self.anchos.__getitem__, palabra))
+        ancho = self._palabras.get(palabra)
+        if ancho is None:
+            ancho = sum(map(self.anchos.__getitem__, palabra))
+            # Al llenarse se vacía: volver a medir una palabra es sumar a lo sumo MAX_LARGO_PALABRA_CACHE anchos
+            if len(self._palabras) >= MAX_PALABRAS_CACHE:
+                self._palabras.clear()
+            self._palabras[palabra] = ancho
+        return ancho
+
+    def ancho(self, codificado, tamano):
+        """Ancho en puntos de un texto codificado con la fuente a `tamano` puntos"""
+        return sum(map(self.anchos.__getitem__, codificado)) * tamano / 1000
+
+    def partir(self, texto, ancho_max, tamano, limite=None):
+        """
+        Ajusta el texto al ancho por palabras y devuelve las líneas codificadas
+        (a lo sumo `limite`). Conserva la sangría inicial de cada párrafo; una
+        palabra más ancha que la línea se corta por caracteres.
+        """
+        anchos = self.anchos
+        # Se compara en milésimas del cuerpo: ningún ancho se escala por separado
+        maximo = ancho_max * 1000 / tamano
+        espacio = anchos[32]
+        lineas = []
+        for parrafo in texto.split("\n"):
+            if limite is not None and len(lineas) >= limite:
+                return lineas[:limite]
+            codificado = codificar(parrafo)
+            if sum(map(anchos.__getitem__, codificado)) <= maximo:
+                # El párrafo entero entra en una línea (el caso común): no se recorre por palabras
+                lineas.append(codificado)
+                continue
+            cuerpo = codificado.lstrip(b" ")
+            actual = [codificado[:len(codificado) - len(cuerpo)]]
+            ancho_actual = (len(codificado) - len(cuerpo)) * espacio
+            con_palabras = False
+            for palabra in cuerpo.split(b" "):
+                if limite is not None and len(lineas) >= limite:
+                    return lineas[:limite]
+                ancho_palabra = self.ancho_palabra(palabra)
+                separador = espacio if con_palabras else 0.0
+                if con_palabras and ancho_actual + separador + ancho_palabra > maximo:
+                    lineas.append(b" ".join(actual))
+                    actual, ancho_actual, con_palabras, separador = [], 0.0, False, 0.0
+                if len(palabra) > 1 and ancho_actual + separador + ancho_palabra > maximo:
+                    palabra, ancho_palabra = self._cortar(palabra, actual, ancho_actual, separador, maximo, lineas)
+                    actual, ancho_actual, separador = [], 0.0, 0.0
+                if con_palabras or not actual:
+                    actual.append(palabra)
+                else:
+                    # Primera palabra del párrafo: va pegada a la sangría
+                    actual[0] += palabra
+                ancho_actual += separador + ancho_palabra
+                con_palabras = True
+            if limite is not None and len(lineas) >= limite:
+                return lineas[:limite]
+            lineas.append(b" ".join(actual))
+        return lineas
+
+    def _cortar(self, palabra, actual, ancho_actual, separador, maximo, lineas):
+        """
+        Corta por caracteres una palabra que no entra: completa la línea `actual`
+        y agrega líneas llenas a `lineas`. Retorna el resto (y su ancho), que
+        siempre entra en una línea nueva.
+        """
+        anchos = self.anchos
+        disponible = maximo - ancho_actual - separador
+        inicio = 0
+        acumulado = 0.0
+        for posicion, b in enumerate(palabra):
+            if acumulado + anchos[b] > disponible and posicion > inicio:
+                pedazo = palabra[inicio:posicion]
+                if actual:
+                    linea = b" ".join(actual)
+                    lineas.append(linea + (b" " if separador else b"") + pedazo)
+                    actual = None
+                else:
+                    lineas.append(pedazo)
+                inicio, acumulado, disponible = posicion, 0.0, maximo
+            acumulado += anchos[b]
+        return palabra[inicio:], acumulado
+
+
+def paginar(lineas, capacidad):
+    """Reparte las líneas en páginas de `capacidad` líneas (al menos una página)"""
+    return [lineas[i:i + capacidad] for i in range(0, len(lineas), capacidad)] or [[]]
+
+
+HELVETICA = MetricasFuente(([ANCHO_POR_DEFECTO] * 32) + list(_ANCHOS_HELVETICA))
+COURIER = MetricasFuente([600] * 256)
@@ -0,0 +1,243 @@
+"""
+Métricas de la aplicación en el formato de texto de Prometheus
+
+Desactivadas por defecto. Se activan con alguna de estas variables:
+    METRICAS_PUERTO=9464            endpoint local http://127.0.0.1:9464/metrics
+                                    (METRICAS_HOST cambia la interfaz)
+    METRICAS_ARCHIVO=recetas.prom   archivo reescrito cada METRICAS_INTERVALO_S
+                                    segundos (15), p. ej. para el textfile
+                                    collector de node_exporter
+
+Uso:
+    with medir("generar_pdf"):          # histograma recetas_etapa_segundos{etapa=...}
+        ...
+    contar("logins", resultado="ok")    # contador recetas_logins_total{resultado=...}
+
+Una excepción que sale de medir() cuenta en recetas_errores_total{etapa, tipo}
+(st.stop() y st.rerun() no son errores). Con las métricas desactivadas, medir()
+devuelve un contexto vacío compartido y contar() retorna de inmediato.
+"""
+import atexit
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+PREFIJO = "recetas_"
+LIMITES = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DESCRIPCIONES = {
+    "etapa_segundos": "Duración de las etapas de la app y de la generación de PDFs",
+    "logins_total": "Intentos de inicio de sesión por resultado",
+    "logins_limitados_total": "Intentos de inicio de sesión rechazados por el limitador, por cubo vacío",
+    "generaciones_total": "PDFs generados por resultado",
+    "errores_total": "Errores por etapa y tipo de excepción",
+    "api_solicitudes_total": "Solicitudes a la API HTTP por ruta y código de estado",
+    "auditoria_descartados_total": "Eventos de auditoría descartados con la cola llena",
+}
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(pares, extra=None):
+    pares = list(pares) + ([extra] if extra else [])
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in pares) + "}"
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Metricas:
+    """Contadores e histogramas en memoria, seguros entre hilos"""
+
+    def __init__(self, limites=LIMITES):
+        self.limites = tuple(limites)
+        self._lock = threading.Lock()
+        self._contadores = {}
+        self._histogramas = {}
+
+    def incrementar(self, nombre, valor=1, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + valor
+
+    def observar(self, nombre, valor, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        # Cubeta del primer límite >= valor (la última es +Inf)
+        cubeta = bisect_left(self.limites, valor)
+        with self._lock:
+            histograma = self._histogramas.get(clave)
+            if histograma is None:
+                histograma = self._histogramas[clave] = [[0] * (len(self.limites) + 1), 0.0]
+            histograma[0][cubeta] += 1
+            histograma[1] += valor
+
+    def exportar(self):
+        """Texto en el formato de exposición de Prometheus (versión 0.0.4)"""
+        with self._lock:
+            contadores = sorted(self._contadores.items())
+            histogramas = sorted((clave, (list(cubetas), suma)) for clave, (cubetas, suma) in self._histogramas.items())
+
+        lineas = []
+        anterior = None
+        for (nombre, pares), valor in contadores:
+            if nombre != anterior:
+                lineas += self._encabezado(nombre, "counter")
+                anterior = nombre
+            lineas.append(f"{PREFIJO}{nombre}{_etiquetas(pares)} {_numero(valor)}")
+        for (nombre, pares), (cubetas, suma) in histogramas:
+            if nombre != anterior:
+                lineas += self._encabezado(nombre, "histogram")
+                anterior = nombre
+            acumulado = 0
+            for limite, cantidad in zip(self.limites + ("+Inf",), cubetas):
+                acumulado += cantidad
+                le = limite if limite == "+Inf" else _numero(float(limite))
+                lineas.append(f"{PREFIJO}{nombre}_bucket{_etiquetas(pares, ('le', le))} {acumulado}")
+            lineas.append(f"{PREFIJO}{nombre}_sum{_etiquetas(pares)} {_numero(suma)}")
+            lineas.append(f"{PREFIJO}{nombre}_count{_etiquetas(pares)} {acumulado}")
+        return "\n".join(lineas) + "\n" if lineas else ""
+
+    @staticmethod
+    def _encabezado(nombre, tipo):
+        descripcion = DESCRIPCIONES.get(nombre)
+        encabezado = [f"# HELP {PREFIJO}{nombre} {descripcion}"] if descripcion else []
+        return encabezado + [f"# TYPE {PREFIJO}{nombre} {tipo}"]
+
+    def guardar(self, ruta):
+        """Escribe exportar() en `ruta` de forma atómica"""
+        temporal = f"{ruta}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(self.exportar())
+        os.replace(temporal, ruta)
+
+
+class _Medicion:
+    """Contexto de medir(): observa la duración y cuenta las excepciones"""
+
+    __slots__ = ("metricas", "etapa", "inicio")
+
+    def __init__(self, metricas, etapa):
+        self.metricas = metricas
+        self.etapa = etapa
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, error, traza):
+        self.metricas.observar("etapa_segundos", time.perf_counter() - self.inicio, etapa=self.etapa)
+        # StopException/RerunException de Streamlit heredan de BaseException: no son errores
+        if tipo is not None and issubclass(tipo, Exception):
+            self.metricas.incrementar("errores_total", etapa=self.etapa, tipo=tipo.__name__)
+        return False
+
+
+class _MedicionNula:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, error, traza):
+        return False
+
+
+_NULA = _MedicionNula()
+_metricas = Metricas() if os.getenv("METRICAS_PUERTO") or os.getenv("METRICAS_ARCHIVO") else None
+_exportacion_iniciada = False
+_exportacion_lock = threading.Lock()
+
+
+def activas():
+    """True si METRICAS_PUERTO o METRICAS_ARCHIVO activaron las métricas"""
+    return _metricas is not None
+
+
+def obtener_metricas():
+    """Métricas del proceso, o None si están desactivadas"""
+    return _metricas
+
+
+def medir(etapa):
+    """Contexto que mide la duración de `etapa` (vacío si las métricas están desactivadas)"""
+    if _metricas is None:
+        return _NULA
+    return _Medicion(_metricas, etapa)
+
+
+def contar(nombre, **etiquetas):
+    """Incrementa el contador recetas_<nombre>_total"""
+    if _metricas is not None:
+        _metricas.incrementar(f"{nombre}_total", **etiquetas)
+
+
+def _crear_servidor(metricas, host, puerto):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            cuerpo = metricas.exportar().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((host, puerto), Manejador)
+    servidor.daemon_threads = True
+    return servidor
+
+
+def _escribir_periodicamente(metricas, ruta, intervalo):
+    while True:
+        time.sleep(intervalo)
+        try:
+            metricas.guardar(ruta)
+        except OSError as e:
+            print(f"⚠️  No se pudieron escribir las métricas en {ruta}: {e}", file=sys.stderr)
+
+
+def iniciar_exportacion():
+    """
+    Abre el endpoint HTTP y/o el archivo de métricas configurados (una sola vez
+    por proceso). Sin métricas activas no hace nada.
+    """
+    global _exportacion_iniciada
+    if _metricas is None or _exportacion_iniciada:
+        return
+    with _exportacion_lock:
+        if _exportacion_iniciada:
+            return
+        _exportacion_iniciada = True
+
+        puerto = os.getenv("METRICAS_PUERTO")
+        if puerto:
+            host = os.getenv("METRICAS_HOST", "127.0.0.1")
+            try:
+                servidor = _crear_servidor(_metricas, host, int(puerto))
+            except OSError as e:
+                # Otro proceso ya usa el puerto: se siguen registrando las métricas
+                print(f"⚠️  No se pudo abrir el endpoint de métricas en {host}:{puerto}: {e}", file=sys.stderr)
+            else:
+                threading.Thread(target=servidor.serve_forever, name="metricas-http", daemon=True).start()
+
+        ruta = os.getenv("METRICAS_ARCHIVO")
+        if ruta:
+            intervalo = float(os.getenv("METRICAS_INTERVALO_S", "15"))
+            threading.Thread(
+                target=_escribir_periodicamente, args=(_metricas, ruta, intervalo),
+                name="metricas-archivo", daemon=True,
+            ).start()
+            atexit.register(_metricas.guardar, ruta)
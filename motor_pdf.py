@@ -0,0 +1,245 @@
+"""
+Motor de generación de PDFs de recetas, independiente de la interfaz de Streamlit
+
+API:
+    datos = DatosReceta(nombre, apellido, fecha, diagnostico, tipo_documento, contenido)
+    pdf_bytes = renderizar(datos)                  # PDF plano (sin formulario)
+    pdf_bytes = renderizar(datos, aplanar=False)   # campos del formulario rellenados
+    pdf_bytes = renderizar(datos, usuario="dra_lopez")  # membrete registrado del médico
+    precompilar(contenido, usuario="dra_lopez")    # texto que se repite: normalizado y maquetado de antemano
+
+Los errores se reportan con excepciones propias (ErrorGeneracionPDF y subclases),
+nunca escribiendo en la interfaz. PyPDF2 se importa solo al generar el primer PDF,
+así que importar este módulo es inmediato (workers, CLIs, tests).
+"""
+from dataclasses import dataclass
+from datetime import date
+from io import BytesIO
+
+from auditoria import registrar
+from metricas import contar, medir
+
+TIPOS_DOCUMENTO = ("Receta (Rp.)", "Indicaciones / Notas")
+METADATOS = {"/Producer": "Generador de Recetas Médicas"}
+# Subirla con cada cambio en los bytes que salen de renderizar() (maquetado, empalme,
+# optimizador, METADATOS): es parte de la clave de la caché de PDFs, que en disco
+# sobrevive a los despliegues. Junto a ella va normalizador.VERSION.
+VERSION_RENDERIZADO = 1
+
+
+class ErrorGeneracionPDF(Exception):
+    """Error al generar el PDF de una receta"""
+
+
+class PlantillaNoEncontradaError(ErrorGeneracionPDF, FileNotFoundError):
+    """No existe el archivo de plantilla PDF"""
+
+
+class DatosInvalidosError(ErrorGeneracionPDF, ValueError):
+    """Los datos de la receta están incompletos o tienen un formato inválido"""
+
+
+@dataclass(frozen=True)
+class DatosReceta:
+    """Datos de entrada para generar una receta"""
+    nombre: str
+    apellido: str
+    fecha: date
+    diagnostico: str
+    tipo_documento: str = TIPOS_DOCUMENTO[0]
+    contenido: str = ""
+
+    @property
+    def nombre_completo(self):
+        return f"{self.nombre} {self.apellido}"
+
+    def validar(self):
+        """Lanza DatosInvalidosError si falta algún campo obligatorio, no es texto o el tipo no existe"""
+        no_texto = [
+            campo for campo in ("nombre", "apellido", "diagnostico", "tipo_documento", "contenido")
+            if not isinstance(getattr(self, campo), str)
+        ]
+        if no_texto:
+            raise DatosInvalidosError(f"Campos que deben ser texto: {', '.join(no_texto)}")
+        faltantes = [
+            campo for campo in ("nombre", "apellido", "diagnostico", "contenido")
+            if not getattr(self, campo)
+        ]
+        if faltantes:
+            raise DatosInvalidosError(f"Campos vacíos: {', '.join(faltantes)}")
+        if not hasattr(self.fecha, "strftime"):
+            raise DatosInvalidosError(f"Fecha inválida: {self.fecha!r}")
+        if self.tipo_documento not in TIPOS_DOCUMENTO:
+            raise DatosInvalidosError(
+                f"Tipo de documento inválido: {self.tipo_documento!r} (use {' o '.join(TIPOS_DOCUMENTO)})")
+
+    def nombre_archivo(self):
+        """Nombre sugerido para la descarga del PDF"""
+        return f"Receta_{self.apellido}_{self.nombre}_{self.fecha.strftime('%Y%m%d')}.pdf"
+
+
+def formatear_contenido(contenido):
+    """
+    Convierte el contenido del editor (HTML o texto) en el texto del campo Texto1:
+    listas con viñetas/numeración, entidades decodificadas y "Rp." seguido de "/"
+    en la línea siguiente unido en "Rp./". Ver normalizador.py.
+    """
+    from normalizador import normalizar_contenido
+    with medir("formatear_contenido"):
+        return normalizar_contenido(contenido)
+
+
+def precompilar(contenido, texto=None, usuario=None, tipo_documento=TIPOS_DOCUMENTO[0]):
+    """
+    Prepara un contenido que se repite (favoritos de un médico): registra su texto
+    normalizado (`texto`, si ya se conoce) y guarda el maquetado de Texto1 en la
+    plantilla del usuario, así renderizar() no vuelve a normalizarlo ni a partirlo
+    en líneas. Lanza PlantillaNoEncontradaError si no existe la plantilla.
+    """
+    from normalizador import precompilar as registrar_texto
+    from plantillas import obtener_cache, obtener_registro
+
+    texto = registrar_texto(contenido, texto)
+    try:
+        plana = obtener_cache(obtener_registro().resolver(usuario, tipo_documento).ruta).obtener_plana()
+    except FileNotFoundError as e:
+        raise PlantillaNoEncontradaError(str(e)) from e
+    plana.precompilar({"Texto1": texto})
+    return texto
+
+
+def campos_formulario(datos):
+    """Valores de los campos del formulario PDF: Date, Paciente, Dx, Texto1"""
+    return {
+        "Date": datos.fecha.strftime('%d/%m/%Y'),
+        "Paciente": datos.nombre_completo,
+        "Dx": datos.diagnostico,
+        "Texto1": formatear_contenido(datos.contenido)
+    }
+
+
+def _marcar_widgets_visibles(writer):
+    """Marca los campos del formulario como visibles/imprimibles"""
+    from PyPDF2.generic import NameObject, NumberObject
+
+    for page in writer.pages:
+        if "/Annots" in page:
+            for annot_ref in page["/Annots"]:
+                annot = annot_ref.get_object()
+                if annot["/Subtype"] == "/Widget":
+                    annot[NameObject("/F")] = NumberObject(annot.get("/F", 0) | 4)  # Print flag
+
+
+def _rellenar_formulario(writer, campos):
+    """Rellena los campos del formulario (PDF editable) y devuelve los bytes"""
+    writer.update_page_form_field_values(writer.pages[0], campos)
+    writer.add_metadata(METADATOS)
+
+    # Aplanar los campos del formulario para que se visualicen directamente
+    # sin necesidad de hacer click (PyPDF2 >= 3.0)
+    try:
+        _marcar_widgets_visibles(writer)
+    except Exception:
+        pass
+
+    # Intentar usar flatten() si está disponible
+    try:
+        writer.pages[0].flatten(list(writer.pages[0].get_fields().keys()) if hasattr(writer.pages[0], 'get_fields') else None)
+    except (AttributeError, TypeError):
+        # Si flatten no está disponible o falla, continuar sin aplanar
+        # Los campos seguirán siendo rellenados pero interactivos
+        pass
+
+    # Escribir el PDF en un buffer
+    output_buffer = BytesIO()
+    writer.write(output_buffer)
+    return output_buffer.getvalue()
+
+
+def renderizar(datos, plantilla=None, usar_cache=True, aplanar=True, usuario=None):
+    """
+    Genera el PDF de la receta y lo devuelve en bytes.
+
+    Sin `plantilla`, se usa la registrada para el usuario y el tipo de documento
+    (membrete de cada médico, ver plantillas.RegistroPlantillas).
+
+    Con aplanar=True (por defecto) el texto se escribe directamente en el contenido
+    de la página sobre la plantilla ya preparada sin formulario (ver aplanado.py),
+    empalmando sus bytes ya serializados (ver empalme.py).
+    Con aplanar=False se rellenan los campos del formulario y el PDF queda editable.
+
+    Si los mismos datos ya se generaron con la misma versión de la plantilla y del motor,
+    devuelve los bytes guardados en la caché de PDFs.
+    La duración y el resultado quedan en las métricas (ver metricas.py) y, si está
+    activa, en la auditoría con el sha256 del PDF (ver auditoria.py).
+    Lanza PlantillaNoEncontradaError, DatosInvalidosError o ErrorGeneracionPDF.
+    """
+    try:
+        with medir("generar_pdf"):
+            pdf = _renderizar(datos, plantilla, usar_cache, aplanar, usuario)
+    except Exception as e:
+        contar("generaciones", resultado="error")
+        registrar("generacion", usuario=usuario, apellido=datos.apellido, nombre=datos.nombre,
+                  fecha=datos.fecha, tipo_documento=datos.tipo_documento, resultado="error", error=type(e).__name__)
+        raise
+    contar("generaciones", resultado="ok")
+    registrar("generacion", usuario=usuario, apellido=datos.apellido, nombre=datos.nombre,
+              fecha=datos.fecha, tipo_documento=datos.tipo_documento, resultado="ok", pdf=pdf)
+    return pdf
+
+
+def _renderizar(datos, plantilla, usar_cache, aplanar, usuario):
+    datos.validar()
+
+    from plantillas import obtener_cache, obtener_registro
+    from cache_pdf import clave_pdf, obtener_cache_pdf
+    from normalizador import VERSION as VERSION_NORMALIZADOR
+
+    campos = campos_formulario(datos)
+    cache = obtener_cache_pdf() if usar_cache else None
+
+    try:
+        if plantilla is None:
+            plantilla = obtener_registro().resolver(usuario, datos.tipo_documento).ruta
+        plantilla_cache = obtener_cache(plantilla)
+        clave = None
+        if cache is not None:
+            version = plantilla_cache.verificar()
+            version = f"{VERSION_RENDERIZADO}.{VERSION_NORMALIZADOR}:{version}"
+            clave = clave_pdf(f"{version}:plano" if aplanar else version, campos)
+            pdf = cache.obtener(clave)
+            if pdf is not None:
+                return pdf
+        if aplanar:
+            # Plantilla sin formulario preparada (y serializada) una vez por versión del archivo
+            empalme = plantilla_cache.obtener_empalme(METADATOS)
+            plana = plantilla_cache.obtener_plana() if empalme is None else None
+        else:
+            # Copia de la plantilla ya parseada (se relee solo si el archivo cambia)
+            writer = plantilla_cache.obtener_writer()
+    except FileNotFoundError as e:
+        raise PlantillaNoEncontradaError(str(e)) from e
+    except Exception as e:
+        raise ErrorGeneracionPDF(f"No se pudo leer la plantilla {plantilla}: {e}") from e
+
+    try:
+        if aplanar and empalme is not None:
+            pdf = empalme.renderizar(campos)
+        elif aplanar:
+            pdf = plana.renderizar(campos, METADATOS)
+        else:
+            pdf = _rellenar_formulario(writer, campos)
+    except Exception as e:
+        raise ErrorGeneracionPDF(f"Error al generar PDF: {e}") from e
+
+    if cache is not None:
+        cache.guardar(clave, pdf)
+    return pdf
+
+
+def generar_pdf(nombre, apellido, fecha, diagnostico, tipo_documento, contenido, usuario=None):
+    """
+    Genera el PDF plano con los campos Date, Paciente, Dx y Texto1 escritos
+    sobre la plantilla del usuario y tipo de documento (compatibilidad con la API anterior).
+    """
+    return renderizar(DatosReceta(nombre, apellido, fecha, diagnostico, tipo_documento, contenido), usuario=usuario)
@@ -0,0 +1,250 @@
+"""
+Normalización del contenido del editor a texto para el campo del PDF
+
+El editor (TinyMCE) devuelve HTML: párrafos, saltos, negritas, listas y enlaces.
+Este módulo lo convierte en texto plano en una sola pasada sobre los tokens
+(una expresión regular compilada, sin backtracking entre etiquetas), así que el
+costo es lineal en el largo de la nota:
+
+    - párrafos, títulos y <div> terminan línea; <br> es un salto duro
+    - <ul>/<ol> se convierten en viñetas "• " y numeración "1. ", con sangría por nivel
+    - los enlaces conservan el texto y agregan la URL entre paréntesis si es distinta
+    - las entidades (&nbsp;, &amp;, ...) se decodifican y los espacios se colapsan
+    - "Rp." al final de una línea seguido de una línea que empieza con "/" se une en "Rp./"
+
+El texto plano (sin etiquetas) solo recibe la regla de Rp./, igual que antes.
+Los contenidos que se repiten (favoritos de cada médico) se registran con
+precompilar() junto con su texto ya normalizado y se devuelven sin procesarlos.
+"""
+import re
+from html import unescape
+
+# "Rp.\n/", "Rp. \n/", "Rp.\n /" y "Rp. \n /" -> "Rp./"
+_RP_SALTO = re.compile(r"Rp\. ?\n ?/")
+_ETIQUETA = re.compile(r"<[a-zA-Z/!?]")
+# Los atributos no pueden contener "<": una etiqueta sin cerrar se corta en el
+# siguiente "<" en vez de recorrer el resto del texto
+_TOKEN = re.compile(r"<(/?)([a-zA-Z][a-zA-Z0-9]*)([^<>]*)>|<[!?][^<>]*>|([^<]+)|<")
+_ESPACIOS = re.compile(r"[ \t\r\n\f]+")
+_ATRIBUTO = re.compile(r"""([a-zA-Z-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""")
+
+BLOQUES = frozenset((
+    "p", "div", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "address",
+    "section", "article", "header", "footer", "table", "tr", "hr", "dl", "dt", "dd",
+    "figure", "figcaption",
+))
+OCULTAS = frozenset(("script", "style", "head", "title", "template"))
+VINETA = "•"
+SANGRIA = "  "
+MAX_PRECOMPILADOS = 1024
+VERSION = 1  # subirla al cambiar las reglas: los textos normalizados guardados se recalculan
+
+_precompilados = {}
+
+
+def _atributos(texto):
+    return {
+        nombre.lower(): unescape(doble or simple or sin_comillas or "")
+        for nombre, doble, simple, sin_comillas in _ATRIBUTO.findall(texto)
+    }
+
+
+class _Normalizador:
+    """Estado del recorrido: líneas emitidas, listas abiertas, enlaces y bloques ignorados"""
+
+    def __init__(self):
+        self.partes = []
+        self.inicio_linea = True
+        self.espacio = False
+        self.marcador = None
+        self.listas = []
+        self.enlaces = []
+        self.ocultas = 0
+        self.pre = 0
+
+    def _quitar_espacios_finales(self):
+        partes = self.partes
+        while partes and partes[-1].endswith(" "):
+            ultimo = partes.pop().rstrip(" ")
+            if ultimo:
+                partes.append(ultimo)
+                break
+
+    def salto(self):
+        """Termina la línea actual (no hace nada si ya está al inicio de una línea)"""
+        if self.inicio_linea:
+            return
+        self._quitar_espacios_finales()
+        self.partes.append("\n")
+        self.inicio_linea = True
+        self.espacio = False
+
+    def salto_duro(self):
+        self._quitar_espacios_finales()
+        self.partes.append("\n")
+        self.inicio_linea = True
+        self.espacio = False
+
+    def texto(self, crudo):
+        if self.ocultas:
+            return
+        if self.pre:
+            self._texto_literal(unescape(crudo).replace("\xa0", " "))
+            return
+
+        texto = _ESPACIOS.sub(" ", crudo)
+        if texto.startswith(" "):
+            self.espacio = not self.inicio_linea
+            texto = texto[1:]
+        termina_con_espacio = texto.endswith(" ")
+        if termina_con_espacio:
+            texto = texto[:-1]
+        if not texto:
+            return
+        if "&" in texto:
+            texto = unescape(texto).replace("\xa0", " ")
+
+        partes = self.partes
+        if self.inicio_linea:
+            if self.marcador:
+                partes.append(self.marcador)
+                self.marcador = None
+            elif (len(partes) >= 2 and partes[-1] == "\n" and partes[-2].endswith("Rp.")
+                  and texto.lstrip(" ").startswith("/")):
+                # "Rp." termina la línea anterior y esta empieza con "/": unirlas
+                partes.pop()
+                texto = texto.lstrip(" ")
+        elif self.espacio:
+            partes.append(" ")
+        partes.append(texto)
+        self.inicio_linea = False
+        self.espacio = termina_con_espacio
+
+    def _texto_literal(self, texto):
+        if not texto:
+            return
+        if self.marcador:
+            self.partes.append(self.marcador)
+            self.marcador = None
+        self.partes.append(_RP_SALTO.sub("Rp./", texto))
+        self.inicio_linea = texto.endswith("\n")
+        self.espacio = False
+
+    def abrir(self, etiqueta, atributos):
+        if etiqueta in OCULTAS:
+            self.ocultas += 1
+        elif etiqueta == "br":
+            self.salto_duro()
+        elif etiqueta == "li":
+            self.salto()
+            if self.listas:
+                lista = self.listas[-1]
+                sangria = SANGRIA * (len(self.listas) - 1)
+                if lista[0]:
+                    self.marcador = f"{sangria}{lista[1]}. "
+                    lista[1] += 1
+                else:
+                    self.marcador = f"{sangria}{VINETA} "
+            else:
+                self.marcador = f"{VINETA} "
+        elif etiqueta in ("ul", "ol"):
+            self.salto()
+            inicio = 1
+            if etiqueta == "ol":
+                try:
+                    inicio = int(_atributos(atributos).get("start", 1))
+                except ValueError:
+                    pass
+            self.listas.append([etiqueta == "ol", inicio])
+        elif etiqueta == "a":
+            self.enlaces.append((_atributos(atributos).get("href", ""), len(self.partes)))
+        elif etiqueta == "pre":
+            self.salto()
+            self.pre += 1
+        elif etiqueta in ("td", "th"):
+            self.espacio = not self.inicio_linea
+        elif etiqueta in BLOQUES:
+            self.salto()
+
+    def cerrar(self, etiqueta):
+        if etiqueta in OCULTAS:
+            self.ocultas = max(self.ocultas - 1, 0)
+        elif etiqueta in ("ul", "ol"):
+            if self.listas:
+                self.listas.pop()
+            self.marcador = None
+            self.salto()
+        elif etiqueta == "li":
+            self.marcador = None
+            self.salto()
+        elif etiqueta == "a":
+            if self.enlaces:
+                href, inicio = self.enlaces.pop()
+                texto_enlace = "".join(self.partes[inicio:]).strip()
+                if href and not href.startswith("#") and href != texto_enlace and not self.inicio_linea:
+                    self.partes.append(f" ({href})")
+        elif etiqueta == "pre":
+            self.pre = max(self.pre - 1, 0)
+            self.salto()
+        elif etiqueta in BLOQUES:
+            self.salto()
+
+    def procesar(self, html):
+        for coincidencia in _TOKEN.finditer(html):
+            cierre, etiqueta, atributos, texto = coincidencia.groups()
+            if texto is not None:
+                self.texto(texto)
+            elif etiqueta is not None:
+                etiqueta = etiqueta.lower()
+                if cierre:
+                    self.cerrar(etiqueta)
+                else:
+                    self.abrir(etiqueta, atributos)
+                    if atributos.endswith("/") and etiqueta != "br":
+                        self.cerrar(etiqueta)
+            elif coincidencia.group() == "<":
+                self.texto("<")
+            # comentarios, doctype e instrucciones <!...> / <?...> se descartan
+
+    def resultado(self):
+        self._quitar_espacios_finales()
+        while self.partes and self.partes[-1] == "\n":
+            self.partes.pop()
+        return "".join(self.partes)
+
+
+def html_a_texto(html):
+    """Convierte el HTML del editor en texto plano para el PDF"""
+    normalizador = _Normalizador()
+    normalizador.procesar(html)
+    return normalizador.resultado()
+
+
+def normalizar_contenido(contenido):
+    """
+    Texto final del campo del PDF a partir del contenido del editor.
+    Acepta HTML o texto plano; el texto plano solo se une en "Rp./".
+    """
+    if not contenido:
+        return contenido
+    texto = _precompilados.get(contenido)
+    if texto is not None:
+        return texto
+    if _ETIQUETA.search(contenido) is None:
+        return _RP_SALTO.sub("Rp./", contenido)
+    return html_a_texto(contenido)
+
+
+def precompilar(contenido, texto=None):
+    """
+    Registra el texto normalizado de un contenido que se repite (si no se pasa,
+    se calcula una vez): normalizar_contenido lo devuelve sin procesarlo.
+    Retorna el texto.
+    """
+    if texto is None:
+        texto = normalizar_contenido(contenido)
+    if contenido:
+        if len(_precompilados) >= MAX_PRECOMPILADOS:
+            _precompilados.clear()
+        _precompilados[contenido] = texto
+    return texto
@@ -0,0 +1,410 @@
+"""
+Optimización del tamaño de los PDFs generados
+
+Transformaciones sin pérdida:
+    - recursos de página no usados por su contenido (fuentes, imágenes, estados gráficos)
+    - formulario (AcroForm) sin campos y referencias de estructura colgantes
+    - objetos idénticos (imágenes, fuentes, descriptores) unificados en uno solo
+    - streams sin comprimir o mal comprimidos: Flate (nivel 9 hasta 256 KB) y, en
+      imágenes, predictores PNG por fila cuando reducen el tamaño (requiere numpy)
+    - objetos que ya no son alcanzables desde las páginas
+
+La plantilla plana se optimiza una sola vez al prepararse (aplanado.py), así que
+cada receta generada hereda el ahorro sin costo por solicitud. Para optimizar
+PDFs ya generados (historial, archivo):
+
+    python optimizador.py receta1.pdf receta2.pdf --directorio optimizados
+"""
+import argparse
+import os
+import re
+import sys
+import zlib
+from io import BytesIO
+
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import (
+    ArrayObject, DictionaryObject, EncodedStreamObject, IndirectObject, NameObject,
+    NumberObject, StreamObject,
+)
+
+try:
+    import numpy
+except ImportError:  # sin numpy no se prueban predictores PNG
+    numpy = None
+
+from utiles_pdf import valor_pdf
+
+TIPOS_RECURSO = ("/Font", "/XObject", "/ExtGState", "/ColorSpace", "/Pattern", "/Shading", "/Properties")
+COLORES = {"/DeviceGray": 1, "/DeviceRGB": 3, "/DeviceCMYK": 4}
+CLAVES_CATALOGO = ("/Lang", "/ViewerPreferences", "/PageLayout", "/PageMode")
+FILAS_MUESTRA = 32
+LIMITE_NIVEL_MAXIMO = 256 * 1024  # bytes sin comprimir
+_NOMBRE = re.compile(rb"/([^\s/\[\]()<>{}%]+)")
+
+
+def _tamano(writer):
+    salida = BytesIO()
+    writer.write(salida)
+    return len(salida.getvalue())
+
+
+def _serializar(obj):
+    """Clave de comparación: el diccionario serializado y, en streams, sus datos tal cual"""
+    salida = BytesIO()
+    if isinstance(obj, StreamObject):
+        DictionaryObject.write_to_stream(obj, salida, None)
+        return salida.getvalue(), obj._data
+    obj.write_to_stream(salida, None)
+    return salida.getvalue(), None
+
+
+def _nombres_usados(contenido):
+    """Nombres (/X) que aparecen en un content stream; None si no se puede saber"""
+    nombres = set(_NOMBRE.findall(contenido))
+    if any(b"#" in nombre for nombre in nombres):
+        return None
+    return {f"/{nombre.decode('latin-1')}" for nombre in nombres}
+
+
+def _quitar_recursos(recursos, usados, conservar):
+    eliminados = 0
+    if usados is None or not isinstance(recursos, DictionaryObject):
+        return 0
+    for tipo in TIPOS_RECURSO:
+        if tipo not in recursos:
+            continue
+        diccionario = recursos[tipo].get_object()
+        for nombre in list(diccionario.keys()):
+            if nombre not in usados and nombre not in conservar:
+                del diccionario[nombre]
+                eliminados += 1
+    return eliminados
+
+
+def _contenido_pagina(page):
+    contenidos = page.get("/Contents")
+    if contenidos is None:
+        return b""
+    contenidos = contenidos.get_object()
+    if isinstance(contenidos, ArrayObject):
+        return b"\n".join(stream.get_object().get_data() for stream in contenidos)
+    return contenidos.get_data()
+
+
+def quitar_recursos_no_usados(writer, conservar=()):
+    """Elimina de páginas y formularios XObject los recursos que su contenido no nombra"""
+    eliminados = 0
+    vistos = set()
+    for page in writer.pages:
+        recursos = page.get("/Resources")
+        if recursos is None:
+            continue
+        recursos = recursos.get_object()
+        eliminados += _quitar_recursos(recursos, _nombres_usados(_contenido_pagina(page)), conservar)
+        pendientes = list(valor_pdf(recursos, "/XObject", {}).values())
+        while pendientes:
+            referencia = pendientes.pop()
+            forma = referencia.get_object()
+            if id(forma) in vistos or forma.get("/Subtype") != "/Form" or "/Resources" not in forma:
+                continue
+            vistos.add(id(forma))
+            recursos_forma = forma["/Resources"].get_object()
+            eliminados += _quitar_recursos(recursos_forma, _nombres_usados(forma.get_data()), ())
+            pendientes.extend(valor_pdf(recursos_forma, "/XObject", {}).values())
+    return eliminados
+
+
+def quitar_formulario(writer):
+    """Quita el AcroForm si ya no quedan widgets y las referencias de estructura sin árbol"""
+    raiz = writer._root_object
+    quitados = 0
+    con_widgets = any(
+        anotacion.get_object().get("/Subtype") == "/Widget"
+        for page in writer.pages for anotacion in valor_pdf(page, "/Annots", [])
+    )
+    if "/AcroForm" in raiz and not con_widgets:
+        del raiz["/AcroForm"]
+        quitados += 1
+    if "/StructTreeRoot" not in raiz:
+        for page in writer.pages:
+            if "/StructParents" in page:
+                del page["/StructParents"]
+                quitados += 1
+    return quitados
+
+
+def _reemplazar_referencias(obj, mapa, writer):
+    pendientes = [obj]
+    while pendientes:
+        actual = pendientes.pop()
+        if isinstance(actual, DictionaryObject):
+            elementos = list(actual.items())
+        elif isinstance(actual, ArrayObject):
+            elementos = list(enumerate(actual))
+        else:
+            continue
+        for clave, valor in elementos:
+            if isinstance(valor, IndirectObject):
+                if valor.idnum in mapa:
+                    actual[clave] = IndirectObject(mapa[valor.idnum], 0, writer)
+            elif isinstance(valor, (DictionaryObject, ArrayObject)):
+                pendientes.append(valor)
+
+
+def unificar_duplicados(writer, rondas=4):
+    """
+    Unifica objetos indirectos idénticos (misma serialización). Se repite porque
+    al unificar, p. ej., dos archivos de fuente, sus descriptores pasan a ser iguales.
+    """
+    unificados = 0
+    fijos = {writer._root.idnum, writer._info.idnum}
+    for _ in range(rondas):
+        canonicos = {}
+        mapa = {}
+        for indice, obj in enumerate(writer._objects):
+            idnum = indice + 1
+            if idnum in fijos or not isinstance(obj, (DictionaryObject, ArrayObject)):
+                continue
+            if isinstance(obj, DictionaryObject) and obj.get("/Type") in ("/Page", "/Pages"):
+                continue
+            clave = (type(obj).__name__, _serializar(obj))
+            if clave in canonicos:
+                mapa[idnum] = canonicos[clave]
+            else:
+                canonicos[clave] = idnum
+        if not mapa:
+            break
+        unificados += len(mapa)
+        for obj in writer._objects:
+            if obj is not None:
+                _reemplazar_referencias(obj, mapa, writer)
+        _reemplazar_referencias(writer._root_object, mapa, writer)
+    return unificados
+
+
+def _filtrar_png(datos, ancho, alto, colores):
+    """Aplica el mejor predictor PNG por fila (heurística de suma absoluta mínima)"""
+    fila = ancho * colores
+    img = numpy.frombuffer(datos, dtype=numpy.uint8).reshape(alto, fila)
+    izq = numpy.zeros_like(img)
+    izq[:, colores:] = img[:, :-colores]
+    arriba = numpy.zeros_like(img)
+    arriba[1:] = img[:-1]
+    diagonal = numpy.zeros_like(img)
+    diagonal[1:, colores:] = img[:-1, :-colores]
+
+    a, b, c = izq.astype(numpy.int16), arriba.astype(numpy.int16), diagonal.astype(numpy.int16)
+    p = a + b - c
+    pa, pb, pc = numpy.abs(p - a), numpy.abs(p - b), numpy.abs(p - c)
+    paeth = numpy.where((pa <= pb) & (pa <= pc), izq, numpy.where(pb <= pc, arriba, diagonal))
+    candidatos = numpy.stack([
+        img, img - izq, img - arriba, img - ((a + b) >> 1).astype(numpy.uint8), img - paeth,
+    ])
+    costos = numpy.abs(candidatos.view(numpy.int8).astype(numpy.int16)).sum(axis=2, dtype=numpy.int64)
+    elegidos = costos.argmin(axis=0)
+    salida = numpy.empty((alto, fila + 1), dtype=numpy.uint8)
+    salida[:, 0] = elegidos
+    salida[:, 1:] = candidatos[elegidos, numpy.arange(alto)]
+    return salida.tobytes()
+
+
+def _es_flate(stream):
+    filtro = valor_pdf(stream, "/Filter")
+    if filtro is None:
+        return True
+    if isinstance(filtro, ArrayObject):
+        return len(filtro) == 1 and filtro[0] == "/FlateDecode"
+    return filtro == "/FlateDecode"
+
+
+def _candidatos_compresion(stream, datos):
+    """(datos a comprimir, DecodeParms) posibles para un stream"""
+    yield datos, None
+    if numpy is None or stream.get("/Subtype") != "/Image" or stream.get("/ImageMask"):
+        return
+    colores = COLORES.get(valor_pdf(stream, "/ColorSpace"))
+    ancho, alto = int(valor_pdf(stream, "/Width", 0)), int(valor_pdf(stream, "/Height", 0))
+    if colores is None or int(valor_pdf(stream, "/BitsPerComponent", 0)) != 8 or len(datos) != ancho * alto * colores:
+        return
+    if alto > 2 * FILAS_MUESTRA:
+        # en imágenes grandes se decide con una franja central antes de filtrar todo
+        fila = ancho * colores
+        inicio = (alto - FILAS_MUESTRA) // 2 * fila
+        muestra = datos[inicio:inicio + FILAS_MUESTRA * fila]
+        if len(zlib.compress(_filtrar_png(muestra, ancho, FILAS_MUESTRA, colores), 6)) >= len(zlib.compress(muestra, 6)):
+            return
+    parametros = DictionaryObject({
+        NameObject("/Predictor"): NumberObject(15),
+        NameObject("/Colors"): NumberObject(colores),
+        NameObject("/BitsPerComponent"): NumberObject(8),
+        NameObject("/Columns"): NumberObject(ancho),
+    })
+    yield _filtrar_png(datos, ancho, alto, colores), parametros
+
+
+def _nivel_zlib(stream):
+    """FLEVEL de la cabecera zlib (2: nivel por defecto, 3: máximo); -1 si no aplica"""
+    datos = stream._data
+    if "/Filter" not in stream or "/DecodeParms" in stream or len(datos) < 2:
+        return -1
+    if datos[0] & 0x0F != 8 or (datos[0] << 8 | datos[1]) % 31:
+        return -1
+    return datos[1] >> 6
+
+
+def recomprimir_streams(writer):
+    """Vuelve a comprimir cada stream Flate (o sin filtro) si el resultado es menor"""
+    ahorro = 0
+    for indice, obj in enumerate(writer._objects):
+        if not isinstance(obj, StreamObject) or not _es_flate(obj):
+            continue
+        try:
+            datos = obj.get_data()
+        except Exception:
+            continue
+        actual = len(obj._data)
+        candidatos = list(_candidatos_compresion(obj, datos))
+        # el nivel 9 solo compensa su costo en streams chicos
+        nivel = 9 if len(datos) <= LIMITE_NIVEL_MAXIMO else 6
+        if len(candidatos) == 1 and _nivel_zlib(obj) >= (3 if nivel == 9 else 2):
+            continue  # ya está comprimido con ese nivel o uno mayor
+        # se elige con el nivel rápido y solo el ganador se comprime con el nivel final
+        mejor, filtrados, parametros = min(
+            ((zlib.compress(filtrados, 6), filtrados, parametros) for filtrados, parametros in candidatos),
+            key=lambda candidato: len(candidato[0]),
+        )
+        if nivel == 9:
+            mejor = zlib.compress(filtrados, 9)
+        if len(mejor) >= actual:
+            continue
+        nuevo = EncodedStreamObject()
+        for clave, valor in obj.items():
+            if clave not in ("/Length", "/Filter", "/DecodeParms"):
+                nuevo[clave] = valor
+        nuevo[NameObject("/Filter")] = NameObject("/FlateDecode")
+        if parametros is not None:
+            nuevo[NameObject("/DecodeParms")] = parametros
+        nuevo._data = mejor
+        nuevo.indirect_reference = IndirectObject(indice + 1, 0, writer)
+        writer._objects[indice] = nuevo
+        ahorro += actual - len(mejor)
+    return ahorro
+
+
+def _copiar_catalogo(raiz, destino):
+    """Copia las entradas del catálogo que no cuelgan de las páginas"""
+    for clave in CLAVES_CATALOGO + ("/AcroForm",):
+        if clave not in raiz:
+            continue
+        if clave == "/AcroForm" and isinstance(raiz[clave], StreamObject):
+            destino._root_object[NameObject(clave)] = _reparar_formulario(raiz[clave], destino)
+            continue
+        destino._root_object[NameObject(clave)] = raiz.raw_get(clave).clone(destino)
+
+
+def _reparar_formulario(stream, destino):
+    """
+    AcroForm que apunta a un stream (lo produce update_page_form_field_values de
+    PyPDF2 3.0 al marcar NeedAppearances): se rehace como diccionario con sus widgets
+    """
+    formulario = DictionaryObject({
+        clave: valor.clone(destino) for clave, valor in stream.items()
+        if clave not in ("/Filter", "/Length", "/DecodeParms")
+    })
+    if "/Fields" not in formulario:
+        formulario[NameObject("/Fields")] = ArrayObject(
+            referencia for page in destino.pages for referencia in valor_pdf(page, "/Annots", [])
+            if referencia.get_object().get("/Subtype") == "/Widget" and "/T" in referencia.get_object()
+        )
+    return formulario
+
+
+def _copiar_alcanzable(writer):
+    """Writer nuevo con solo lo alcanzable desde las páginas y el catálogo"""
+    nuevo = PdfWriter()
+    for page in writer.pages:
+        nuevo.add_page(page)
+    _copiar_catalogo(writer._root_object, nuevo)
+    info = writer._info.get_object()
+    if info:
+        nuevo.add_metadata({clave: valor for clave, valor in info.items()})
+    return nuevo
+
+
+def optimizar_writer(writer, conservar=()):
+    """
+    Optimiza un PdfWriter y devuelve (writer optimizado, informe).
+    `conservar`: nombres de recursos de página que se deben mantener aunque el
+    contenido actual no los use (p. ej. la fuente que se escribe después).
+    """
+    bytes_antes = _tamano(writer)
+    objetos_antes = len(writer._objects)
+    informe = {
+        "recursos_eliminados": quitar_recursos_no_usados(writer, conservar),
+        "formulario_eliminado": quitar_formulario(writer),
+        "objetos_unificados": unificar_duplicados(writer),
+        "ahorro_compresion": recomprimir_streams(writer),
+    }
+    optimizado = _copiar_alcanzable(writer)
+    bytes_despues = _tamano(optimizado)
+    informe.update({
+        "objetos_antes": objetos_antes,
+        "objetos_despues": len(optimizado._objects),
+        "bytes_antes": bytes_antes,
+        "bytes_despues": bytes_despues,
+        "ahorro": round(1 - bytes_despues / bytes_antes, 4) if bytes_antes else 0.0,
+    })
+    return optimizado, informe
+
+
+def optimizar_pdf(pdf):
+    """Optimiza un PDF en bytes. Retorna (bytes optimizados, informe)."""
+    reader = PdfReader(BytesIO(pdf))
+    writer = PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page)
+    _copiar_catalogo(reader.trailer["/Root"], writer)
+    if reader.metadata:
+        writer.add_metadata({clave: valor for clave, valor in reader.metadata.items()})
+
+    optimizado, informe = optimizar_writer(writer)
+    salida = BytesIO()
+    optimizado.write(salida)
+    resultado = salida.getvalue()
+    if len(resultado) >= len(pdf):
+        resultado = pdf
+    informe.update({"bytes_antes": len(pdf), "bytes_despues": len(resultado),
+                    "ahorro": round(1 - len(resultado) / len(pdf), 4) if pdf else 0.0})
+    return resultado, informe
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Optimiza el tamaño de PDFs de recetas (sin pérdida)")
+    parser.add_argument("entradas", nargs="+", help="Archivos PDF a optimizar")
+    parser.add_argument("--directorio", default="optimizados", help="Directorio de salida")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.directorio, exist_ok=True)
+    total_antes = total_despues = 0
+    for ruta in args.entradas:
+        with open(ruta, "rb") as f:
+            pdf = f.read()
+        try:
+            resultado, informe = optimizar_pdf(pdf)
+        except Exception as e:
+            print(f"❌ {ruta}: {e}")
+            continue
+        with open(os.path.join(args.directorio, os.path.basename(ruta)), "wb") as f:
+            f.write(resultado)
+        total_antes += informe["bytes_antes"]
+        total_despues += informe["bytes_despues"]
+        print(f"   {ruta}: {informe['bytes_antes']} -> {informe['bytes_despues']} bytes ({-informe['ahorro']:+.1%})")
+
+    if total_antes:
+        print(f"\n📦 Total: {total_antes} -> {total_despues} bytes ({total_despues / total_antes - 1:+.1%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
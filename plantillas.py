@@ -0,0 +1,340 @@
+"""
+Caché y registro de plantillas PDF para la generación de recetas
+
+Cada médico puede tener su propio membrete por tipo de documento. El registro
+(RegistroPlantillas) asocia (usuario, tipo_documento) a un archivo de plantilla y
+valida sus campos una sola vez al registrarla; las plantillas se parsean recién
+cuando se usan y solo las más recientes quedan en memoria (LRU).
+
+Configuración (opcional) en plantillas.json, o el archivo de PLANTILLAS_CONFIG:
+    {
+        "por_defecto": "modeloReceta.pdf",
+        "plantillas": [
+            {"usuario": "dra_lopez", "tipo_documento": "Receta (Rp.)", "ruta": "membretes/lopez.pdf"},
+            {"usuario": "dra_lopez", "ruta": "membretes/lopez_general.pdf"},
+            {"tipo_documento": "Indicaciones / Notas", "ruta": "membretes/indicaciones.pdf"}
+        ]
+    }
+PLANTILLAS_MAX_CARGADAS limita las plantillas parseadas en memoria (por defecto 8).
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from io import BytesIO
+
+from PyPDF2 import PdfReader, PdfWriter
+
+
+class PlantillaCache:
+    """
+    Parsea la plantilla PDF una sola vez por proceso y entrega copias
+    baratas (PdfWriter con las páginas clonadas) en cada solicitud.
+    Se invalida cuando cambia el mtime/tamaño del archivo y su hash.
+    """
+
+    def __init__(self, ruta="modeloReceta.pdf"):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._reader = None
+        self._plana = None
+        self._empalme = None
+        self._firma = None
+        self._hash = None
+        self.hits = 0
+        self.misses = 0
+        self.recargas = 0
+
+    def _firma_archivo(self):
+        """Devuelve (mtime_ns, tamaño) del archivo de plantilla"""
+        try:
+            stat = os.stat(self.ruta)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"No se encontró el archivo {self.ruta}")
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _cargar(self, firma):
+        """Lee la plantilla y la vuelve a parsear solo si su contenido cambió"""
+        with open(self.ruta, 'rb') as f:
+            datos = f.read()
+        hash_actual = hashlib.sha256(datos).hexdigest()
+
+        if self._reader is not None and hash_actual == self._hash:
+            # Solo cambió el mtime (p. ej. un touch); el parseo sigue siendo válido
+            self._firma = firma
+            return False
+
+        # Los objetos se resuelven en la primera copia (writer o plantilla plana)
+        # y quedan en memoria para las siguientes
+        reader = PdfReader(BytesIO(datos))
+
+        self._reader = reader
+        self._plana = None
+        self._empalme = None
+        self._hash = hash_actual
+        self._firma = firma
+        return True
+
+    def _asegurar_cargada(self):
+        firma = self._firma_archivo()
+        if self._reader is not None and firma == self._firma:
+            self.hits += 1
+            return
+        if self._reader is not None:
+            self.recargas += 1
+        if self._cargar(firma):
+            self.misses += 1
+        else:
+            self.hits += 1
+
+    def obtener_writer(self):
+        """Devuelve un PdfWriter nuevo con las páginas de la plantilla"""
+        with self._lock:
+            self._asegurar_cargada()
+            writer = PdfWriter()
+            for page in self._reader.pages:
+                writer.add_page(page)
+        return writer
+
+    def obtener_plana(self):
+        """
+        Devuelve la versión plana de la plantilla (sin formulario, ver aplanado.py).
+        Se prepara una sola vez por versión del archivo.
+        """
+        with self._lock:
+            self._asegurar_cargada()
+            return self._plana_actual()
+
+    def _plana_actual(self):
+        from aplanado import PlantillaPlana
+
+        if self._plana is None:
+            self._plana = PlantillaPlana(self._reader)
+        return self._plana
+
+    def obtener_empalme(self, metadatos=None):
+        """
+        Devuelve la plantilla plana serializada para generar por empalme de bytes
+        (ver empalme.py), o None si su estructura no lo permite; en ese caso se usa
+        obtener_plana(). Se prepara una sola vez por versión del archivo.
+        """
+        from empalme import PlantillaBytes
+
+        with self._lock:
+            self._asegurar_cargada()
+            if self._empalme is None:
+                try:
+                    self._empalme = PlantillaBytes(self._plana_actual(), metadatos)
+                except ValueError:
+                    self._empalme = False
+            return self._empalme or None
+
+    def verificar(self):
+        """Asegura que la plantilla cargada esté al día y devuelve su hash"""
+        with self._lock:
+            self._asegurar_cargada()
+            return self._hash
+
+    @property
+    def version(self):
+        """Hash SHA-256 de la plantilla cargada (None si aún no se cargó)"""
+        return self._hash
+
+    def estadisticas(self):
+        """Contadores de uso de la caché"""
+        with self._lock:
+            return {
+                "ruta": self.ruta,
+                "hits": self.hits,
+                "misses": self.misses,
+                "recargas": self.recargas,
+                "version": self._hash,
+            }
+
+    def invalidar(self):
+        """Descarta la plantilla parseada; la próxima solicitud la vuelve a leer"""
+        with self._lock:
+            self._reader = None
+            self._plana = None
+            self._empalme = None
+            self._firma = None
+            self._hash = None
+
+
+PLANTILLA_POR_DEFECTO = "modeloReceta.pdf"
+CAMPOS_REQUERIDOS = ("Date", "Paciente", "Dx", "Texto1")
+
+_caches = OrderedDict()
+_caches_lock = threading.Lock()
+_max_cargadas = None
+
+
+def obtener_cache(ruta=PLANTILLA_POR_DEFECTO):
+    """
+    Devuelve la caché compartida por el proceso para la plantilla indicada.
+    Se conservan las PLANTILLAS_MAX_CARGADAS usadas más recientemente; las demás
+    se descartan y se vuelven a parsear si se piden otra vez.
+    """
+    global _max_cargadas
+    expulsadas = []
+    with _caches_lock:
+        if _max_cargadas is None:
+            _max_cargadas = max(int(os.getenv("PLANTILLAS_MAX_CARGADAS", "8")), 1)
+        cache = _caches.get(ruta)
+        if cache is None:
+            cache = PlantillaCache(ruta)
+            _caches[ruta] = cache
+        _caches.move_to_end(ruta)
+        while len(_caches) > _max_cargadas:
+            expulsadas.append(_caches.popitem(last=False)[1])
+    # Fuera del lock global: liberar una plantilla espera a que termine de usarse
+    for expulsada in expulsadas:
+        expulsada.invalidar()
+    return cache
+
+
+class PlantillaInvalidaError(ValueError):
+    """La plantilla no tiene los campos de formulario que se rellenan"""
+
+
+@dataclass(frozen=True)
+class EntradaPlantilla:
+    """Plantilla registrada con el índice de sus campos (nombre -> número de página)"""
+    ruta: str
+    campos: dict
+
+
+def indexar_campos(ruta):
+    """
+    Lee los campos de texto de la plantilla y valida que estén los de la receta.
+    Retorna {nombre: página}. Lanza FileNotFoundError o PlantillaInvalidaError.
+    """
+    if not os.path.exists(ruta):
+        raise FileNotFoundError(f"No se encontró el archivo {ruta}")
+    try:
+        reader = PdfReader(ruta)
+        campos = {}
+        for numero, page in enumerate(reader.pages):
+            for referencia in page["/Annots"] if "/Annots" in page else []:
+                anotacion = referencia.get_object()
+                nombre = anotacion.get("/T")
+                if nombre is None and "/Parent" in anotacion:
+                    nombre = anotacion["/Parent"].get_object().get("/T")
+                if anotacion.get("/Subtype") == "/Widget" and nombre is not None:
+                    campos.setdefault(str(nombre), numero)
+    except Exception as e:
+        raise PlantillaInvalidaError(f"No se pudo leer la plantilla {ruta}: {e}") from e
+
+    # Ambos caminos de generación (plano y formulario) escriben en la primera página
+    faltantes = [nombre for nombre in CAMPOS_REQUERIDOS if campos.get(nombre) != 0]
+    if faltantes:
+        raise PlantillaInvalidaError(
+            f"La plantilla {ruta} no tiene en la primera página los campos: {', '.join(faltantes)}"
+        )
+    return campos
+
+
+class RegistroPlantillas:
+    """
+    Asocia (usuario, tipo_documento) a una plantilla. Al resolver se busca, en
+    orden: usuario y tipo, solo usuario, solo tipo y la plantilla por defecto.
+    """
+
+    def __init__(self, por_defecto=PLANTILLA_POR_DEFECTO):
+        self.por_defecto = por_defecto
+        self._lock = threading.Lock()
+        self._entradas = {}
+        self._indices = {}
+        self.errores = []
+
+    def _entrada(self, ruta):
+        # Una misma plantilla compartida por varios médicos se indexa una sola vez
+        entrada = self._indices.get(ruta)
+        if entrada is None:
+            entrada = EntradaPlantilla(ruta, indexar_campos(ruta))
+            self._indices[ruta] = entrada
+        return entrada
+
+    def registrar(self, ruta, usuario=None, tipo_documento=None):
+        """
+        Registra la plantilla para el usuario y/o tipo de documento (None = cualquiera).
+        Lanza FileNotFoundError o PlantillaInvalidaError sin modificar el registro.
+        """
+        with self._lock:
+            entrada = self._entrada(ruta)
+            self._entradas[(usuario or None, tipo_documento or None)] = entrada
+            return entrada
+
+    def resolver(self, usuario=None, tipo_documento=None):
+        """EntradaPlantilla para el usuario y el tipo de documento"""
+        with self._lock:
+            usuario, tipo_documento = usuario or None, tipo_documento or None
+            for clave in ((usuario, tipo_documento), (usuario, None), (None, tipo_documento)):
+                if clave != (None, None) and clave in self._entradas:
+                    return self._entradas[clave]
+            entrada = self._entradas.get((None, None))
+            if entrada is None:
+                # La plantilla por defecto se valida recién cuando hace falta
+                entrada = self._entrada(self.por_defecto)
+                self._entradas[(None, None)] = entrada
+            return entrada
+
+    def cargar_configuracion(self, ruta):
+        """
+        Registra las plantillas de un archivo JSON (ver el docstring del módulo).
+        Las entradas inválidas se omiten y quedan en self.errores.
+        Retorna la cantidad de plantillas registradas.
+        """
+        with open(ruta, "r", encoding="utf-8") as f:
+            configuracion = json.load(f)
+        base = os.path.dirname(os.path.abspath(ruta))
+        if configuracion.get("por_defecto"):
+            self.por_defecto = configuracion["por_defecto"]
+
+        registradas = 0
+        for item in configuracion.get("plantillas", []):
+            ruta_plantilla = item.get("ruta")
+            if ruta_plantilla and not os.path.isabs(ruta_plantilla) and not os.path.exists(ruta_plantilla):
+                ruta_plantilla = os.path.join(base, ruta_plantilla)
+            try:
+                if not ruta_plantilla:
+                    raise PlantillaInvalidaError(f"Entrada sin ruta: {item}")
+                self.registrar(ruta_plantilla, item.get("usuario"), item.get("tipo_documento"))
+                registradas += 1
+            except (FileNotFoundError, PlantillaInvalidaError) as e:
+                self.errores.append(str(e))
+        return registradas
+
+    def estadisticas(self):
+        """Plantillas registradas y cargadas en memoria"""
+        with self._lock:
+            registradas = len(self._entradas)
+            indexadas = len(self._indices)
+        with _caches_lock:
+            cargadas = [ruta for ruta, cache in _caches.items() if cache.version is not None]
+        return {
+            "registradas": registradas,
+            "archivos": indexadas,
+            "cargadas": cargadas,
+            "max_cargadas": _max_cargadas,
+            "errores": list(self.errores),
+        }
+
+
+_registro = None
+_registro_lock = threading.Lock()
+
+
+def obtener_registro():
+    """Registro de plantillas compartido por el proceso (lee PLANTILLAS_CONFIG si existe)"""
+    global _registro
+    with _registro_lock:
+        if _registro is None:
+            registro = RegistroPlantillas()
+            configuracion = os.getenv("PLANTILLAS_CONFIG", "plantillas.json")
+            if os.path.exists(configuracion):
+                registro.cargar_configuracion(configuracion)
+            _registro = registro
+        return _registro
@@ -0,0 +1,166 @@
+"""
+Spool temporal de PDFs generados
+
+La sesión de Streamlit guarda solo un identificador (handle); los bytes del PDF
+viven en un archivo temporal. Las entradas vencen tras `ttl` segundos sin uso y
+el total en disco está limitado: al superarlo se expulsan las más antiguas.
+
+Configuración por variables de entorno para el spool compartido:
+    SPOOL_DIR         directorio base (por defecto el temporal del sistema)
+    SPOOL_TTL_MIN     minutos sin uso antes de borrar un documento (por defecto 60)
+    SPOOL_MAX_MB      tamaño máximo total en disco (por defecto 2048)
+"""
+import atexit
+import os
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class SpoolPDF:
+    """Archivos temporales de PDFs con vencimiento por inactividad y tope global en bytes"""
+
+    def __init__(self, directorio=None, ttl=3600, max_bytes=2 * 1024 * 1024 * 1024, intervalo_limpieza=60):
+        self.directorio = tempfile.mkdtemp(prefix="recetas-spool-", dir=directorio)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.intervalo_limpieza = intervalo_limpieza
+        self._lock = threading.Lock()
+        # handle -> (tamaño, último acceso); ordenado del acceso más antiguo al más reciente
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._ultima_limpieza = time.monotonic()
+        self.expirados = 0
+        self.expulsados = 0
+
+    def _ruta(self, handle):
+        return os.path.join(self.directorio, f"{handle}.pdf")
+
+    def _borrar(self, handle):
+        tamano, _ = self._entradas.pop(handle)
+        self._bytes -= tamano
+        try:
+            os.remove(self._ruta(handle))
+        except FileNotFoundError:
+            pass
+
+    def _limpiar_expirados(self, ahora):
+        while self._entradas:
+            handle, (_, ultimo_acceso) = next(iter(self._entradas.items()))
+            if ahora - ultimo_acceso < self.ttl:
+                break
+            self._borrar(handle)
+            self.expirados += 1
+        self._ultima_limpieza = ahora
+
+    def _limpiar_si_corresponde(self, ahora):
+        """Purga las vencidas como máximo una vez cada `intervalo_limpieza` segundos"""
+        if ahora - self._ultima_limpieza >= self.intervalo_limpieza:
+            self._limpiar_expirados(ahora)
+
+    def guardar(self, pdf, reemplaza=None):
+        """
+        Escribe el PDF en el spool y devuelve su handle.
+        `reemplaza`: handle anterior de la misma sesión, que se libera.
+        """
+        handle = secrets.token_urlsafe(16)
+        with open(self._ruta(handle), "wb") as f:
+            f.write(pdf)
+        ahora = time.monotonic()
+        with self._lock:
+            if reemplaza in self._entradas:
+                self._borrar(reemplaza)
+            self._entradas[handle] = (len(pdf), ahora)
+            self._bytes += len(pdf)
+            self._limpiar_si_corresponde(ahora)
+            while self._bytes > self.max_bytes and len(self._entradas) > 1:
+                self._borrar(next(iter(self._entradas)))
+                self.expulsados += 1
+        return handle
+
+    def abrir(self, handle):
+        """
+        Archivo binario abierto del PDF (el llamador lo cierra), o None si venció.
+        También purga las entradas vencidas de otras sesiones, así el spool se
+        vacía aunque nadie genere PDFs nuevos.
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            self._limpiar_si_corresponde(ahora)
+            entrada = self._entradas.get(handle)
+            if entrada is None:
+                return None
+            if ahora - entrada[1] >= self.ttl:
+                self._borrar(handle)
+                self.expirados += 1
+                return None
+            self._entradas[handle] = (entrada[0], ahora)
+            self._entradas.move_to_end(handle)
+            try:
+                return open(self._ruta(handle), "rb")
+            except FileNotFoundError:
+                self._borrar(handle)
+                return None
+
+    def leer(self, handle):
+        """Bytes del PDF, o None si venció"""
+        archivo = self.abrir(handle)
+        if archivo is None:
+            return None
+        with archivo:
+            return archivo.read()
+
+    def tamano(self, handle):
+        with self._lock:
+            entrada = self._entradas.get(handle)
+            return entrada[0] if entrada else 0
+
+    def liberar(self, handle):
+        """Borra el PDF de una sesión (al limpiar el formulario o cerrar sesión)"""
+        with self._lock:
+            if handle in self._entradas:
+                self._borrar(handle)
+
+    def limpiar(self):
+        """Borra las entradas vencidas"""
+        with self._lock:
+            self._limpiar_expirados(time.monotonic())
+
+    def cerrar(self):
+        """Borra el directorio del spool"""
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+            shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "directorio": self.directorio,
+                "entradas": len(self._entradas),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "expirados": self.expirados,
+                "expulsados": self.expulsados,
+            }
+
+
+_spool_global = None
+_spool_global_lock = threading.Lock()
+
+
+def obtener_spool():
+    """Spool compartido por el proceso; se borra al terminar el proceso"""
+    global _spool_global
+    with _spool_global_lock:
+        if _spool_global is None:
+            _spool_global = SpoolPDF(
+                directorio=os.getenv("SPOOL_DIR") or None,
+                ttl=float(os.getenv("SPOOL_TTL_MIN", "60")) * 60,
+                max_bytes=int(float(os.getenv("SPOOL_MAX_MB", "2048")) * 1024 * 1024),
+            )
+            atexit.register(_spool_global.cerrar)
+        return _spool_global
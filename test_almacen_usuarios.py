@@ -0,0 +1,94 @@
+"""
+Prueba de los almacenes de usuarios
+
+Migra un users.json a SQLite con el CLI de almacen_usuarios.py (también una
+segunda vez, sin modificar los existentes), inicia sesión contra AlmacenSQLite,
+cambia la contraseña y verifica que un almacén incompleto no se pueda instanciar.
+"""
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from almacen_usuarios import AlmacenJSON, AlmacenSQLite, AlmacenUsuarios, crear_almacen
+from auth import AuthManager
+
+
+def sha256(texto):
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+def migrar(ruta_json, ruta_db):
+    return subprocess.run(
+        [sys.executable, "almacen_usuarios.py", ruta_json, ruta_db],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    ).stdout
+
+
+try:
+    print("🔍 Probando almacenes de usuarios...\n")
+
+    directorio = tempfile.mkdtemp()
+    ruta_json = os.path.join(directorio, "users.json")
+    ruta_db = os.path.join(directorio, "users.db")
+    with open(ruta_json, "w", encoding="utf-8") as f:
+        json.dump({
+            "dra_lopez": {"password": sha256("secreta1"), "nombre": "Ana", "apellido": "López"},
+            "dr_perez": {"password": sha256("clave22"), "nombre": "Juan", "apellido": "Pérez"},
+        }, f)
+
+    salida = migrar(ruta_json, ruta_db)
+    if "✅ 2 usuarios migrados" not in salida or "ya existían" in salida:
+        raise AssertionError(f"Primera migración inesperada: {salida!r}")
+    print("✅ CLI: 2 usuarios migrados de users.json a SQLite")
+
+    # Un usuario nuevo en el JSON: la segunda migración solo agrega ese
+    AlmacenJSON(ruta_json).crear("dr_gomez", {"password": sha256("nueva33"), "nombre": "Luis", "apellido": "Gómez"})
+    salida = migrar(ruta_json, ruta_db)
+    if "✅ 1 usuarios migrados" not in salida or "⚠️  2 usuarios ya existían" not in salida:
+        raise AssertionError(f"Segunda migración inesperada: {salida!r}")
+    print("✅ CLI: una nueva migración no modifica los usuarios existentes")
+
+    almacen = crear_almacen(ruta_db)
+    if not isinstance(almacen, AlmacenSQLite) or almacen.estadisticas()["usuarios"] != 3:
+        raise AssertionError(f"crear_almacen() debe abrir la base migrada: {almacen!r}")
+    auth = AuthManager(almacen=almacen)
+
+    ok, datos, mensaje = auth.login("dra_lopez", "secreta1")
+    if not ok or datos != {"username": "dra_lopez", "nombre": "Ana", "apellido": "López"}:
+        raise AssertionError(f"Login contra SQLite: {ok} {datos} {mensaje}")
+    if auth.login("dr_perez", "incorrecta")[0] or auth.login("nadie", "secreta1")[0]:
+        raise AssertionError("Credenciales inválidas aceptadas")
+    if not auth.login("dr_gomez", "nueva33")[0]:
+        raise AssertionError("El usuario de la segunda migración no puede iniciar sesión")
+    print("✅ Login contra AlmacenSQLite con los hashes migrados")
+
+    ok, mensaje = auth.change_password("dr_perez", "clave22", "otra456")
+    if not ok or not auth.login("dr_perez", "otra456")[0] or auth.login("dr_perez", "clave22")[0]:
+        raise AssertionError(f"Cambio de contraseña en SQLite: {mensaje}")
+    if auth.register_user("dra_lopez", "secreta1", "Ana", "López")[0]:
+        raise AssertionError("Se registró un usuario duplicado")
+    almacen.cerrar()
+    print("✅ Cambio de contraseña y usuarios duplicados en SQLite")
+
+    class AlmacenIncompleto(AlmacenUsuarios):
+        def obtener(self, username):
+            return None
+
+    try:
+        AlmacenIncompleto()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("Un almacén sin crear/actualizar_password no debe poder instanciarse")
+    print("✅ Un almacén incompleto falla al instanciarlo")
+    print("\n✅ ¡TODO FUNCIONA CORRECTAMENTE!")
+
+except Exception as e:
+    print(f"❌ Error: {str(e)}")
+    import traceback
+    traceback.print_exc()
+    exit(1)
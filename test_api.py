@@ -0,0 +1,106 @@
+"""
+Prueba de la API HTTP de recetas
+
+Levanta la API en un hilo con un usuario temporal y verifica autenticación
+(Basic y token, también con credenciales que no son texto), la receta
+individual, el lote con errores por receta, los códigos de error y que la
+conexión keep-alive se reutilice tras un error.
+"""
+import base64
+import hashlib
+import http.client
+import json
+import os
+import tempfile
+import threading
+
+from api import crear_servidor
+from auth import MENSAJE_OBLIGATORIOS
+
+RECETA = {
+    "nombre": "Ana", "apellido": "Núñez", "fecha": "18/11/2025", "diagnostico": "Gripe",
+    "tipo_documento": "Receta (Rp.)", "contenido": "<p>Rp./</p><ul><li>Paracetamol 500mg</li></ul>",
+}
+
+
+def solicitar(conexion, metodo, ruta, cuerpo=None, encabezados=None):
+    datos = json.dumps(cuerpo).encode("utf-8") if cuerpo is not None else None
+    conexion.request(metodo, ruta, body=datos, headers=encabezados or {})
+    respuesta = conexion.getresponse()
+    return respuesta, respuesta.read()
+
+
+try:
+    print("🔍 Probando la API HTTP...\n")
+
+    directorio = tempfile.mkdtemp()
+    usuarios = os.path.join(directorio, "users.json")
+    with open(usuarios, "w", encoding="utf-8") as f:
+        json.dump({"dra_lopez": {"password": hashlib.sha256(b"secreta1").hexdigest(), "nombre": "Ana", "apellido": "López"}}, f)
+
+    servidor = crear_servidor(puerto=0, workers=2, users_file=usuarios)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    conexion = http.client.HTTPConnection("127.0.0.1", servidor.server_address[1], timeout=30)
+
+    respuesta, cuerpo = solicitar(conexion, "POST", "/v1/recetas", RECETA)
+    assert respuesta.status == 401 and respuesta.getheader("WWW-Authenticate"), respuesta.status
+    respuesta, cuerpo = solicitar(conexion, "POST", "/v1/token", {"usuario": "dra_lopez", "password": "mala"})
+    assert respuesta.status == 401, respuesta.status
+    for credenciales in ({"usuario": ["a"], "password": "x"}, {"usuario": {"a": 1}, "password": "x"},
+                         {"usuario": "dra_lopez", "password": 123}, {"usuario": "dra_lopez"}):
+        respuesta, cuerpo = solicitar(conexion, "POST", "/v1/token", credenciales)
+        assert respuesta.status == 400, (credenciales, respuesta.status, cuerpo)
+    assert servidor.auth_manager.login(["a"], "x", "10.0.0.1") == (False, None, MENSAJE_OBLIGATORIOS)
+    respuesta, cuerpo = solicitar(conexion, "POST", "/v1/token", {"usuario": "dra_lopez", "password": "secreta1"})
+    assert respuesta.status == 200, cuerpo
+    token = {"Authorization": f"Bearer {json.loads(cuerpo)['token']}"}
+    print("✅ Sin credenciales: 401; credenciales que no son texto: 400; la conexión sigue sirviendo (keep-alive)")
+
+    respuesta, pdf = solicitar(conexion, "POST", "/v1/recetas", RECETA, token)
+    assert respuesta.status == 200 and respuesta.getheader("Content-Type") == "application/pdf", respuesta.status
+    assert pdf.startswith(b"%PDF") and "N%C3%BA%C3%B1ez" in respuesta.getheader("Content-Disposition")
+    basic = {"Authorization": "Basic " + base64.b64encode(b"dra_lopez:secreta1").decode("ascii")}
+    respuesta, _ = solicitar(conexion, "POST", "/v1/recetas", RECETA, basic)
+    assert respuesta.status == 200, respuesta.status
+    print(f"✅ Receta individual con token y con Basic ({len(pdf)} bytes)")
+
+    invalidos = ({"nombre": ""}, {"fecha": "ayer"}, {"contenido": 123}, {"nombre": ["a"]}, {"diagnostico": None},
+                 {"tipo_documento": "Otro tipo"})
+    for cambio in invalidos:
+        respuesta, cuerpo = solicitar(conexion, "POST", "/v1/recetas", {**RECETA, **cambio}, token)
+        assert respuesta.status == 400 and "error" in json.loads(cuerpo), (cambio, respuesta.status)
+    for metodo, ruta, esperado in (("GET", "/v1/nada", 404), ("GET", "/v1/recetas", 405)):
+        respuesta, _ = solicitar(conexion, metodo, ruta)
+        assert respuesta.status == esperado, (ruta, respuesta.status)
+    print("✅ Datos inválidos (vacíos, no texto, tipo desconocido): 400; rutas y métodos desconocidos: 404/405")
+
+    lote = {"recetas": [RECETA, {**RECETA, "nombre": ""}, {**RECETA, "nombre": "Luis"}]}
+    respuesta, cuerpo = solicitar(conexion, "POST", "/v1/recetas/lote", lote, token)
+    resultado = json.loads(cuerpo)
+    assert respuesta.status == 200 and resultado["generadas"] == 2 and resultado["fallidas"] == 1, resultado
+    assert [r["indice"] for r in resultado["recetas"]] == [0, 1, 2]
+    assert resultado["recetas"][1]["estado"] == 400 and "nombre" in resultado["recetas"][1]["error"]
+    assert base64.b64decode(resultado["recetas"][2]["pdf_base64"]).startswith(b"%PDF")
+    assert resultado["recetas"][0]["archivo"] == "Receta_Núñez_Ana_20251118.pdf"
+    print("✅ Lote: PDFs en base64 y error por receta sin cortar el resto")
+
+    servidor.cola.max_pendientes = 0
+    respuesta, cuerpo = solicitar(conexion, "POST", "/v1/recetas", RECETA, token)
+    assert respuesta.status == 503 and respuesta.getheader("Retry-After") == "1", respuesta.status
+    servidor.cola.max_pendientes = 64
+    print("✅ Cola llena: 503 con Retry-After")
+
+    respuesta, cuerpo = solicitar(conexion, "GET", "/v1/salud")
+    assert respuesta.status == 200 and json.loads(cuerpo)["cola"]["activos"] == 0, cuerpo
+    print("✅ Salud: sin trabajos colgados en la cola")
+
+    conexion.close()
+    servidor.shutdown()
+    servidor.server_close()
+    print("\n✅ ¡TODO FUNCIONA CORRECTAMENTE!")
+
+except Exception as e:
+    print(f"❌ Error: {str(e)}")
+    import traceback
+    traceback.print_exc()
+    exit(1)
@@ -0,0 +1,124 @@
+"""
+Prueba del registro de auditoría
+
+Verifica que los inicios de sesión y las generaciones de PDF (también las
+fallidas) queden en el JSONL con el cliente y el sha256 del PDF, la rotación
+por tamaño sin perder eventos, que los PDF en cola no pasen de su límite de
+bytes, el descarte con la cola llena y que, desactivado, registrar() no haga nada.
+"""
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from datetime import date
+
+import auditoria
+from almacen_usuarios import AlmacenJSON
+from auditoria import Auditoria
+from auth import AuthManager
+from motor_pdf import DatosReceta, renderizar
+
+
+def leer(ruta):
+    with open(ruta, "r", encoding="utf-8") as f:
+        return [json.loads(linea) for linea in f]
+
+
+try:
+    print("🔍 Probando registro de auditoría...\n")
+
+    # Desactivada: no hay escritor ni archivo
+    auditoria._auditoria = None
+    auditoria.registrar("login", usuario="nadie", resultado="ok")
+    print("✅ Desactivada: registrar() no hace nada")
+
+    directorio = tempfile.mkdtemp()
+    ruta = os.path.join(directorio, "auditoria", "auditoria.jsonl")
+    registro = Auditoria(ruta, intervalo_fsync=0)
+    auditoria._auditoria = registro
+
+    auth = AuthManager(almacen=AlmacenJSON(os.path.join(directorio, "users.json")))
+    auth.register_user("dra_lopez", "secreta1", "Ana", "López")
+    auth.login("dra_lopez", "secreta1", "10.0.0.7")
+    auth.login("dra_lopez", "incorrecta")
+    datos = DatosReceta("Ana", "Núñez", date(2025, 11, 18), "Control", "Receta (Rp.)", "Rp./ Reposo")
+    pdf = renderizar(datos, usar_cache=False, usuario="dra_lopez")
+    try:
+        renderizar(DatosReceta("", "", date(2025, 11, 18), "", "Receta (Rp.)", ""), usar_cache=False)
+        raise AssertionError("Se generó un PDF con datos vacíos")
+    except ValueError:
+        pass
+    if not registro.vaciar():
+        raise AssertionError("La auditoría no se escribió a tiempo")
+
+    eventos = leer(ruta)
+    if [(e["evento"], e["resultado"]) for e in eventos] != [
+        ("login", "ok"), ("login", "fallido"), ("generacion", "ok"), ("generacion", "error")
+    ]:
+        raise AssertionError(f"Eventos incorrectos: {eventos}")
+    if [e["seq"] for e in eventos] != [1, 2, 3, 4] or "secreta1" in json.dumps(eventos):
+        raise AssertionError("Secuencia incorrecta o contraseña en la auditoría")
+    if eventos[0]["cliente"] != "10.0.0.7":
+        raise AssertionError(f"Falta el cliente en el login: {eventos[0]}")
+    generacion = eventos[2]
+    if (generacion["usuario"], generacion["apellido"], generacion["fecha"]) != ("dra_lopez", "Núñez", "2025-11-18"):
+        raise AssertionError(f"Datos de la generación incorrectos: {generacion}")
+    if generacion["pdf_sha256"] != hashlib.sha256(pdf).hexdigest() or generacion["pdf_bytes"] != len(pdf):
+        raise AssertionError("El hash del PDF no coincide")
+    if eventos[3]["error"] != "DatosInvalidosError" or "pdf_sha256" in eventos[3]:
+        raise AssertionError(f"Generación fallida mal registrada: {eventos[3]}")
+    if registro._bytes_pendientes:
+        raise AssertionError("Los bytes de PDF escritos siguen contados como pendientes")
+    print("✅ Inicios de sesión y generaciones registrados con el cliente y el sha256 del PDF")
+
+    # Con el límite de bytes ocupado el hash se calcula al registrar y el PDF no queda en la cola
+    # (espera_lote larga: el escritor todavía no tomó nada, como con un disco que no responde)
+    registro = Auditoria(os.path.join(directorio, "bytes.jsonl"), max_bytes_pendientes=len(pdf) + 1,
+                         espera_lote=1.0)
+    for _ in range(3):
+        registro.registrar("generacion", resultado="ok", pdf=pdf)
+    con_pdf = [("pdf" in campos) for campos in registro._cola]
+    if con_pdf != [True, False, False] or registro._bytes_pendientes != len(pdf):
+        raise AssertionError("La cola retiene más PDF que max_bytes_pendientes")
+    if [campos.get("pdf_sha256") for campos in list(registro._cola)[1:]] != [hashlib.sha256(pdf).hexdigest()] * 2:
+        raise AssertionError("Hash del PDF calculado al registrar incorrecto")
+    registro.cerrar()
+    if len(leer(registro.ruta)) != 3 or registro._bytes_pendientes:
+        raise AssertionError("Los eventos con el hash calculado al registrar no se escribieron")
+    print("✅ Los PDF en cola no superan max_bytes_pendientes")
+
+    # Rotación por tamaño desde varios hilos: ningún evento perdido ni repetido
+    registro = Auditoria(os.path.join(directorio, "rotacion.jsonl"), intervalo_fsync=0.05, max_bytes=4096)
+    hilos = [threading.Thread(target=lambda h=h: [registro.registrar("prueba", hilo=h, n=n) for n in range(250)])
+             for h in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    registro.cerrar()
+    archivos = glob.glob(os.path.join(directorio, "rotacion.jsonl*"))
+    eventos = [e for archivo in archivos for e in leer(archivo)]
+    if len(archivos) < 10 or registro.rotaciones != len(archivos) - 1:
+        raise AssertionError(f"No se rotó por tamaño: {len(archivos)} archivos")
+    if any(os.path.getsize(archivo) > 4096 for archivo in archivos):
+        raise AssertionError("Un archivo rotado supera el tamaño máximo")
+    if sorted(e["seq"] for e in eventos) != list(range(1, 1001)) or registro.escritos != 1000:
+        raise AssertionError(f"Se perdieron eventos al rotar: {len(eventos)}")
+    print("✅ Rotación por tamaño sin perder eventos")
+
+    # Cola llena: se descarta sin bloquear
+    registro = Auditoria(os.path.join(directorio, "llena.jsonl"), max_pendientes=0)
+    if registro.registrar("login", usuario="x", resultado="ok") or registro.descartados != 1:
+        raise AssertionError("Con la cola llena el evento debe descartarse")
+    registro.cerrar()
+    print("✅ Con la cola llena los eventos se descartan y se cuentan")
+    auditoria._auditoria = None
+    print("\n✅ ¡TODO FUNCIONA CORRECTAMENTE!")
+
+except Exception as e:
+    print(f"❌ Error: {str(e)}")
+    import traceback
+    traceback.print_exc()
+    exit(1)
@@ -0,0 +1,108 @@
+"""
+Prueba diferencial: empalme de bytes vs PyPDF2
+
+Genera los mismos documentos por los dos caminos del PDF plano
+(empalme.PlantillaBytes y aplanado.PlantillaPlana) y verifica que sean
+equivalentes: mismas páginas, recursos, contenido y metadatos, y una tabla
+xref del empalme que apunte exactamente a cada objeto.
+"""
+import random
+import re
+from datetime import date
+from io import BytesIO
+
+from PyPDF2 import PdfReader
+
+from motor_pdf import METADATOS, DatosReceta, campos_formulario
+from plantillas import obtener_cache
+
+CASOS_FIJOS = [
+    DatosReceta('Test', 'Usuario', date(2025, 11, 18), 'Test Diagnóstico', 'Receta (Rp.)', 'Rp.\n/\nTest contenido'),
+    DatosReceta('José', 'Ñúñez (hijo)', date(2024, 2, 29), 'Dx con \\ barra y (paréntesis)', 'Indicaciones / Notas',
+                '<p><strong>Rp.</strong></p><p>/ Amoxicilina 500&nbsp;mg</p><ul><li>cada 8 h</li><li>7 días</li></ul>'),
+    DatosReceta('A', 'B', date(2025, 1, 1), 'x' * 300, 'Receta (Rp.)',
+                '\n'.join(f'{i}. Paracetamol 500mg cada 6 horas' for i in range(200))),
+    DatosReceta('Emoji', 'Fuera€', date(2025, 1, 1), 'Sin WinAnsi: 😀 → ✓', 'Receta (Rp.)', 'endstream\nendobj\n%%EOF ) ('),
+]
+
+
+def casos_aleatorios(cantidad=25, semilla=13):
+    azar = random.Random(semilla)
+    alfabeto = "abcdeñáéíóú ABC()\\/%<>&;\n\r\t€•0123456789"
+    for _ in range(cantidad):
+        def texto(maximo):
+            return "".join(azar.choice(alfabeto) for _ in range(azar.randint(1, maximo)))
+        yield DatosReceta(texto(20).strip() or 'n', texto(20).strip() or 'a',
+                          date(2025, azar.randint(1, 12), azar.randint(1, 28)),
+                          texto(80), 'Receta (Rp.)', texto(600))
+
+
+def verificar_xref(pdf):
+    """Cada entrada en uso de la tabla xref debe apuntar al inicio de su objeto"""
+    inicio_xref = int(re.search(rb"startxref\s+(\d+)\s+%%EOF\s*$", pdf).group(1))
+    cabecera = re.match(rb"xref\s+0\s+(\d+)\s+", pdf[inicio_xref:])
+    entradas = re.findall(rb"(\d{10}) (\d{5}) ([nf])", pdf[inicio_xref + cabecera.end():])[:int(cabecera.group(1))]
+    for numero, (desplazamiento, _, tipo) in enumerate(entradas):
+        if tipo == b"n" and not pdf.startswith(b"%d 0 obj" % numero, int(desplazamiento)):
+            raise AssertionError(f"La entrada xref del objeto {numero} no apunta a su definición")
+
+
+def descripcion(pdf):
+    """Resumen comparable de un PDF plano"""
+    reader = PdfReader(BytesIO(pdf), strict=True)
+    paginas = []
+    for page in reader.pages:
+        recursos = page["/Resources"]
+        paginas.append({
+            "mediabox": [float(v) for v in page.mediabox],
+            "anotaciones": len(page.get("/Annots", [])),
+            "fuentes": sorted(recursos.get("/Font", {}).keys()),
+            "xobjects": sorted(recursos.get("/XObject", {}).keys()),
+            "contenido": [stream.get_object().get_data() for stream in page["/Contents"]],
+            "texto": page.extract_text(),
+        })
+    return {
+        "paginas": paginas,
+        "metadatos": dict(reader.metadata or {}),
+        "acroform": "/AcroForm" in reader.trailer["/Root"],
+    }
+
+
+try:
+    print("🔍 Comparando empalme de bytes con PyPDF2...\n")
+
+    plantilla_cache = obtener_cache("modeloReceta.pdf")
+    empalme = plantilla_cache.obtener_empalme(METADATOS)
+    plana = plantilla_cache.obtener_plana()
+    if empalme is None:
+        raise AssertionError("La plantilla no admite el empalme de bytes")
+
+    casos = CASOS_FIJOS + list(casos_aleatorios())
+    for indice, datos in enumerate(casos):
+        campos = campos_formulario(datos)
+        pdf_empalme = empalme.renderizar(campos)
+        pdf_pypdf2 = plana.renderizar(campos, METADATOS)
+
+        verificar_xref(pdf_empalme)
+        esperado, obtenido = descripcion(pdf_pypdf2), descripcion(pdf_empalme)
+        if obtenido != esperado:
+            diferentes = [clave for clave in esperado if esperado[clave] != obtenido[clave]]
+            raise AssertionError(f"Caso {indice}: el empalme difiere de PyPDF2 en {diferentes}")
+
+    print(f"✅ {len(casos)} documentos equivalentes")
+
+    # Texto1 de 200 líneas: sigue en páginas de continuación que repiten al paciente
+    paginas = PdfReader(BytesIO(empalme.renderizar(campos_formulario(CASOS_FIJOS[2]))), strict=True).pages
+    textos = [page.extract_text() for page in paginas]
+    if len(paginas) < 2 or "199. Paracetamol" not in textos[-1] or not all("A B" in texto for texto in textos):
+        raise AssertionError(f"El texto largo no sigue en páginas de continuación ({len(paginas)} páginas)")
+    if len(PdfReader(BytesIO(empalme.renderizar(campos_formulario(CASOS_FIJOS[0])))).pages) != 1:
+        raise AssertionError("Un texto corto no debe agregar páginas")
+    print(f"✅ Texto largo en {len(paginas)} páginas, hasta la última línea")
+    print("\n✅ ¡TODO FUNCIONA CORRECTAMENTE!")
+
+except Exception as e:
+    print(f"❌ Error: {str(e)}")
+    import traceback
+    traceback.print_exc()
+    exit(1)
@@ -0,0 +1,112 @@
+"""
+Prueba de la exportación de recetas a ZIP
+
+Verifica que el ZIP escrito de corrido (sin seek) sea válido para zipfile, que
+tenga el PDF de cada receta del rango y un manifiesto con una fila por receta
+(las que perdieron su PDF quedan marcadas), el filtro por día, mes y médico, y
+el progreso informado.
+"""
+import csv
+import io
+import os
+import tempfile
+import zipfile
+from datetime import date
+
+from exportacion import exportar, rango_fechas
+from historial import HistorialRecetas
+from motor_pdf import DatosReceta
+
+
+class SoloEscritura(io.RawIOBase):
+    """Destino que no admite seek ni tell, como un pipe"""
+
+    def __init__(self):
+        self.datos = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self.datos += datos
+        return len(datos)
+
+
+def pdf_falso(texto):
+    return b"%PDF-1.4\n" + texto.encode("utf-8") * 50 + b"\n%%EOF\n"
+
+
+try:
+    print("🔍 Probando exportación a ZIP...\n")
+
+    directorio = tempfile.mkdtemp()
+    historial = HistorialRecetas(os.path.join(directorio, "historial.db"), os.path.join(directorio, "pdfs"))
+    recetas = [
+        ("dra_lopez", "Ana", "Núñez", date(2025, 11, 18)),
+        ("dra_lopez", "Luis", "Pérez", date(2025, 11, 18)),
+        ("dr_perez", "Eva", "Sosa", date(2025, 11, 18)),
+        ("dra_lopez", "Juan", "Gómez", date(2025, 11, 3)),
+        ("dra_lopez", "Sara", "Díaz", date(2025, 12, 1)),
+    ]
+    ids = []
+    for usuario, nombre, apellido, fecha in recetas:
+        datos = DatosReceta(nombre, apellido, fecha, "Control", "Receta (Rp.)", "Rp./ Reposo")
+        ids.append(historial.registrar(usuario, datos, pdf_falso(f"{usuario}-{apellido}")))
+    # Un PDF borrado del almacenamiento queda en el manifiesto como "sin_pdf"
+    os.remove(historial._ruta_pdf(historial.obtener("dra_lopez", ids[1])["pdf_sha256"]))
+
+    destino = SoloEscritura()
+    avances = []
+    desde, hasta = rango_fechas(dia="2025-11-18")
+    resumen = exportar(historial, destino, desde=desde, hasta=hasta,
+                       progreso=lambda hechas, total, escritos: avances.append((hechas, total)))
+    if (resumen["recetas"], resumen["exportadas"], resumen["sin_pdf"]) != (3, 2, 1):
+        raise AssertionError(f"Resumen incorrecto: {resumen}")
+    if avances != [(1, 3), (2, 3), (3, 3)] or resumen["bytes_zip"] != len(destino.datos):
+        raise AssertionError(f"Progreso incorrecto: {avances}")
+
+    with zipfile.ZipFile(io.BytesIO(bytes(destino.datos))) as zip_leido:
+        if zip_leido.testzip() is not None:
+            raise AssertionError("El ZIP tiene entradas dañadas")
+        nombres = zip_leido.namelist()
+        esperados = [f"dra_lopez/2025-11-18/{ids[0]:06d}_Receta_Núñez_Ana_20251118.pdf",
+                     f"dr_perez/2025-11-18/{ids[2]:06d}_Receta_Sosa_Eva_20251118.pdf", "manifiesto.csv"]
+        if nombres != esperados:
+            raise AssertionError(f"Entradas incorrectas: {nombres}")
+        if zip_leido.read(esperados[0]) != pdf_falso("dra_lopez-Núñez"):
+            raise AssertionError("El PDF exportado no coincide con el guardado")
+        filas = list(csv.DictReader(io.StringIO(zip_leido.read("manifiesto.csv").decode("utf-8"))))
+    if [(int(f["id"]), f["estado"]) for f in filas] != [(ids[0], "ok"), (ids[1], "sin_pdf"), (ids[2], "ok")]:
+        raise AssertionError(f"Manifiesto incorrecto: {filas}")
+    if filas[0]["archivo"] != esperados[0] or filas[1]["archivo"] != "":
+        raise AssertionError(f"Archivos del manifiesto incorrectos: {filas}")
+    print("✅ ZIP válido escrito sin seek, con manifiesto y progreso")
+
+    # Mes y médico; comprimido
+    destino = SoloEscritura()
+    desde, hasta = rango_fechas(mes="2025-11")
+    resumen = exportar(historial, destino, "dra_lopez", desde, hasta, comprimir=True, lote=1)
+    with zipfile.ZipFile(io.BytesIO(bytes(destino.datos))) as zip_leido:
+        if zip_leido.testzip() is not None or len(zip_leido.namelist()) != 3:
+            raise AssertionError(f"Exportación del mes incorrecta: {zip_leido.namelist()}")
+        if zip_leido.getinfo(zip_leido.namelist()[0]).compress_type != zipfile.ZIP_DEFLATED:
+            raise AssertionError("Con comprimir=True las entradas deben ir con deflate")
+    if resumen["recetas"] != 3 or resumen["sin_pdf"] != 1:
+        raise AssertionError(f"Filtro por mes y médico incorrecto: {resumen}")
+    if rango_fechas(mes="2024-02") != (date(2024, 2, 1), date(2024, 2, 29)):
+        raise AssertionError("Rango del mes incorrecto")
+    print("✅ Filtro por mes y médico, con compresión")
+
+    # Sin recetas en el rango: ZIP válido solo con el manifiesto
+    destino = SoloEscritura()
+    exportar(historial, destino, desde=date(2020, 1, 1), hasta=date(2020, 1, 31))
+    with zipfile.ZipFile(io.BytesIO(bytes(destino.datos))) as zip_leido:
+        if zip_leido.namelist() != ["manifiesto.csv"]:
+            raise AssertionError("Sin recetas solo debe quedar el manifiesto")
+    print("\n✅ ¡TODO FUNCIONA CORRECTAMENTE!")
+
+except Exception as e:
+    print(f"❌ Error: {str(e)}")
+    import traceback
+    traceback.print_exc()
+    exit(1)
@@ -0,0 +1,75 @@
+"""
+Prueba de los favoritos de cada médico
+
+Verifica que los favoritos se guarden con su texto normalizado (y se reemplacen
+por título), que los guardados con otra versión del normalizador se recalculen
+al leerlos y que un favorito precompilado genere el mismo PDF sin volver a
+normalizar ni maquetar su texto.
+"""
+import os
+import tempfile
+from datetime import date
+
+import normalizador
+from historial import HistorialRecetas
+from motor_pdf import DatosReceta, precompilar, renderizar
+from plantillas import obtener_cache
+
+CONTENIDO = "<p><strong>Rp.</strong></p><p>/ Ayuno de 8 horas</p><ul><li>Suspender aspirina</li><li>Traer estudios</li></ul>"
+TEXTO = "Rp./ Ayuno de 8 horas\n• Suspender aspirina\n• Traer estudios"
+
+try:
+    print("🔍 Probando favoritos...\n")
+
+    directorio = tempfile.mkdtemp()
+    historial = HistorialRecetas(os.path.join(directorio, "historial.db"), os.path.join(directorio, "pdfs"))
+    favorito = historial.guardar_favorito("dra_lopez", "Preoperatorio", "Indicaciones / Notas", CONTENIDO)
+    if favorito["texto"] != TEXTO:
+        raise AssertionError(f"Texto normalizado incorrecto: {favorito['texto']!r}")
+    historial.guardar_favorito("dra_lopez", "Control", "Receta (Rp.)", "Rp.\n/\nIbuprofeno 400 mg")
+    reemplazo = historial.guardar_favorito("dra_lopez", "Preoperatorio", "Indicaciones / Notas", CONTENIDO + "<p>Fin</p>")
+    favoritos = historial.favoritos("dra_lopez")
+    if [f["titulo"] for f in favoritos] != ["Control", "Preoperatorio"] or reemplazo["id"] != favorito["id"]:
+        raise AssertionError(f"Favoritos guardados incorrectos: {favoritos}")
+    if historial.favoritos("dr_perez"):
+        raise AssertionError("Los favoritos de un médico no deben verse para otro")
+    print("✅ Favoritos guardados por médico con su texto normalizado")
+
+    # Un texto guardado con otra versión del normalizador se recalcula al leerlo
+    conexion = historial._conexion()
+    with conexion:
+        conexion.execute("UPDATE favoritos SET texto = 'viejo', version_texto = 0 WHERE titulo = 'Control'")
+    control = historial.favoritos("dra_lopez")[0]
+    if control["texto"] != "Rp./\nIbuprofeno 400 mg" or control["version_texto"] != normalizador.VERSION:
+        raise AssertionError(f"El texto desactualizado no se recalculó: {control}")
+    print("✅ Textos de otra versión del normalizador recalculados")
+
+    if not historial.borrar_favorito("dra_lopez", control["id"]) or historial.borrar_favorito("dr_perez", favorito["id"]):
+        raise AssertionError("Solo el dueño puede borrar un favorito")
+
+    # Precompilado: mismo PDF, sin normalizar ni maquetar Texto1 otra vez
+    datos = DatosReceta("Ana", "Núñez", date(2025, 11, 18), "Preop", "Indicaciones / Notas", CONTENIDO)
+    esperado = renderizar(datos, usar_cache=False)
+    precompilar(CONTENIDO, TEXTO, tipo_documento=datos.tipo_documento)
+    plana = obtener_cache("modeloReceta.pdf").obtener_plana()
+    llamadas = []
+    html_a_texto, maquetar = normalizador.html_a_texto, plana._maquetar
+    normalizador.html_a_texto = lambda html: llamadas.append("normalizar") or html_a_texto(html)
+    plana._maquetar = lambda campo, valor: llamadas.append(campo.nombre) or maquetar(campo, valor)
+    try:
+        obtenido = renderizar(datos, usar_cache=False)
+    finally:
+        normalizador.html_a_texto = html_a_texto
+        del plana._maquetar
+    if obtenido != esperado:
+        raise AssertionError("El favorito precompilado genera un PDF distinto")
+    if "normalizar" in llamadas or "Texto1" in llamadas:
+        raise AssertionError(f"El favorito precompilado se volvió a procesar: {llamadas}")
+    print("✅ Favorito precompilado: mismo PDF sin normalizar ni maquetar su texto")
+    print("\n✅ ¡TODO FUNCIONA CORRECTAMENTE!")
+
+except Exception as e:
+    print(f"❌ Error: {str(e)}")
+    import traceback
+    traceback.print_exc()
+    exit(1)
@@ -0,0 +1,107 @@
+"""
+Prueba del limitador de intentos de inicio de sesión
+
+Verifica la recarga de los cubos de fichas, el límite de cubos en memoria
+(se descartan los menos usados), que AuthManager.login rechace por usuario y
+por cliente sin consultar el almacén ni hashear la contraseña, que los logins
+correctos no gasten fichas, que rotar X-Forwarded-For no evite el límite por
+cliente y que los rechazos se cuenten en las métricas.
+"""
+import os
+import tempfile
+
+import metricas
+from almacen_usuarios import AlmacenJSON
+from auth import MENSAJE_LIMITADO, AuthManager
+from limitador import CubosTokens, LimitadorLogin, direccion_cliente
+from metricas import Metricas
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self):
+        return self.ahora
+
+
+try:
+    print("🔍 Probando limitador de intentos de login...\n")
+
+    reloj = Reloj()
+    cubos = CubosTokens(3, 10.0, max_claves=2, reloj=reloj)
+    if [cubos.tomar("a") for _ in range(4)] != [True, True, True, False]:
+        raise AssertionError("El cubo debe permitir una ráfaga igual a su capacidad")
+    reloj.ahora = 10.0
+    if not cubos.tomar("a") or cubos.tomar("a"):
+        raise AssertionError("El cubo debe recargar una ficha cada 10 s")
+    cubos.tomar("b")
+    cubos.tomar("c")
+    if len(cubos) != 2 or cubos.descartados != 1 or not cubos.tomar("a"):
+        raise AssertionError("Se debe descartar el cubo usado hace más tiempo (y volver lleno)")
+    print("✅ Cubos con recarga y a lo sumo max_claves en memoria")
+
+    directorio = tempfile.mkdtemp()
+    almacen = AlmacenJSON(os.path.join(directorio, "users.json"))
+    auth = AuthManager(almacen=almacen, limitador=LimitadorLogin(3, 12.0, 5, 1.0, reloj=reloj))
+    auth.register_user("dra_lopez", "secreta1", "Ana", "López")
+    registro = Metricas()
+    metricas._metricas = registro
+
+    # Los logins correctos devuelven sus fichas
+    for _ in range(10):
+        if not auth.login("dra_lopez", "secreta1", "10.0.0.1")[0]:
+            raise AssertionError("Los logins correctos no deben gastar intentos")
+
+    # Por usuario: el cuarto intento fallido se rechaza sin tocar el almacén ni hashear
+    llamadas = []
+    obtener, hashear = almacen.obtener, auth._hash_password
+    almacen.obtener = lambda usuario: llamadas.append("almacen") or obtener(usuario)
+    auth._hash_password = lambda password: llamadas.append("hash") or hashear(password)
+    for _ in range(3):
+        auth.login("dra_lopez", "incorrecta", "10.0.0.2")
+    llamadas.clear()
+    exito, _, mensaje = auth.login("dra_lopez", "secreta1", "10.0.0.3")
+    if exito or mensaje != MENSAJE_LIMITADO or llamadas:
+        raise AssertionError(f"El intento limitado no debe llegar al almacén: {mensaje} {llamadas}")
+    reloj.ahora += 12.0
+    if not auth.login("dra_lopez", "secreta1", "10.0.0.3")[0]:
+        raise AssertionError("Después de la recarga el usuario debe poder entrar")
+    print("✅ Límite por usuario sin consultar el almacén ni hashear")
+
+    # Por cliente: muchos usuarios desde la misma IP
+    resultados = [auth.login(f"usuario{i}", "x", "10.0.0.9")[2] for i in range(7)]
+    if resultados[:5].count(MENSAJE_LIMITADO) or resultados[5:] != [MENSAJE_LIMITADO] * 2:
+        raise AssertionError(f"Límite por cliente incorrecto: {resultados}")
+    if auth.login("usuario99", "x", "10.0.0.10")[2] == MENSAJE_LIMITADO:
+        raise AssertionError("El límite de un cliente no debe afectar a otro")
+    print("✅ Límite por cliente")
+
+    # X-Forwarded-For rotado en cada intento: sin proxy confiable cuenta el socket,
+    # con proxy confiable la última entrada (la que agregó el proxy)
+    for proxies, par, ultima in ((set(), "10.0.0.20", ""), ({"10.0.0.1"}, "10.0.0.1", ", 198.51.100.20")):
+        clientes = [direccion_cliente(par, f"203.0.113.{i}{ultima}", proxies) for i in range(7)]
+        resultados = [auth.login(f"otro{i}", "x", cliente)[2] for i, cliente in enumerate(clientes)]
+        if resultados[5:] != [MENSAJE_LIMITADO] * 2:
+            raise AssertionError(f"Rotar X-Forwarded-For evita el límite por cliente: {clientes}")
+    if direccion_cliente("10.0.0.30", "203.0.113.1", {"*"}) != "203.0.113.1" or direccion_cliente(None, "1.2.3.4", {"*"}):
+        raise AssertionError("Dirección del cliente detrás de un proxy incorrecta")
+    print("✅ X-Forwarded-For rotado no evita el límite por cliente")
+
+    exportado = registro.exportar()
+    for linea in ('recetas_logins_limitados_total{por="usuario"} 1', 'recetas_logins_limitados_total{por="cliente"} 6'):
+        if linea not in exportado:
+            raise AssertionError(f"Falta en las métricas: {linea}")
+    metricas._metricas = None
+    print("✅ Rechazos contados en las métricas")
+
+    sin_limite = LimitadorLogin(0, 1.0, 0, 1.0)
+    if any(sin_limite.intentar("x", "y") for _ in range(100)):
+        raise AssertionError("Con 0 intentos el límite debe estar desactivado")
+    print("\n✅ ¡TODO FUNCIONA CORRECTAMENTE!")
+
+except Exception as e:
+    print(f"❌ Error: {str(e)}")
+    import traceback
+    traceback.print_exc()
+    exit(1)
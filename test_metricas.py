@@ -0,0 +1,82 @@
+"""
+Prueba de las métricas en formato Prometheus
+
+Verifica los histogramas y contadores exportados, que las excepciones cuenten
+como errores (salvo las de control de Streamlit), el endpoint HTTP y que con
+las métricas desactivadas medir() no registre nada.
+"""
+import threading
+import urllib.request
+from datetime import date
+
+import metricas
+from metricas import Metricas, _crear_servidor
+from motor_pdf import DatosReceta, renderizar
+
+
+class DetenerScript(BaseException):
+    """Como StopException de Streamlit"""
+
+
+try:
+    print("🔍 Probando métricas...\n")
+
+    # Desactivadas: contexto compartido y sin registros
+    metricas._metricas = None
+    assert metricas.medir("generar_pdf") is metricas.medir("descarga")
+    metricas.contar("logins", resultado="ok")
+    print("✅ Desactivadas: medir() y contar() no hacen nada")
+
+    registro = Metricas()
+    metricas._metricas = registro
+    renderizar(DatosReceta('Test', 'Usuario', date(2025, 11, 18), 'Dx', 'Receta (Rp.)', 'Rp.\n/\nTest'), usar_cache=False)
+    try:
+        renderizar(DatosReceta('', '', date(2025, 11, 18), '', 'Receta (Rp.)', ''), usar_cache=False)
+        raise AssertionError("Se generó un PDF con datos vacíos")
+    except ValueError:
+        pass
+    try:
+        with metricas.medir("formulario"):
+            raise DetenerScript()
+    except DetenerScript:
+        pass
+    metricas.contar("logins", resultado="fallido")
+
+    texto = registro.exportar()
+    for linea in (
+        '# TYPE recetas_etapa_segundos histogram',
+        'recetas_etapa_segundos_count{etapa="generar_pdf"} 2',
+        'recetas_etapa_segundos_bucket{etapa="generar_pdf",le="+Inf"} 2',
+        'recetas_etapa_segundos_count{etapa="formulario"} 1',
+        'recetas_generaciones_total{resultado="ok"} 1',
+        'recetas_generaciones_total{resultado="error"} 1',
+        'recetas_errores_total{etapa="generar_pdf",tipo="DatosInvalidosError"} 1',
+        'recetas_logins_total{resultado="fallido"} 1',
+    ):
+        assert linea in texto.splitlines(), f"Falta '{linea}' en:\n{texto}"
+    assert 'etapa="formatear_contenido"' in texto
+    assert 'etapa="formulario",tipo=' not in texto, "st.stop() no es un error"
+    print("✅ Histogramas por etapa y contadores de generaciones, errores y logins")
+
+    # Las cubetas son acumulativas
+    cubetas = [int(l.rsplit(" ", 1)[1]) for l in texto.splitlines()
+               if l.startswith('recetas_etapa_segundos_bucket{etapa="generar_pdf"')]
+    assert cubetas == sorted(cubetas) and len(cubetas) == len(metricas.LIMITES) + 1, cubetas
+    print("✅ Cubetas acumulativas terminadas en +Inf")
+
+    servidor = _crear_servidor(registro, "127.0.0.1", 0)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{servidor.server_address[1]}/metrics"
+    with urllib.request.urlopen(url) as respuesta:
+        assert respuesta.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        assert 'recetas_logins_total{resultado="fallido"} 1' in respuesta.read().decode("utf-8")
+    servidor.shutdown()
+    print(f"✅ Endpoint HTTP: {url}")
+
+    print("\n✅ ¡TODO FUNCIONA CORRECTAMENTE!")
+
+except Exception as e:
+    print(f"❌ Error: {str(e)}")
+    import traceback
+    traceback.print_exc()
+    exit(1)
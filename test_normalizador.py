@@ -0,0 +1,77 @@
+"""
+Prueba del normalizador de contenido
+
+Verifica cada regla del docstring de normalizador.py: bloques y saltos, listas
+con viñetas, numeración (también con start) y sangría por nivel, la URL de los
+enlaces, <pre> literal, etiquetas ocultas, entidades y espacios, la unión de
+"Rp." con "/" también entre bloques, un "<" sin cerrar y que el texto plano y
+los contenidos precompilados no pasen por el recorrido de etiquetas.
+"""
+import normalizador
+from normalizador import html_a_texto, normalizar_contenido, precompilar
+
+CASOS = (
+    # Párrafos, títulos y <div> terminan línea; <br> es un salto duro
+    ("<p>Hola</p><p>Mundo</p>", "Hola\nMundo"),
+    ("<h2>Título</h2><div>uno</div>dos", "Título\nuno\ndos"),
+    ("uno<br>dos<br><br>tres", "uno\ndos\n\ntres"),
+    ("<p>x <b>negrita</b>y</p>", "x negritay"),
+    ("<table><tr><td>a</td><td>b</td></tr><tr><td>c</td></tr></table>", "a b\nc"),
+    # Listas: viñetas, numeración con start y sangría por nivel
+    ("<ul><li>Ibuprofeno</li><li>Reposo<ul><li>48 h</li></ul></li></ul>", "• Ibuprofeno\n• Reposo\n  • 48 h"),
+    ("<ol><li>a</li><li>b</li></ol>", "1. a\n2. b"),
+    ('<ol start="3"><li>c</li><li>d</li></ol>', "3. c\n4. d"),
+    ('<ol start="x"><li>c</li></ol>', "1. c"),
+    ("<ol><li>a<ol><li>b</li></ol></li><li>c</li></ol>", "1. a\n  1. b\n2. c"),
+    ("<li>suelto</li>", "• suelto"),
+    # Enlaces: la URL entre paréntesis solo si es distinta del texto (y no es un ancla)
+    ('<a href="https://x.org">guía</a> fin', "guía (https://x.org) fin"),
+    ('<a href="https://x.org">https://x.org</a>', "https://x.org"),
+    ('<a href="#nota">ver</a>', "ver"),
+    # <pre> conserva espacios y saltos; las etiquetas ocultas no aportan texto
+    ("<pre>  Rp.\n/ Ibuprofeno\n   cada 8 h</pre>después", "  Rp./ Ibuprofeno\n   cada 8 h\ndespués"),
+    ("<p>antes</p><script>alert(1)</script><style>p{}</style>después", "antes\ndespués"),
+    ("<!-- comentario --><p>x</p>", "x"),
+    # Entidades decodificadas y espacios colapsados
+    ("<p>a&nbsp;&amp;&lt;b&gt;   c\n d</p>", "a &<b> c d"),
+    # "Rp." al final de una línea y "/" al inicio de la siguiente, también entre bloques
+    ("<p>Rp.</p><p>/ Ibuprofeno</p>", "Rp./ Ibuprofeno"),
+    ("<p>Rp.<br>/Ibuprofeno</p>", "Rp./Ibuprofeno"),
+    ("<p>Rp.</p><p>Ibuprofeno</p>", "Rp.\nIbuprofeno"),
+    # Un "<" que no abre una etiqueta, o una etiqueta sin cerrar, queda como texto
+    ("<p>dosis <5 mg</p>", "dosis <5 mg"),
+    ("a < b <p>c", "a < b\nc"),
+    ("<p>a <b c</p><p>d</p>", "a <b c\nd"),
+)
+
+try:
+    print("🔍 Probando normalizador de contenido...\n")
+
+    for html, esperado in CASOS:
+        obtenido = html_a_texto(html)
+        if obtenido != esperado:
+            raise AssertionError(f"{html!r}: se esperaba {esperado!r}, se obtuvo {obtenido!r}")
+    print(f"✅ {len(CASOS)} reglas del HTML del editor")
+
+    # El texto plano solo recibe la regla de Rp./ (las entidades quedan tal cual)
+    for texto, esperado in (("Rp.\n/ Ibuprofeno", "Rp./ Ibuprofeno"), ("Rp. \n /x", "Rp./x"),
+                            ("a &amp; b\n\nc", "a &amp; b\n\nc"), ("", "")):
+        if normalizar_contenido(texto) != esperado:
+            raise AssertionError(f"Texto plano {texto!r}: {normalizar_contenido(texto)!r}")
+    print("✅ Texto plano: solo se une Rp./")
+
+    # Los contenidos precompilados se devuelven sin procesarlos
+    normalizador._precompilados.clear()
+    if precompilar("<p>fav</p>") != "fav" or precompilar("<p>otro</p>", "TEXTO GUARDADO") != "TEXTO GUARDADO":
+        raise AssertionError("precompilar() debe devolver el texto registrado")
+    if normalizar_contenido("<p>otro</p>") != "TEXTO GUARDADO":
+        raise AssertionError("Un contenido precompilado no debe volver a normalizarse")
+    normalizador._precompilados.clear()
+    print("✅ Contenidos precompilados")
+    print("\n✅ ¡TODO FUNCIONA CORRECTAMENTE!")
+
+except Exception as e:
+    print(f"❌ Error: {str(e)}")
+    import traceback
+    traceback.print_exc()
+    exit(1)
@@ -1,65 +1,102 @@
 """
 Script para probar la generación de PDF
 """
-from PyPDF2 import PdfReader, PdfWriter
+from datetime import date
 from io import BytesIO
 
+from motor_pdf import DatosReceta, renderizar
+
 try:
     print("🔍 Probando generación de PDF...\n")
-    
+
     # Verificar que el archivo existe
     import os
     if not os.path.exists('modeloReceta.pdf'):
         print("❌ modeloReceta.pdf no encontrado")
         print(f"📁 Archivos disponibles: {os.listdir('.')}")
         exit(1)
-    
+
     print("✅ modeloReceta.pdf encontrado")
-    
-    # Leer el PDF
-    reader = PdfReader('modeloReceta.pdf')
-    print(f"✅ PDF leído - {len(reader.pages)} página(s)")
-    
-    # Crear writer
-    writer = PdfWriter()
-    for page in reader.pages:
-        writer.add_page(page)
-    
-    print("✅ Página copiada")
-    
-    # Rellenar campos
-    writer.update_page_form_field_values(
-        writer.pages[0],
-        {
-            'Date': '18/11/2025',
-            'Paciente': 'Test Usuario',
-            'Dx': 'Test Diagnóstico',
-            'Texto1': 'Rp./\nTest contenido'
-        }
+
+    # Generar con el motor (igual que la app)
+    datos = DatosReceta(
+        nombre='Test',
+        apellido='Usuario',
+        fecha=date(2025, 11, 18),
+        diagnostico='Test Diagnóstico',
+        tipo_documento='Receta (Rp.)',
+        contenido='Rp.\n/\nTest contenido'
     )
-    
-    print("✅ Campos rellenados")
-    
-    # Guardar a buffer (como lo hace la app)
-    buffer = BytesIO()
-    writer.write(buffer)
-    buffer.seek(0)
-    pdf_data = buffer.getvalue()
-    
+    pdf_data = renderizar(datos)
+
     print(f"✅ PDF generado en memoria")
     print(f"📊 Tamaño del PDF: {len(pdf_data)} bytes")
-    
+
+    # Verificar que los campos quedaron rellenados
+    from PyPDF2 import PdfReader
+    reader = PdfReader(BytesIO(pdf_data))
+    print(f"✅ PDF leído - {len(reader.pages)} página(s)")
+
+    # El PDF es plano: sin campos de formulario y con el texto en el contenido de la página
+    widgets = [
+        annot_ref.get_object() for annot_ref in reader.pages[0].get("/Annots", [])
+        if annot_ref.get_object().get("/Subtype") == "/Widget"
+    ]
+    if widgets:
+        raise AssertionError(f"El PDF plano aún tiene {len(widgets)} campo(s) de formulario")
+
+    esperado = {
+        'Date': '18/11/2025',
+        'Paciente': 'Test Usuario',
+        'Dx': 'Test Diagnóstico',
+        'Texto1': 'Rp./\nTest contenido'
+    }
+    texto = reader.pages[0].extract_text()
+    for campo, valor in esperado.items():
+        if valor not in texto:
+            raise AssertionError(f"Campo {campo}: no se encontró {valor!r} en el texto del PDF")
+
+    print("✅ Texto escrito en la página (PDF plano)")
+
+    # El modo editable sigue rellenando los campos del formulario
+    reader_editable = PdfReader(BytesIO(renderizar(datos, aplanar=False)))
+    valores = {}
+    for annot_ref in reader_editable.pages[0]["/Annots"].get_object():
+        annot = annot_ref.get_object()
+        if annot.get("/Subtype") == "/Widget":
+            valores[annot.get("/T")] = annot.get("/V")
+
+    for campo, valor in esperado.items():
+        if valores.get(campo) != valor:
+            raise AssertionError(f"Campo {campo}: se esperaba {valor!r}, se obtuvo {valores.get(campo)!r}")
+
+    print("✅ Campos rellenados")
+
+    # Subir la versión del motor invalida los PDFs guardados en la caché (también en disco)
+    import motor_pdf
+    from cache_pdf import obtener_cache_pdf
+    cache = obtener_cache_pdf()
+    renderizar(datos)
+    fallos = cache.misses
+    renderizar(datos)
+    motor_pdf.VERSION_RENDERIZADO += 1
+    renderizar(datos)
+    motor_pdf.VERSION_RENDERIZADO -= 1
+    if cache.misses != fallos + 1:
+        raise AssertionError("La caché de PDFs no depende de la versión del motor")
+    print("✅ La versión del motor es parte de la clave de la caché")
+
     # Guardar a archivo para verificar
     with open('test_descarga.pdf', 'wb') as f:
         f.write(pdf_data)
-    
+
     print(f"✅ PDF guardado como test_descarga.pdf")
-    
+
     if len(pdf_data) > 0:
         print("\n✅ ¡TODO FUNCIONA CORRECTAMENTE!")
     else:
         print("\n❌ El PDF está vacío")
-        
+
 except Exception as e:
     print(f"❌ Error: {str(e)}")
     import traceback
@@ -0,0 +1,86 @@
+"""
+Prueba del registro de plantillas por médico y tipo de documento
+
+Verifica la validación de campos al registrar, el orden de búsqueda al resolver,
+la carga desde plantillas.json y que solo las plantillas más recientes queden
+parseadas en memoria.
+"""
+import json
+import os
+import shutil
+import tempfile
+from datetime import date
+
+import plantillas
+from motor_pdf import DatosReceta, renderizar
+from plantillas import PlantillaInvalidaError, RegistroPlantillas, obtener_cache
+
+try:
+    print("🔍 Probando registro de plantillas...\n")
+
+    directorio = tempfile.mkdtemp()
+    lopez = os.path.join(directorio, "lopez.pdf")
+    notas = os.path.join(directorio, "notas.pdf")
+    shutil.copy("modeloReceta.pdf", lopez)
+    shutil.copy("modeloReceta.pdf", notas)
+
+    # Un PDF plano no tiene campos: no se puede registrar
+    datos = DatosReceta('Test', 'Usuario', date(2025, 11, 18), 'Dx', 'Receta (Rp.)', 'Rp.\n/\nTest')
+    sin_campos = os.path.join(directorio, "sin_campos.pdf")
+    with open(sin_campos, "wb") as f:
+        f.write(renderizar(datos, usar_cache=False))
+
+    registro = RegistroPlantillas()
+    entrada = registro.registrar(lopez, usuario="dra_lopez")
+    assert set(plantillas.CAMPOS_REQUERIDOS) <= set(entrada.campos), entrada.campos
+    print(f"✅ Campos indexados al registrar: {sorted(entrada.campos)}")
+
+    for ruta in (sin_campos, os.path.join(directorio, "no_existe.pdf")):
+        try:
+            registro.registrar(ruta, usuario="dr_perez")
+            raise AssertionError(f"Se registró una plantilla inválida: {ruta}")
+        except (PlantillaInvalidaError, FileNotFoundError):
+            pass
+    print("✅ Plantillas sin campos o inexistentes rechazadas al registrar")
+
+    registro.registrar(notas, tipo_documento="Indicaciones / Notas")
+    casos = [
+        (("dra_lopez", "Receta (Rp.)"), lopez),
+        (("dra_lopez", "Indicaciones / Notas"), lopez),
+        (("dr_perez", "Indicaciones / Notas"), notas),
+        (("dr_perez", "Receta (Rp.)"), "modeloReceta.pdf"),
+        ((None, None), "modeloReceta.pdf"),
+    ]
+    for (usuario, tipo), esperada in casos:
+        obtenida = registro.resolver(usuario, tipo).ruta
+        assert obtenida == esperada, f"{usuario}/{tipo}: {obtenida} != {esperada}"
+    registro.registrar(notas, usuario="dra_lopez", tipo_documento="Indicaciones / Notas")
+    assert registro.resolver("dra_lopez", "Indicaciones / Notas").ruta == notas
+    print("✅ Resolución: usuario y tipo > usuario > tipo > por defecto")
+
+    configuracion = os.path.join(directorio, "plantillas.json")
+    with open(configuracion, "w", encoding="utf-8") as f:
+        json.dump({"plantillas": [
+            {"usuario": "dra_lopez", "ruta": "lopez.pdf"},
+            {"usuario": "dr_perez", "ruta": "sin_campos.pdf"},
+        ]}, f)
+    desde_archivo = RegistroPlantillas()
+    assert desde_archivo.cargar_configuracion(configuracion) == 1
+    assert len(desde_archivo.errores) == 1 and "sin_campos" in desde_archivo.errores[0], desde_archivo.errores
+    assert desde_archivo.resolver("dra_lopez").ruta == lopez
+    print("✅ plantillas.json cargado; la entrada inválida quedó en errores")
+
+    plantillas._max_cargadas = 2
+    for ruta in (lopez, notas, "modeloReceta.pdf"):
+        obtener_cache(ruta).verificar()
+    assert list(plantillas._caches) == [notas, "modeloReceta.pdf"], list(plantillas._caches)
+    print("✅ LRU: solo las 2 plantillas más recientes quedan parseadas")
+
+    shutil.rmtree(directorio)
+    print("\n✅ ¡TODO FUNCIONA CORRECTAMENTE!")
+
+except Exception as e:
+    print(f"❌ Error: {str(e)}")
+    import traceback
+    traceback.print_exc()
+    exit(1)
@@ -0,0 +1,49 @@
+"""
+Prueba del spool temporal de PDFs
+
+Verifica que leer() devuelva los bytes guardados, que una entrada vencida no se
+pueda leer y que las vencidas de otras sesiones se borren del disco también
+cuando solo se leen PDFs (sin nuevos guardar()), respetando intervalo_limpieza.
+"""
+import os
+import time
+
+from spool import SpoolPDF
+
+try:
+    print("🔍 Probando spool de PDFs...\n")
+
+    spool = SpoolPDF(ttl=0.2, intervalo_limpieza=0.1)
+    try:
+        vieja = spool.guardar(b"%PDF-vieja")
+        activa = spool.guardar(b"%PDF-activa")
+        if spool.leer(activa) != b"%PDF-activa":
+            raise AssertionError("leer() no devuelve los bytes guardados")
+        print("✅ leer() devuelve el PDF guardado")
+
+        # Solo se sigue leyendo la sesión activa: la vieja vence y se purga al leer
+        for _ in range(4):
+            time.sleep(0.08)
+            if spool.leer(activa) is None:
+                raise AssertionError("Una entrada en uso no debe vencer")
+        if spool.estadisticas()["entradas"] != 1 or os.path.exists(os.path.join(spool.directorio, f"{vieja}.pdf")):
+            raise AssertionError(f"La entrada vencida sigue en el spool: {spool.estadisticas()}")
+        if spool.leer(vieja) is not None:
+            raise AssertionError("Una entrada vencida no debe poder leerse")
+        print("✅ Las entradas vencidas se purgan al leer, sin nuevos guardar()")
+
+        # Vencida pero antes de la próxima purga: abrir() tampoco la devuelve
+        spool.intervalo_limpieza = 3600
+        time.sleep(0.25)
+        if spool.abrir(activa) is not None or spool.estadisticas()["expirados"] != 2:
+            raise AssertionError(f"abrir() devolvió una entrada vencida: {spool.estadisticas()}")
+        print("✅ Una entrada vencida no se abre aunque no toque purgar")
+    finally:
+        spool.cerrar()
+    print("\n✅ ¡TODO FUNCIONA CORRECTAMENTE!")
+
+except Exception as e:
+    print(f"❌ Error: {str(e)}")
+    import traceback
+    traceback.print_exc()
+    exit(1)
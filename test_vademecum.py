@@ -0,0 +1,108 @@
+"""
+Prueba de las sugerencias del vademécum
+
+Verifica la lectura del CSV (con punto y coma), la búsqueda por prefijo sin
+tildes y desde cualquier palabra del nombre, el orden por popularidad y por los
+usos del médico, la identificación de medicamentos en el contenido de una
+receta, que los usos guardados en el historial se lean al sugerir y que esa
+lectura no haga esperar a los demás médicos.
+"""
+import os
+import tempfile
+import threading
+
+from historial import HistorialRecetas
+from vademecum import Vademecum, cargar_csv, obtener_vademecum
+
+CSV = """medicamento;presentacion;posologia;popularidad
+Ibuprofeno;400 mg comprimidos;1 comprimido cada 8 horas;95
+Ibuprofeno;200 mg comprimidos;1 comprimido cada 6 horas;70
+Ácido acetilsalicílico;100 mg comprimidos;1 comprimido al día;60
+Amoxicilina;500 mg cápsulas;1 cápsula cada 8 horas por 7 días;90
+Amoxicilina con ácido clavulánico;875/125 mg comprimidos;1 comprimido cada 12 horas;75
+;sin nombre;;
+"""
+
+
+def textos(sugerencias):
+    return [s.descripcion for s in sugerencias]
+
+
+try:
+    print("🔍 Probando sugerencias del vademécum...\n")
+
+    directorio = tempfile.mkdtemp()
+    ruta = os.path.join(directorio, "vademecum.csv")
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write(CSV)
+    historial = HistorialRecetas(os.path.join(directorio, "historial.db"), os.path.join(directorio, "pdfs"))
+    vademecum = Vademecum(cargar_csv(ruta), historial.usos_medicamentos)
+    if len(vademecum) != 5:
+        raise AssertionError(f"Se esperaban 5 medicamentos, hay {len(vademecum)}")
+
+    # Prefijo sin tildes, desde cualquier palabra del nombre y ordenado por popularidad
+    if textos(vademecum.sugerir("IBU")) != ["Ibuprofeno 400 mg comprimidos", "Ibuprofeno 200 mg comprimidos"]:
+        raise AssertionError(f"Orden por popularidad incorrecto: {textos(vademecum.sugerir('IBU'))}")
+    acido = textos(vademecum.sugerir("acido"))
+    if acido != ["Amoxicilina con ácido clavulánico 875/125 mg comprimidos", "Ácido acetilsalicílico 100 mg comprimidos"]:
+        raise AssertionError(f"Búsqueda por palabra del nombre incorrecta: {acido}")
+    if vademecum.sugerir("ibuprofeno 2")[0].texto != "Ibuprofeno 200 mg comprimidos - 1 comprimido cada 6 horas":
+        raise AssertionError("La búsqueda con presentación no encuentra la entrada")
+    if vademecum.sugerir("zzz") or vademecum.sugerir(""):
+        raise AssertionError("Sin coincidencias (o sin texto ni médico) no debe sugerir nada")
+    print("✅ Búsqueda por prefijo y orden por popularidad")
+
+    # Identificación en el contenido: descripción completa o, si no, el nombre
+    contenido = "Rp./\n1. Ibuprofeno 200 mg comprimidos - 1 cada 6 h\n• amoxicilina 1 g\nReposo relativo"
+    usados = vademecum.registrar_uso("dra_lopez", contenido)
+    if usados != ["ibuprofeno 200 mg comprimidos", "amoxicilina 500 mg capsulas"]:
+        raise AssertionError(f"Medicamentos identificados incorrectos: {usados}")
+    historial.registrar_usos("dra_lopez", usados)
+    historial.registrar_usos("dra_lopez", usados[:1])
+    print("✅ Medicamentos identificados en el contenido")
+
+    # Los usos guardados del médico van primero (y solo para ese médico)
+    if textos(vademecum.sugerir("ibu", "dra_lopez"))[0] != "Ibuprofeno 200 mg comprimidos":
+        raise AssertionError("Los usos del médico no cambian el orden")
+    if textos(vademecum.sugerir("ibu", "dr_perez"))[0] != "Ibuprofeno 400 mg comprimidos":
+        raise AssertionError("Los usos de un médico afectan a otro")
+    if textos(vademecum.sugerir("", "dra_lopez")) != ["Ibuprofeno 200 mg comprimidos", "Amoxicilina 500 mg cápsulas"]:
+        raise AssertionError(f"Más recetados incorrectos: {textos(vademecum.sugerir('', 'dra_lopez'))}")
+    # Un uso nuevo se suma en memoria sin volver a leer el historial
+    for _ in range(3):
+        vademecum.registrar_uso("dra_lopez", "Amoxicilina 500 mg cápsulas")
+    if textos(vademecum.sugerir("", "dra_lopez"))[0] != "Amoxicilina 500 mg cápsulas":
+        raise AssertionError("Los usos nuevos no se suman en memoria")
+    print("✅ Orden por los usos de cada médico")
+
+    # Una lectura lenta de los usos de un médico no bloquea las consultas de otro
+    leyendo, liberar = threading.Event(), threading.Event()
+
+    def usos_lentos(usuario):
+        if usuario == "dr_lento":
+            leyendo.set()
+            liberar.wait(5)
+        return {}
+
+    lento = Vademecum(cargar_csv(ruta), usos_lentos)
+    hilo = threading.Thread(target=lento.sugerir, args=("ibu", "dr_lento"))
+    hilo.start()
+    leyendo.wait(5)
+    consulta = threading.Thread(target=lento.sugerir, args=("ibu", "dra_lopez"))
+    consulta.start()
+    consulta.join(2)
+    liberar.set()
+    hilo.join()
+    if consulta.is_alive():
+        raise AssertionError("La consulta esperó a la lectura de los usos de otro médico")
+    print("✅ La lectura de los usos de un médico no bloquea a los demás")
+
+    if len(obtener_vademecum(os.path.join(directorio, "no_existe.csv"))) != 0:
+        raise AssertionError("Un CSV inexistente debe dar un vademécum vacío")
+    print("\n✅ ¡TODO FUNCIONA CORRECTAMENTE!")
+
+except Exception as e:
+    print(f"❌ Error: {str(e)}")
+    import traceback
+    traceback.print_exc()
+    exit(1)
@@ -0,0 +1,10 @@
+"""
+Utilidades para leer objetos PDF de PyPDF2, compartidas por los módulos que
+recorren plantillas (no importa PyPDF2: solo usa get_object()).
+"""
+
+
+def valor_pdf(diccionario, clave, defecto=None):
+    """Valor de un diccionario PDF con las referencias indirectas resueltas (`defecto` si falta)"""
+    valor = diccionario.get(clave)
+    return defecto if valor is None else valor.get_object()
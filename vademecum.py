@@ -0,0 +1,308 @@
+"""
+Vademécum local con sugerencias de medicamentos para el contenido de la receta
+
+Lee un CSV con encabezado (medicamento, presentacion, posologia, popularidad;
+solo la primera columna es obligatoria, separado por comas o por punto y coma)
+y arma un índice de prefijos compacto: la lista ordenada de las claves
+normalizadas (minúsculas, sin tildes) que empiezan en cada palabra del nombre y
+siguen hasta el final de la presentación. Una consulta es una búsqueda binaria
+(bisect) que da el rango de claves con ese prefijo: "ibu", "Ibuprofeno 4" o
+"acetil" (de "Ácido acetilsalicílico") cuestan O(log n).
+
+Las sugerencias ponen primero los medicamentos que el médico ya recetó (de más
+a menos usados) y después el resto por popularidad. Los mejores de cada rango
+por popularidad están precalculados para los prefijos de una y dos letras (los
+rangos más grandes) y en una caché acotada para los demás, así que una consulta
+no recorre las miles de entradas que empiezan con "a".
+"""
+import bisect
+import csv
+import heapq
+import os
+import re
+import threading
+import unicodedata
+from array import array
+from dataclasses import dataclass
+
+MAX_SUGERENCIAS = 8
+MAX_MEJORES = 32  # mejores por popularidad que se guardan de cada rango
+RANGO_DIRECTO = 64  # los rangos más cortos se ordenan en cada consulta
+LARGO_PRECALCULADO = 2
+MAX_RANGOS_CACHE = 4096
+
+_MAXIMO = chr(0x10FFFF)  # mayor que cualquier carácter: fin del rango de un prefijo
+# Viñetas, numeración y "Rp./" al inicio de una línea ya normalizada
+_MARCADOR = re.compile(r"^(?:rp\.\s*/?)?[\s•*/.)\d-]*")
+_FIN_PALABRA = re.compile(r"\b")
+
+
+class _SinMarcas(dict):
+    """Tabla para str.translate que quita tildes y diéresis; se completa carácter por carácter"""
+
+    def __missing__(self, codigo):
+        descompuesto = unicodedata.normalize("NFKD", chr(codigo))
+        base = "".join(c for c in descompuesto if not unicodedata.combining(c))
+        self[codigo] = base
+        return base
+
+
+_SIN_MARCAS = _SinMarcas()
+
+
+def normalizar(texto):
+    """Minúsculas, sin tildes ni diéresis y con los espacios colapsados"""
+    texto = texto.lower()
+    if not texto.isascii():
+        texto = texto.translate(_SIN_MARCAS)
+    return " ".join(texto.split())
+
+
+@dataclass(frozen=True)
+class Medicamento:
+    """Entrada del vademécum"""
+    nombre: str
+    presentacion: str = ""
+    posologia: str = ""
+    popularidad: float = 0.0
+
+    @property
+    def descripcion(self):
+        """Nombre y presentación: lo que identifica al medicamento en la receta"""
+        return f"{self.nombre} {self.presentacion}".strip()
+
+    @property
+    def texto(self):
+        """Línea para el contenido de la receta"""
+        return f"{self.descripcion} - {self.posologia}" if self.posologia else self.descripcion
+
+
+def cargar_csv(ruta):
+    """Lista de Medicamento de un CSV del vademécum (se omiten las filas sin nombre)"""
+    medicamentos = []
+    with open(ruta, newline="", encoding="utf-8-sig") as f:
+        encabezado = f.readline()
+        f.seek(0)
+        lector = csv.DictReader(f, delimiter=";" if ";" in encabezado else ",")
+        for fila in lector:
+            fila = {(clave or "").strip().lower(): (valor or "").strip() for clave, valor in fila.items()}
+            if not fila.get("medicamento"):
+                continue
+            try:
+                popularidad = float(fila.get("popularidad") or 0)
+            except ValueError:
+                popularidad = 0.0
+            medicamentos.append(Medicamento(
+                fila["medicamento"], fila.get("presentacion", ""), fila.get("posologia", ""), popularidad
+            ))
+    return medicamentos
+
+
+class _UsosMedico:
+    """Usos de un médico por medicamento, con sus claves ordenadas para buscar por prefijo"""
+
+    def __init__(self):
+        self.usos = {}
+        self.claves = []  # (clave, índice) ordenadas
+
+    def sumar(self, indice, claves, cantidad=1):
+        if indice not in self.usos:
+            for clave in claves:
+                bisect.insort(self.claves, (clave, indice))
+        self.usos[indice] = self.usos.get(indice, 0) + cantidad
+
+    def buscar(self, prefijo):
+        inicio = bisect.bisect_left(self.claves, (prefijo,))
+        fin = bisect.bisect_left(self.claves, (prefijo + _MAXIMO,), inicio)
+        return {indice for _, indice in self.claves[inicio:fin]}
+
+
+class Vademecum:
+    """
+    Índice de prefijos de medicamentos. `fuente_usos(usuario)` devuelve los usos
+    guardados del médico ({descripción normalizada: usos}); se lee una sola vez
+    por médico y después se actualiza en memoria con registrar_uso().
+    """
+
+    def __init__(self, medicamentos=(), fuente_usos=None):
+        self.fuente_usos = fuente_usos
+        unicos = {}
+        for medicamento in medicamentos:
+            # Una descripción repetida conserva la primera entrada
+            unicos.setdefault(normalizar(medicamento.descripcion), medicamento)
+        # Índices en orden alfabético: a igual popularidad se sugiere por orden alfabético
+        self._descripciones = sorted(unicos)
+        self.medicamentos = [unicos[descripcion] for descripcion in self._descripciones]
+        self._por_descripcion = {descripcion: i for i, descripcion in enumerate(self._descripciones)}
+        self._por_nombre = {}
+        self._largo_maximo = max(map(len, self._descripciones), default=0)
+
+        pares = []
+        for i, medicamento in enumerate(self.medicamentos):
+            nombre = normalizar(medicamento.nombre)
+            actual = self._por_nombre.get(nombre)
+            if actual is None or medicamento.popularidad > self.medicamentos[actual].popularidad:
+                self._por_nombre[nombre] = i
+            pares.extend((clave, i) for clave in self._claves_entrada(i, len(nombre)))
+        pares.sort()
+        self._claves = [clave for clave, _ in pares]
+        self._indices = array("I", (i for _, i in pares))
+
+        # Posición de cada entrada por popularidad (menor = mejor), para ordenar con una clave entera
+        por_popularidad = sorted(range(len(self.medicamentos)), key=lambda i: -self.medicamentos[i].popularidad)
+        self._posicion = array("I", bytes(4 * len(por_popularidad)))
+        for posicion, i in enumerate(por_popularidad):
+            self._posicion[i] = posicion
+
+        self._precalculados = {}
+        self._cache = {}
+        self._usos = {}
+        self._lock = threading.Lock()
+        self._precalcular()
+
+    def __len__(self):
+        return len(self.medicamentos)
+
+    def _claves_entrada(self, i, largo_nombre=None):
+        """Claves de una entrada: la descripción desde cada palabra del nombre"""
+        descripcion = self._descripciones[i]
+        if largo_nombre is None:
+            largo_nombre = len(normalizar(self.medicamentos[i].nombre))
+        return [descripcion] + [
+            descripcion[posicion + 1:] for posicion in range(largo_nombre)
+            if descripcion[posicion] == " "
+        ]
+
+    def _rango(self, prefijo):
+        inicio = bisect.bisect_left(self._claves, prefijo)
+        return inicio, bisect.bisect_left(self._claves, prefijo + _MAXIMO, inicio)
+
+    def _ordenar(self, inicio, fin):
+        # Una entrada puede aparecer dos veces en el rango (dos de sus palabras con el prefijo)
+        return heapq.nsmallest(MAX_MEJORES, set(self._indices[inicio:fin]), key=self._posicion.__getitem__)
+
+    def _precalcular(self):
+        """Mejores de los rangos grandes de los prefijos de hasta LARGO_PRECALCULADO letras"""
+        for largo in range(1, LARGO_PRECALCULADO + 1):
+            inicio = 0
+            while inicio < len(self._claves):
+                prefijo = self._claves[inicio][:largo]
+                if len(prefijo) < largo:
+                    # Clave más corta que el prefijo ("a"): su rango es el del prefijo anterior
+                    inicio += 1
+                    continue
+                _, fin = self._rango(prefijo)
+                if fin - inicio > RANGO_DIRECTO:
+                    self._precalculados[(inicio, fin)] = self._ordenar(inicio, fin)
+                inicio = fin
+
+    def _mejores(self, inicio, fin):
+        if fin - inicio <= RANGO_DIRECTO:
+            return self._ordenar(inicio, fin)
+        mejores = self._precalculados.get((inicio, fin)) or self._cache.get((inicio, fin))
+        if mejores is None:
+            mejores = self._ordenar(inicio, fin)
+            # Vaciarla solo obliga a volver a ordenar (nsmallest) los rangos que se consulten después
+            if len(self._cache) >= MAX_RANGOS_CACHE:
+                self._cache.clear()
+            self._cache[(inicio, fin)] = mejores
+        return mejores
+
+    def _usos_medico(self, usuario):
+        """
+        _UsosMedico del usuario. La primera vez se lee de fuente_usos (SQLite) fuera
+        del lock, así las consultas de los demás médicos no esperan esa lectura; si
+        otro hilo lo publicó mientras tanto, se usa el suyo (un uso registrado durante
+        la lectura puede quedar sin contar en memoria hasta que se vuelva a cargar).
+        """
+        with self._lock:
+            usos = self._usos.get(usuario)
+        if usos is not None:
+            return usos
+        usos = _UsosMedico()
+        guardados = self.fuente_usos(usuario) if self.fuente_usos else {}
+        for descripcion, cantidad in guardados.items():
+            i = self._por_descripcion.get(descripcion)
+            if i is not None:
+                usos.sumar(i, self._claves_entrada(i), cantidad)
+        with self._lock:
+            return self._usos.setdefault(usuario, usos)
+
+    def sugerir(self, texto, usuario=None, limite=MAX_SUGERENCIAS):
+        """
+        Hasta `limite` medicamentos cuyo nombre (o una de sus palabras) empieza con
+        `texto`: primero los que el usuario ya recetó, de más a menos usados, y
+        después el resto por popularidad. Sin texto devuelve los más usados del usuario.
+        """
+        limite = min(limite, MAX_MEJORES)
+        prefijo = normalizar(texto)
+        elegidos = []
+        if usuario:
+            usos = self._usos_medico(usuario)
+            with self._lock:
+                candidatos = usos.buscar(prefijo) if prefijo else usos.usos
+                elegidos = heapq.nsmallest(
+                    limite, candidatos, key=lambda i: (-usos.usos[i], self._posicion[i])
+                )
+        if prefijo and len(elegidos) < limite:
+            # Los no usados se ordenan solo por popularidad: están entre los mejores del rango
+            usados = set(elegidos)
+            resto = (i for i in self._mejores(*self._rango(prefijo)) if i not in usados)
+            elegidos.extend(i for _, i in zip(range(limite - len(elegidos)), resto))
+        return [self.medicamentos[i] for i in elegidos]
+
+    def identificar(self, contenido):
+        """
+        Índices de los medicamentos con que empiezan las líneas del texto (sin
+        viñetas ni numeración). Se prefiere la descripción completa más larga;
+        si la presentación no coincide, el medicamento más popular con ese nombre.
+        """
+        encontrados = []
+        for linea in contenido.split("\n"):
+            linea = _MARCADOR.sub("", normalizar(linea))[:self._largo_maximo + 1]
+            if not linea:
+                continue
+            cortes = [m.start() for m in _FIN_PALABRA.finditer(linea)][::-1]
+            for tabla in (self._por_descripcion, self._por_nombre):
+                i = next((tabla[linea[:corte]] for corte in cortes if linea[:corte] in tabla), None)
+                if i is not None:
+                    if i not in encontrados:
+                        encontrados.append(i)
+                    break
+        return encontrados
+
+    def registrar_uso(self, usuario, contenido):
+        """
+        Suma un uso a cada medicamento identificado en el contenido de una receta
+        del usuario. Retorna sus descripciones normalizadas, para guardarlas.
+        """
+        indices = self.identificar(contenido)
+        with self._lock:
+            usos = self._usos.get(usuario)
+            # Si los usos del médico no se cargaron todavía, se leerán ya guardados
+            if usos is not None:
+                for i in indices:
+                    usos.sumar(i, self._claves_entrada(i))
+        return [self._descripciones[i] for i in indices]
+
+
+_vademecums = {}
+_vademecums_lock = threading.Lock()
+
+
+def obtener_vademecum(ruta="vademecum.csv", fuente_usos=None):
+    """
+    Devuelve el vademécum compartido por el proceso para el CSV indicado
+    (vacío si el archivo no existe). Se carga e indexa fuera del lock global y se
+    publica con él: si dos hilos lo cargan a la vez, queda el primero publicado.
+    """
+    with _vademecums_lock:
+        vademecum = _vademecums.get(ruta)
+    if vademecum is None:
+        medicamentos = cargar_csv(ruta) if os.path.exists(ruta) else []
+        nuevo = Vademecum(medicamentos, fuente_usos)
+        with _vademecums_lock:
+            vademecum = _vademecums.setdefault(ruta, nuevo)
+    if fuente_usos is not None:
+        vademecum.fuente_usos = fuente_usos
+    return vademecum